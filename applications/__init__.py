@@ -1,3 +1,82 @@
-import os
-import glob
-__all__ = [ os.path.basename(f)[:-3] for f in glob.glob(os.path.dirname(__file__)+"/*.py")]
\ No newline at end of file
+'''
+The bot's plugins, loaded on first use.  MANIFEST declares what each
+module registers, see the plugins module.  Regenerate it after changing
+a command's declaration:
+
+    python -m bearbot.core.plugins applications
+
+'''
+
+OWNER = 10000  # command.OWNER, without importing it
+
+MANIFEST = {
+    'chatter': {
+        'commands': {
+            'chatter': {'args': 'setting *terms...', 'cost': 2,
+                        'help': 'Turns chatter on or off, lists or searches '
+                                'its triggers'},
+            'del': {'args': 'trigger...',
+                    'help': 'Deletes chatter entries (ie. .del <key>)'},
+            'set': {'args': 'entry...',
+                    'help': 'Adds chatter entries (.set [trigger] = '
+                            '[response])'},
+        },
+        'events': ['PRIVMSG'],
+    },
+    'ip_info': {
+        'commands': {
+            'ip': {'args': 'address', 'cost': 3,
+                   'help': 'Provides information about an IP address'},
+        },
+    },
+    'misc_commands': {
+        'commands': {
+            'action': {'args': 'message...', 'aliases': ('me',),
+                       'help': 'Performs irc action "/me *"'},
+            'bots': {'help': 'Reports itself as a bot'},
+            'cancel': {'args': '*target', 'access': OWNER,
+                       'help': "Cancels a command's or nick's commands, "
+                               'all without arguments'},
+            'delay': {'args': '*seconds:float', 'access': OWNER,
+                      'help': 'Sets message delay time in seconds'},
+            'factor': {'args': 'number:int', 'cost': 3,
+                       'help': 'Factors a whole number into primes'},
+            'hbd': {'help': 'A test user command definition'},
+            'help': {'args': '*command', 'aliases': ('commands',),
+                     'cost': 2,
+                     'help': 'Lists commands, or the syntax and '
+                             'description of a command'},
+            'jobs': {'access': OWNER,
+                     'help': 'Lists the commands running in the worker '
+                             'pool'},
+            'join': {'args': 'channels:channel+', 'access': OWNER,
+                     'help': 'Bot joins channels specified'},
+            'part': {'args': '*channels:channel+', 'access': OWNER,
+                     'help': 'Bot parts channels, the current one without '
+                             'arguments'},
+            'prefix': {'args': 'char', 'access': OWNER,
+                       'help': 'Changes the command prefix'},
+            'quit': {'args': '*message...', 'access': OWNER,
+                     'abbreviate': False,
+                     'help': 'Disconnects bot from the server'},
+            'reload': {'args': '*module', 'access': OWNER,
+                       'abbreviate': False,
+                       'help': 'Reloads the changed plugin modules, or one '
+                               'by name'},
+            'reverse': {'args': 'text...',
+                        'help': 'Replies with text reversed'},
+            'rot13': {'args': 'message...',
+                      'help': 'Encodes (decodes) rot13'},
+            'rps': {'args': 'choice', 'cost': 3,
+                    'help': 'Play rock, paper, scissors, BEAR! with the '
+                            'bot.'},
+            'say': {'args': 'target message...',
+                    'help': 'Says message to a user or #channel (/me '
+                            'message for an action)'},
+            'who': {'args': 'nick', 'cost': 2,
+                    'help': 'Returns who information'},
+        },
+    },
+}
+
+__all__ = list(MANIFEST)
@@ -4,33 +4,83 @@ Created on Sep 18, 2013
 
 This module is for useless chatter
 
-It updates the file, /bearbot/resources/chatterbox.bb.  It provides
-functions to load the file, add entries, and remove entries.  It
-contains an is_trigger() function that returns respective boolean
-values. /bearbot/resources/chatterbox.bb - has key:value on each line to
-represent trigger:response.
+It keeps the triggers and responses in /resources/chatterbox.journal,
+an append-only Journal (see the journal module), so .set and .del only
+append a record, on the journal's writer thread, and a response may
+hold a colon.  It provides functions to load the journal, add entries,
+and remove entries.  The first load imports the older
+/resources/chatterbox.bb, which has key:value on each line to represent
+trigger:response; the .bb file is left as it was.
+
+The entries are also copied into /resources/chatterbox.db, a
+SearchIndex (see the search module) that .chatter list pages through
+and .chatter search ranks, so neither reads the whole dictionary.
+
+While chatter is on, each channel line is matched against every trigger
+at once by a Triggers set (see the triggers module).  A trigger matches
+the whole line (hbd), a substring (*honey*), whole words (~bear) or a
+regular expression (/be+r/), ignoring case.  Only admins can set a
+regular expression, and one that could backtrack for long is refused.
+
+The journal is read by setup(), when the plugin loader first loads the
+module, not on import.
 
 '''
 
+import os
 import re
 
 from bearbot.core.command import *
+from bearbot.core.event import bus
+from bearbot.core.journal import Journal
+from bearbot.core.search import SearchIndex, PAGE
+from bearbot.core.triggers import Triggers, PATTERN, parse
 
-chat_dic = {}  # Chatter dictionary
+resources = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..',
+                         'resources')
+chat_file = os.path.join(resources, 'chatterbox.bb')  # Trigger:Response
+journal_file = os.path.join(resources, 'chatterbox.journal')
+index_file = os.path.join(resources, 'chatterbox.db')
+store = Journal(journal_file)
+chat_dic = store.data  # Chatter dictionary
+triggers = Triggers()  # chat_dic compiled for matching
+index = SearchIndex(index_file)  # chat_dic copied for listing and search
 chatter_on = False  # Toggles chatter responses off and on
-chat_file = '../../resources/chatterbox.bb'  # Trigger:Response data file
+PRESERVE = ('store', 'chat_dic', 'triggers', 'index',
+            'chatter_on')  # Kept on reloads
 bold = '\u0002'
 
+def setup():
+    ''' Init hook, called once by the plugin loader '''
+    load_chatter()
+
 def load_chatter():
-    ''' Loads chatter triggers and responses from file '''
-    with open(chat_file, 'r') as cf:
-        chat_dic.update(line[:-1].split(':') for line in cf)
+    ''' Loads chatter triggers and responses from the journal
+
+    The first time, the journal is created from chatterbox.bb.
+
+    '''
+    if not store.exists() and os.path.exists(chat_file):
+        with open(chat_file, 'r', encoding='utf-8') as cf:
+            store.replace(line.rstrip('\n').split(':', 1) for line in cf
+                          if ':' in line)
+    store.load()
+    for key, value in chat_dic.items():
+        try:
+            triggers.add(key, value)
+        except re.error:  # A bad pattern in the file, left unmatched
+            pass
+    index.sync(chat_dic)
 
 def add_entry(key, value):
-    ''' Appends chatter entry to chatterbox.bb '''
-    chat_dic[key] = value  # Adds trigger/response to current dictionary
-    with open(chat_file, 'a') as cf:  # Opens file to append to
-        cf.write('%s:%s\n' % (key, value))  # Writes trigger/response
+    ''' Adds chatter entry, appending it to the journal
+
+    Raises re.error, without adding it, if key is a bad pattern.
+
+    '''
+    triggers.add(key, value)
+    store.set(key, value)  # Adds trigger/response, written in the background
+    index.set(key, value)
 
 def entry_exists(key):
     ''' Checks if entry exists in the chatter dictionary '''
@@ -39,67 +89,102 @@ def entry_exists(key):
     return False
 
 def remove_entry(key):
-    ''' Removes chatter entry by key '''
-    chat_dic.pop(key)
-    with open(chat_file, 'w') as cf:
-        for entry in chat_dic:
-            cf.write('%s:%s\n' % (entry, chat_dic[entry]))
+    ''' Removes chatter entry by key, appending a delete to the journal '''
+    store.delete(key)
+    triggers.remove(key)
+    index.delete(key)
 
 def get_value(bot, content, source):
-    ''' Returns response for trigger (False if not trigger) '''
-    for key in chat_dic:
-        if str.lower(content) == str.lower(key):
-            bot.say(source, chat_dic[key])
+    ''' Says the response to the trigger content matches, if any '''
+    response = triggers.match(content)
+    if response is not None:
+        bot.say(source, response)
+
+@bus.on('PRIVMSG', when=lambda msg: chatter_on and
+        not msg.trailing.startswith('\001'))
+def chatter_privmsg_(bot, msg):
+    ''' Answers channel lines that match a trigger, except commands '''
+    if msg.content[:1] != bot.cmd_prefix and\
+            bot.roster.is_channel(msg.source):
+        get_value(bot, msg.content, msg.source)
 
 # Command Definitions
 
-@one_arg
+@command(args='setting *terms...', cost=2)
 def chatter_(cmd):
-    ''' chatter [on]/[off] - Toggles chatter on and off '''
+    ''' Turns chatter on or off, lists or searches its triggers '''
     global chatter_on
+    setting, terms = cmd.args
     
-    if 'on' in cmd.args:
+    if setting == 'on':
         if chatter_on is True:
             cmd.reply('Chatter is already turned on.')
         else:
             chatter_on = True
             cmd.reply('Chatter turned on.')
-    if 'off' in cmd.args:
+    elif setting == 'off':
         if chatter_on is False:
             cmd.reply('Chatter is already turned off.')
         else:
             chatter_on = False
             cmd.reply('Chatter turned off.')
-    if 'list' in cmd.args:
-        triggers = []
-        for key in chat_dic:
-            triggers.append(key)
-            
-        cmd.reply('Chatter triggers: %s' % (' |  ').join(triggers))
+    elif setting == 'list':
+        list_page(cmd, terms or '1')
+    elif setting == 'search' and terms:
+        found = index.search(terms)
+        if found:
+            cmd.reply('Chatter triggers matching %s: %s' %
+                      (terms, ' |  '.join(found)))
+        else:
+            cmd.reply('No chatter triggers match %s.' % terms)
+    else:
+        cmd.reply('Chatter can be turned on, off, list its triggers or '
+                  'search them.')
+
+def list_page(cmd, page):
+    ''' Replies with one page of the triggers, read from the index '''
+    pages = max(1, -(-len(chat_dic) // PAGE))
+    if not page.isdigit() or not 1 <= int(page) <= pages:
+        cmd.reply('Chatter has %s pages of triggers: %schatter list '
+                  '[1-%s]' % (pages, cmd.bot.cmd_prefix, pages)); return
+    cmd.reply('Chatter triggers (page %s of %s): %s' %
+              (page, pages, ' |  '.join(index.page(int(page)))))
          
 # Needs $nick variable feature or regexp
-@requires_args
+@command(args='entry...')
 def set_(cmd):
-    ''' Adds chatter entries (.set $1 = $2) '''
-    if not re.search(r'\w+ = \w+', (' ').join(cmd.args)):  # Checks syntax
+    ''' Adds chatter entries (.set [trigger] = [response]) '''
+    if not re.search(r'\S = \S', cmd.args[0]):  # Checks syntax
         cmd.reply('Improper syntax for set command.\nRequires %sset [string]'\
                   ' = [string]' % cmd.bot.cmd_prefix); return
-    key, value = (' ').join(cmd.args).split(' = ')  # Splits key/value
-    if not entry_exists(key):
+    key, value = cmd.args[0].split(' = ', 1)  # Splits key/value
+    if entry_exists(key):
+        cmd.reply('A value for "%s" already exists.' % key)
+    elif parse(key)[0] == PATTERN:
+        set_pattern(cmd, key, value)
+    else:
+        set_entry(cmd, key, value)
+
+def set_entry(cmd, key, value):
+    ''' Adds the entry and replies, or says why the pattern is refused '''
+    try:
         add_entry(key, value)
-        cmd.reply('Response, %s%s%s, added for the trigger, %s%s%s.' %
-                  (bold, value, bold, bold, key, bold)); return
-    cmd.reply('A value for "%s" already exists.' % key)
+    except re.error as e:
+        cmd.reply('%s is not a valid pattern: %s' % (key, e)); return
+    cmd.reply('Response, %s%s%s, added for the trigger, %s%s%s.' %
+              (bold, value, bold, bold, key, bold))
+
+@access(ADMINISTRATOR)
+def set_pattern(cmd, key, value):
+    ''' Pattern triggers run on every channel line, so admins set them '''
+    set_entry(cmd, key, value)
 
-@requires_args
+@command(args='trigger...')
 def del_(cmd):
     ''' Deletes chatter entries (ie. .del <key>) '''
-    key = (' ').join(cmd.args)
+    key = cmd.args[0]
     if entry_exists(key):
         remove_entry(key)
         cmd.reply('"%s" entry removed from dictionary.' % (key)); return
     cmd.reply('An entry for "%s" does not exist.' % (key))
 
-# Command dictionary
-command_dic.update({'chatter': chatter_, 'set': set_, 'del': del_})
-load_chatter()
\ No newline at end of file
@@ -51,9 +51,10 @@ def is_valid_ip(address):
     except:
         return False
 
-@one_arg
+@command(name='ip', args='address', cost=3)
+@limits(timeout=15, per_user=1)
 def ip_info(cmd):
-    ''' ip [ip address] Provides information about an IP address '''
+    ''' Provides information about an IP address '''
     ip_address = cmd.args[0]
     
     if not is_valid_ip(ip_address):
@@ -75,8 +76,6 @@ def ip_info(cmd):
                c, e, ip.dma_code, c, e, ip.area_code, c, e, ip.asn, c, e,
                ip.isp))
 
-command_dic.update({'ip': ip_info})
-
 def main():
     ''' Test stub '''
     pass
@@ -19,122 +19,120 @@ To add a command definition in your module:
     1. Add 'from bearbot.core.command import *' to the top of your
        module
 
-    2. Define your command with a parameter to accept a Command object:
+    2. Define your command with a parameter to accept a Command object,
+       and register it with the @command decorator:
 
-           ex. def my_function(cmd):
+           ex. @command(args='*message...', access=OWNER)
+               def quit_(cmd):
                    ...do stuff with cmd
                    ...use your module or bearbot.core
 
-    3. Update the command_dic dictionary. Each key must be a string of
-       what you want to trigger your function after the prefix (ie.
-       'quit') and the key's value must be a reference to your
-       function's object - the name of your function without ()'s.
+       The command is named after the function, without trailing _'s
+       (ie. 'quit'), or by @command(name='quit').
 
-           ex. command_dic.update({'quit': my_quit_function})
+    3. Declare what the command takes, once, in @command:
 
-       * Ensure the dictionary is updated after the function
-         definitions.  Otherwise, the interpreter won't recognize them.
+       args       - The arguments, ie. 'nick *seconds:float'.  See the
+                    argument specs in the command module.  Leave it out
+                    for a command without arguments.
+       access     - The access level needed to run it, ie. OWNER.
+       aliases    - Other names for it, ie. ('rot', 'r13').
+       abbreviate - False if it mustn't run by an abbreviation of its
+                    name.  Otherwise any unique abbreviation of at
+                    least two letters runs it (.rev runs .reverse).
+       cost       - How much of a user's request rate it uses, 1 by
+                    default.  More for commands with long replies.  See
+                    the throttle module.
 
-The Command object passed to your definition provides:
+       Users that don't have the access get a notice, and arguments that
+       don't match get a reply with the command's syntax.  Your function
+       only runs for valid ones.
 
-          - Methods such as reply(source, message).  The Command Class
-            documentation to know what other methods are available.
+The Command object passed to your definition provides:
 
-    .root - The root of the user command as a string stripped of the
-            prefix (ex. 'quit').
+          - Methods such as reply(message), notice(message),
+            say(target, message) and action(target, message).  See the
+            Command class documentation.
 
-    .args - A list of arguments (ex. ['bye', 'everybody']).  The value
-            of arguments is None if there aren't any.  There are
-            decorators @no_args and @require args covered later.
+    .root - The root of the user command as the user typed it, stripped
+            of the prefix (ex. 'rev').  .name is the command it ran
+            (ex. 'reverse').
 
-          - Use (' ').join(args) if you need them as a string, or use
-            the @string decorator.
-            
-          - If a command requires a certain access level to use
-            admin.get_access(nick), or use @no_access, @admin, etc.
-            decorators covered later.
+    .args - A list of the arguments, one per parameter in args,
+            converted to their types.  Missing optional arguments are
+            None, a '+' parameter is a list and a '...' parameter the
+            rest of the line as a string.
 
-                ex. if admin.get_access(cmd.msg.nick) >= 5000:..
+                ex. args='target message...' and '.say #bears hi there'
+                    gives ['#bears', 'hi there']
 
     .bot - The Bot object that received the user command.  This
            attribute provides useful Bot methods.  See the Bot class
            for documentation and methods you can use with it.
 
-         - Note that a Command object is a proxy class of the Bot
-           class, so Bot object attributes can be referenced through a
-           Command object.
-
-               Example: cmd.notice(cmd.msg.nick, 'Oh hi!') instead of..
-                        cmd.bot.notice(cmd.msg.nick, 'Oh hi!')
-
-         - WARNING: Using proxy methods in command function definitions
-                    reduces performance slightly.  It's only for ease
-                    of use.  Also, be careful when using proxy
-                    attributes.  They are shallow copies and will not
-                    change Bot attributes.
-
     .msg - The Message object the user command came from.  This
            attribute provides you with a means to retrieve message
            information the command derived from such as the source,
            nick, host and more.  Read the Message class documentation
            for more attributes of a Message object.
 
-Decorators are also available to your command definitions:
+Where commands run:
+
+    Commands run in the bot's worker pool (see the workers module), so
+    blocking calls like cmd.bot.who() or an HTTP request are fine in
+    them and don't hold up the bot.  A command has 30 seconds before it
+    is cancelled, and each command and user can only have a few running
+    at once.  Change that with @limits(timeout=60, per_user=1).  A
+    command that returns right away, like hbd, can skip the pool with
+    @inline.  A CPU heavy command, or one you don't trust, can run in a
+    separate process with CPU and memory limits with @isolated (see
+    the isolation module).
+
+    When the bot runs as an AsyncBot, a command may be defined with
+    'async def'.  It then runs as a task on the event loop.
+
+    Put @command above these decorators, so it registers the decorated
+    function.
 
-    There're decorators that your command definition can use.  These
-    decorators assist in typical command definition operations.  For
-    example, the @no_args decorator says that your command definition
-    does not require any args.  So accordingly, the @no_args decorator
-    skips the function and replies with an error message to the user
-    that issued the command.  For a list of decorators, read the
-    command module's documentation.
-    
 Docstring use:
 
-    Your docstring will be available in the help commands to display
-    proper syntax and the description of the command.
+    Your docstring is the command's description in the help command.
+    The syntax is generated from args, so leave it out.
 
 Below are some examples of defining your own user commands.
 
-Note at the bottom of the module, there's a dictionary of all the roots
-and function objects, and then the command_dic is updated with that
-dictionary.
-
 '''
 
-import re
 import random
 from codecs import getencoder
 
 from bearbot.core.command import *
 
-@one_arg
+@command(args='nick', cost=2)
 def who(cmd):
-    ''' who [nick] - Returns who information '''
+    ''' Returns who information '''
     who_list = cmd.bot.who(cmd.args[0])
     for who in who_list:
-        cmd.reply(who)
+        cmd.reply(str(who))
 
-@as_string
+@command(args='message...', aliases=('me',))
 def action(cmd):
-    ''' action [message] - Performs irc action "/me *" '''
-    cmd.action(cmd.msg.source, '%s' % cmd.args)
+    ''' Performs irc action "/me *" '''
+    cmd.action(cmd.msg.source, cmd.args[0])
 
-@requires_args
+@command(args='target message...')
 def say(cmd):
-    ''' say [user|#channel] [message] '''
-    if cmd.args[1] == '/me':
-        cmd.action(cmd.args[0], (' ').join(cmd.args[2:]))
+    ''' Says message to a user or #channel (/me message for an action) '''
+    target, message = cmd.args
+    if message.startswith('/me '):
+        cmd.action(target, message[4:])
     else:
-        cmd.say(cmd.args[0], (' ').join(cmd.args[1:]))
+        cmd.say(target, message)
 
-@owner
+@command(args='*message...', access=OWNER, abbreviate=False)
 def quit_(cmd):
-    ''' quit - Disconnects bot from the server '''
-    if cmd.args != None:
-        quit_message = (' ').join(cmd.args)
-    else:
-        quit_message = 'Okay, bye'  # Default quit message
+    ''' Disconnects bot from the server '''
+    quit_message = cmd.args[0] or 'Okay, bye'  # Default quit message
     cmd.bot.quit(quit_message)
     cmd.bot.alive = False  # Kills bot
     cmd.bot.close_connection()
@@ -142,77 +140,128 @@ def quit_(cmd):
     #Bear in mind, quit messages only show after being
     #connected to the server for a few minutes (spam protection)
 
-@owner
+@command(args='*seconds:float', access=OWNER)
 def delay(cmd):
-    ''' delay *[seconds] - Sets message delay time in seconds '''
-    if not cmd.args:
+    ''' Sets message delay time in seconds '''
+    seconds = cmd.args[0]
+    if seconds is None:
         cmd.reply('The current delay is set to %s seconds' %
                   cmd.bot.msg_delay)
         return
-    if len(cmd.args) > 2:
-        cmd.reply('Too many arguments. Requires: %sdelay [int|float]' %
-                  cmd.cmd_prefix)
+    if not 0 <= seconds <= 10:
+        cmd.reply('Delay must be from 0 - 10 seconds.')
         return
-    try:
-        if not 0 <= float(cmd.args[0]) <= 10:
-            cmd.reply('Delay must be from 0 - 10 seconds.')
-            return
-        cmd.bot.set_msg_delay(float(cmd.args[0]))
-        cmd.reply('Message delay set to %s seconds.' % float(cmd.args[0]))
-    except:
-        cmd.reply('Invalid input. Requires: %sdelay [int|float]' %
-                  cmd.cmd_prefix)
+    cmd.bot.set_msg_delay(seconds)
+    cmd.reply('Message delay set to %s seconds.' % seconds)
 
-@owner
-@requires_args
+@command(args='char', access=OWNER)
 def prefix(cmd):
-    ''' prefix [char] - Changes the command prefix '''
-    if len(cmd.args) > 1 or len(cmd.args[0]) != 1:
+    ''' Changes the command prefix '''
+    if len(cmd.args[0]) != 1:
         cmd.reply('Improper syntax, Requires: %sprefix [char]' % 
                   cmd.cmd_prefix)
     else:
         cmd.cmd_prefix = cmd.args[0]
         cmd.reply("Command prefix set to: %s" % cmd.args[0])
 
-@owner
-@requires_args
+@command(args='channels:channel+', access=OWNER)
 def join(cmd):
-    ''' join [#channel(s)] - Bot joins channels specified '''
-    print('Misc commands: before receiving error list')
-    errors = cmd.bot.join(cmd.args)
-    print('Misc commands: after receiving error list %s' % errors)
-    if errors is not None:
-        for e in errors:
-            cmd.reply('Error: %s' % e.params)
-
-@owner
+    ''' Bot joins channels specified '''
+    results = cmd.bot.join(cmd.args[0])
+    for channel, error in results.items():
+        if error is not None:
+            cmd.reply('Could not join %s: %s' % (channel, error))
+
+@command(args='*channels:channel+', access=OWNER)
 def part(cmd):
-    ''' part [#channel(s)] - Bot parts a channel. '''
-    if cmd.args is None and re.search(r'^#', cmd.msg.source): 
+    ''' Bot parts channels, the current one without arguments '''
+    channels = cmd.args[0]
+    if not channels and cmd.msg.source.startswith('#'):
         cmd.bot.part(cmd.msg.source); return  # Parts current channel
-    cmd.bot.part(cmd.args)  # Parts the list of channels
+    if channels:
+        cmd.bot.part(channels)  # Parts the list of channels
 
-@no_args
+@command()
+@inline
 def bots(cmd):
     ''' Reports itself as a bot '''
     cmd.reply('Reporting in.')
 
+@command(args='*command', aliases=('commands',), cost=2)
 def help_(cmd):
-    ''' help *[command] - Lists commands, their syntax, and descriptions. '''
-    if not cmd.args:
-        cmd.notice('Type %shelp [command] for the syntax and description of'\
-                   ' a command' % cmd.bot.cmd_prefix)
-        cmd.notice(cmd.cmd_prefix +
-                   (' %s' % cmd.cmd_prefix).join(command_dic.keys()))
+    ''' Lists commands, or the syntax and description of a command '''
+    prefix = cmd.bot.cmd_prefix
+    if cmd.args[0] is None:
+        names = [entry.name for entry in cmd.bot.available_commands()]
+        cmd.notice('Type %shelp [command] for the syntax and description of'
+                   ' a command\n%s%s' % (prefix, prefix,
+                                         (' %s' % prefix).join(names)))
         return
-    if len(cmd.args) > 1:
-        cmd.notice('The %s help command takes only one argument')
+    entry = cmd.bot.get_command(cmd.args[0].lstrip(prefix), load=False)
+    if entry is None:
+        cmd.notice('%s is not a command' % cmd.args[0])
         return
-    if cmd.args[0] in command_dic.keys():
-        cmd.notice('%s%s: %s' % (cmd.bot.cmd_prefix, cmd.args[0],
-                                 command_dic[cmd.args[0]].__doc__))
-        return
-    cmd.notice('%s is not a command' % cmd.args[0])
+    cmd.notice(entry.help(prefix))
+
+@command(access=OWNER)
+@inline
+def jobs(cmd):
+    ''' Lists the commands running in the worker pool '''
+    pool = cmd.bot.workers
+    cmd.reply('%s running, %s queued, %s done, %s timed out, %s refused' %
+              (pool.running, pool.depth, pool.completed, pool.timed_out,
+               pool.refused))
+    running = ['%s (%s)' % (job.name, job.cmd.msg.nick)
+               for job in pool.jobs()]
+    if running:
+        cmd.reply(', '.join(running))
+
+@command(args='*target', access=OWNER)
+@inline
+def cancel(cmd):
+    ''' Cancels a command's or nick's commands, all without arguments '''
+    target = cmd.args[0]
+    if target is None:
+        count = cmd.bot.workers.cancel()
+    else:
+        entry = cmd.bot.get_command(target.lstrip(cmd.bot.cmd_prefix),
+                                    load=False)  # An alias names it too
+        name = target if entry is None else entry.name
+        count = cmd.bot.workers.cancel(name) +\
+                cmd.bot.workers.cancel(user=target)
+    cmd.reply('Cancelled %s command(s).' % count)
+
+@command(args='*module', access=OWNER, abbreviate=False)
+def reload(cmd):
+    ''' Reloads the changed plugin modules, or one by name '''
+    loader = cmd.bot.loader
+    name = cmd.args[0]
+    if name is None:
+        results = loader.reload_changed()
+        if not results:
+            cmd.reply('No plugin modules changed.')
+    else:
+        modules = [module for module in loader.loaded
+                   if name in (module, module.rpartition('.')[2])]
+        if not modules:
+            cmd.reply('%s is not loaded.  It will load as it is now the '
+                      'first time one of its commands runs.' % name)
+            return
+        results = {}
+        for module in modules:
+            try:
+                loader.reload(module)
+                results[module] = None
+            except Exception as e:
+                results[module] = e
+    for module, error in sorted(results.items()):
+        if error is None:
+            cmd.reply('Reloaded %s.' % module)
+        else:
+            cmd.reply('Could not reload %s, kept the old code: %s: %s' %
+                      (module, type(error).__name__, error))
+    if results:
+        cmd.bot.isolation.recycle()  # Isolated commands import it anew
 
 #######################################################################
 #                                                                     #
@@ -220,56 +269,75 @@ def help_(cmd):
 #                                                                     #
 #######################################################################
 
-@no_args
+@command()
+@inline
 def hbd(cmd):
     ''' A test user command definition '''
     cmd.reply("Happy bear day, %s!" % cmd.msg.nick)
 
-@as_string
+@command(name='rot13', args='message...')
+@inline
 def rot_13(cmd):
-    ''' rot13 [message] - encodes (decodes) rot13 '''
+    ''' Encodes (decodes) rot13 '''
     encoder = getencoder('rot-13')
-    cmd.reply(encoder(cmd.args)[0])
+    cmd.reply(encoder(cmd.args[0])[0])
 
-@as_string
+@command(args='text...')
+@inline
 def reverse(cmd):
-    ''' reverse [string] - Replies with string reversed '''
-    cmd.reply(cmd.args[::-1])
-
-@one_arg
+    ''' Replies with text reversed '''
+    cmd.reply(cmd.args[0][::-1])
+
+def factors(number):
+    ''' The prime factors of number, smallest first, by trial division '''
+    found = []
+    divisor = 2
+    while divisor * divisor <= number:
+        while number % divisor == 0:
+            found.append(divisor)
+            number //= divisor
+        divisor += 1 if divisor == 2 else 2
+    if number > 1:
+        found.append(number)
+    return found
+
+@command(args='number:int', cost=3)
+@limits(timeout=10, per_user=1)
+@isolated(cpu=5, memory=64 * 1024 * 1024)  # A big prime takes a while
+def factor(cmd):
+    ''' Factors a whole number into primes '''
+    number = cmd.args[0]
+    if number < 2:
+        cmd.reply('Only numbers from 2 up have prime factors.'); return
+    cmd.reply('%s = %s' % (number, ' * '.join(map(str, factors(number)))))
+
+@command(args='choice', cost=3)
 def rps(cmd):
     ''' Play rock, paper, scissors, BEAR! with the bot. '''
-    if str.lower(cmd.args[0]) == 'bear':
+    choice = cmd.args[0]
+    if str.lower(choice) == 'bear':
         cmd.action(cmd.msg.source, 'runs away..')
         return
     options = ['rock', 'paper', 'scissors']
-    if cmd.args[0] not in options:
+    if choice not in options:
         cmd.reply("That is not a valid choice. I'm not playing with you "\
                   'anymore.')
         return
     move = random.choice(options)
     cmd.reply('Rock... Paper... ')
-    if move == cmd.args[0]:
+    if move == choice:
         cmd.reply('BEARRRRR!!!!!!!!!!')
         cmd.action(cmd.msg.source, 'wins because bear eats %s and %s.' %
-                  (cmd.args[0], cmd.msg.nick))
+                  (choice, cmd.msg.nick))
         return
     cmd.reply('Scissors...')
     cmd.action(cmd.msg.source, 'forms %s with his hand.' % move)
-    if move == 'scissors' and cmd.args[0] == 'rock' or\
-            move == 'rock' and cmd.args[0] == 'paper' or\
-            move == 'paper' and cmd.args[0] == 'scissors':
+    if move == 'scissors' and choice == 'rock' or\
+            move == 'rock' and choice == 'paper' or\
+            move == 'paper' and choice == 'scissors':
         cmd.reply('Congratulations, %s, you win this time! %s beats %s :)' % 
-                  (cmd.msg.nick, cmd.args[0], move))
+                  (cmd.msg.nick, choice, move))
         return
     cmd.reply('Sorry, %s, you lost this time. %s beats %s :(' % 
-              (cmd.msg.nick, move, cmd.args[0]))
+              (cmd.msg.nick, move, choice))
     return
-
-# Dictionary of commands and their respective function references
-misc_commands = {'hbd': hbd, 'quit': quit_, 'join': join, 'part': part,
-                 'delay': delay, 'prefix': prefix, 'who': who,
-                 'action': action, 'reverse': reverse, 'bots': bots,
-                 'help': help_, 'say': say, 'rot13': rot_13, 'rps': rps}
-
-command_dic.update(misc_commands)  # Updates the master command dictionary
\ No newline at end of file
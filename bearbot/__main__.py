@@ -0,0 +1,44 @@
+'''
+Created on Oct 18, 2026
+
+Runs the bot.
+
+    python -m bearbot [--startup-profile]
+
+--startup-profile prints how long each module took to import, the
+plugins loaded so far, and how long the bot took to answer the server's
+first PING.  See the startup module.
+
+'''
+
+import argparse
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='bearbot',
+                                     description='Runs the bot')
+    parser.add_argument('--startup-profile', action='store_true',
+                        help='print import times and the time to the '
+                        'first PONG')
+    args = parser.parse_args(argv)
+    profile = None
+    if args.startup_profile:
+        from bearbot.core.startup import StartupProfile
+        profile = StartupProfile()
+        profile.start()
+    from bearbot.core import bot
+    if profile is not None:
+        profile_until_pong(profile)
+    bot.main()
+
+def profile_until_pong(profile):
+    ''' Reports the profile once the first PING has been answered '''
+    from bearbot.core.event import bus
+    from bearbot.core.plugins import loader
+    def first_pong(bot, msg):
+        bus.unsubscribe(first_pong)
+        profile.stop()
+        profile.report('first PONG', loader.loaded)
+    bus.subscribe('PING', first_pong, priority=-1)  # After ping_ answers
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+'''
+Created on Oct 18, 2026
+
+Access levels by hostmask, resolved once per user and then cached.
+
+A level is granted to a hostmask, a nick!user@host glob where * matches
+anything and ? one character, ie. *!bear@*.example.org.  Matching
+ignores case by the rfc1459 case mapping, like the server does.
+
+Masks without wildcards go in a dict.  The others are compiled into one
+regular expression per level, and the levels are tried from the highest
+down, so resolving a prefix is a dict lookup and at most one match per
+level.  The level a prefix resolves to is cached by the whole prefix, so
+checking the user behind each command is one dict lookup.  The cache
+forgets a nick's prefixes when the nick changes or quits, and all of
+them whenever a grant changes.
+
+Ex. access_list.grant('*!bear@*.example.org', 100)
+    access_list.level('Garcia!bear@home.example.org')  # 100
+
+'''
+
+import re
+import threading
+
+from bearbot.core.roster import irc_lower
+
+ANYONE = 0  # command.ANYONE, the level of prefixes no mask matches
+CACHE_SIZE = 10000  # Prefixes cached before the cache starts over
+
+def compile_mask(mask):
+    ''' The regular expression for a lowered hostmask glob '''
+    return ''.join('.*' if character == '*' else
+                   '.' if character == '?' else re.escape(character)
+                   for character in mask)
+
+def owner_mask(owner):
+    ''' The hostmask for a Bot's owner, raises ValueError for a nick
+
+    A nick alone would become nick!*@*, which anyone can match by taking
+    the nick, so the owner has to be given as nick!user@host.
+
+    '''
+    nick, bang, host = owner.partition('!')
+    if not nick or '@' not in host:
+        raise ValueError('The owner, %s, is not a hostmask (nick!user@host)'
+                         % owner)
+    return owner
+
+class AccessList(object):
+    ''' Hostmasks and the levels granted to them, see the module docs '''
+
+    def __init__(self, cache_size=CACHE_SIZE):
+        self.cache_size = cache_size
+        self._masks = {}  # Lowered mask: level
+        self._exact = {}  # Lowered mask without wildcards: level
+        self._patterns = None  # ((level, expression), ...), highest first
+        self._cache = {}  # Prefix: level
+        self._nicks = {}  # Lowered nick: set of its cached prefixes
+        self._version = 0  # Grants changed, so resolving can't cache stale
+        self._lock = threading.Lock()
+
+    def grant(self, mask, level):
+        ''' Grants level to mask, or revokes it for ANYONE '''
+        mask = irc_lower(mask)
+        with self._lock:
+            if level == ANYONE:
+                self._masks.pop(mask, None)
+            else:
+                self._masks[mask] = level
+            self._exact = dict((mask, level) for mask, level
+                               in self._masks.items()
+                               if '*' not in mask and '?' not in mask)
+            self._patterns = None
+            self._version += 1
+            self._clear()
+
+    def revoke(self, mask):
+        self.grant(mask, ANYONE)
+
+    def masks(self):
+        ''' Returns {mask: level} of every grant '''
+        return dict(self._masks)
+
+    def level(self, prefix):
+        ''' The highest level granted to a mask prefix matches '''
+        level = self._cache.get(prefix)
+        if level is None:
+            level = self._resolve(prefix)
+        return level
+
+    def forget(self, nick):
+        ''' Drops a nick's cached prefixes, ie. when it changes or quits '''
+        with self._lock:
+            for prefix in self._nicks.pop(irc_lower(nick), ()):
+                self._cache.pop(prefix, None)
+
+    def _resolve(self, prefix):
+        version = self._version
+        lowered = irc_lower(prefix)
+        best = self._exact.get(lowered, ANYONE)
+        for level, expression in self._patterns or self._compile():
+            if level <= best:
+                break
+            if expression.fullmatch(lowered):
+                best = level
+                break
+        with self._lock:
+            if version != self._version:
+                return best  # A grant changed meanwhile, resolved again next
+            if len(self._cache) >= self.cache_size:
+                self._clear()
+            self._cache[prefix] = best
+            nick = lowered.partition('!')[0]
+            self._nicks.setdefault(nick, set()).add(prefix)
+        return best
+
+    def _compile(self):
+        with self._lock:
+            if self._patterns is None:
+                levels = {}
+                for mask, level in self._masks.items():
+                    if mask not in self._exact:
+                        levels.setdefault(level, []).append(
+                                compile_mask(mask))
+                self._patterns = tuple(
+                        (level, re.compile('|'.join(levels[level]),
+                                           re.DOTALL))
+                        for level in sorted(levels, reverse=True))
+            return self._patterns
+
+    def _clear(self):
+        ''' Empties the cache (lock held) '''
+        self._cache = {}
+        self._nicks = {}
+
+access_list = AccessList()  # For callers without a bot; bots have their own
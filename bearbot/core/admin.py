@@ -2,86 +2,184 @@
 Created on Sep 27, 2013
 Garcia
 
-This module will contain administrative functions.  Currently it
-depends on a proper event/handler system and cannot be completed.
-Also, a separate database module may be in the future.
+This module holds the administrative functions: the users in the
+database, their access levels and the hostmasks they're known by.
 
-'''
-
-import sqlite3
-
-from bearbot.core import command
+A user's level applies to every message whose prefix matches one of the
+user's hostmasks.  setup() loads the grants into an AccessList, and
+set_access() and register_host() keep it in step, so checking the
+sender of a command never queries the database (see the access module).
+The tables are in the shared resources/bearbot.db (config.DATABASE), see
+the database module.
 
-db = sqlite3.connect('bearbot.db')
-c = db.cursor()
+'''
 
-def init_user_tables():
-    ''' Creates database user tables '''
-    assert c.executescript('''
-            CREATE TABLE users(
-                user_id INTEGER PRIMARY KEY NOT NULL, 
-                nick CHAR(50) NOT NULL,
-                password CHAR(12) NOT NULL,
-                acess_level INT
-            );
-            CREATE TABLE access_levels(
-                nick CHAR(50) FOREIGN KEY NOT NULL, 
-                host_mask CHAR(50) NOT NULL
-            );
-        ''')
+from bearbot.core import command, config, database
+from bearbot.core.access import access_list
+
+db = None  # The Database, opened by setup()
+
+def setup(path=config.DATABASE, access=access_list):
+    ''' Init hook: opens the database, migrates its tables, loads grants
+
+    Bots sharing the database can each call it.
+
+    '''
+    global db
+    db = database.get(path)
+    db.migrate('admin', MIGRATIONS)
+    load_access(access)
+
+def _user_tables(connection):
+    ''' Creates the user tables, replacing users from before version 1
+
+    The first users table had no unique nicks, required a password and
+    misspelled acess_level.
+
+    '''
+    columns = [row[1] for row in
+               connection.execute('PRAGMA table_info(users)')]
+    if 'acess_level' in columns:
+        connection.execute('ALTER TABLE users RENAME TO old_users')
+    for statement in database.statements(USER_TABLES):
+        connection.execute(statement)
+    if 'acess_level' in columns:
+        connection.execute('INSERT OR IGNORE INTO users (user_id, nick, '
+                           'password, access_level) SELECT user_id, nick, '
+                           'password, COALESCE(acess_level, 0) '
+                           'FROM old_users')
+        connection.execute('DROP TABLE old_users')
+
+USER_TABLES = '''
+CREATE TABLE IF NOT EXISTS users(
+    user_id INTEGER PRIMARY KEY NOT NULL,
+    nick TEXT NOT NULL UNIQUE COLLATE NOCASE,
+    password TEXT,
+    access_level INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS access_levels(
+    user_id INTEGER NOT NULL
+            REFERENCES users(user_id) ON DELETE CASCADE,
+    host_mask TEXT NOT NULL,
+    PRIMARY KEY (user_id, host_mask)
+);
+'''
+MIGRATIONS = (_user_tables,)  # Schema versions, see database.migrate
 
-    print('user and access_levels database tables created successfully.')
+def load_access(access=access_list):
+    ''' Grants every user's level to the user's hostmasks in access '''
+    for mask, level in db.query('SELECT host_mask, access_level FROM users '
+                                'JOIN access_levels USING (user_id)'):
+        access.grant(mask, level)
 
-def add_user(nick):
+def add_user(nick, password=None):
     ''' Adds user to user table in the database '''
-    if not user_exists(nick):
-        c.execute("INSERT INTO users (nick) VALUES (?);", nick)
-        db.commit()
+    db.execute('INSERT OR IGNORE INTO users (nick, password) VALUES (?, ?)',
+               (nick, password))
 
 def user_exists(nick):
     ''' Checks if user exists in the database already '''
-    c.execute('SELECT * FROM users WHERE nick=?', nick)
-    if c.fetchone() == nick:
-        return True
-    return False
-
-def set_access(nick, access_lvl):
-    ''' Sets user access level in the database '''
-    pass
+    return db.query_one('SELECT 1 FROM users WHERE nick = ?',
+                        (nick,)) is not None
+
+def set_access(nick, access_lvl, mask=None, access=access_list):
+    ''' Sets user access level in the database and in access
+
+    The user is added if needed.  mask is added to the user's
+    hostmasks; nick!*@* is never assumed, since anyone can take a nick,
+    so the level applies to no one until the user has one.  Returns the
+    user's hostmasks.
+
+    '''
+    def update(connection):
+        connection.execute('INSERT INTO users (nick, access_level) '
+                           'VALUES (?, ?) ON CONFLICT (nick) DO UPDATE SET '
+                           'access_level = excluded.access_level',
+                           (nick, access_lvl))
+        user_id, = connection.execute('SELECT user_id FROM users '
+                                      'WHERE nick = ?', (nick,)).fetchone()
+        masks = _masks(connection, user_id)
+        if mask is not None and mask not in masks:
+            connection.execute('INSERT INTO access_levels (user_id, '
+                               'host_mask) VALUES (?, ?)', (user_id, mask))
+            masks.append(mask)
+        return masks
+    masks = db.transaction(update)
+    for each in masks:
+        access.grant(each, access_lvl)
+    return masks
 
 def get_access(nick):
     ''' Returns user access level from the database '''
-    #return access_lvl
-    pass
+    row = db.query_one('SELECT access_level FROM users WHERE nick = ?',
+                       (nick,))
+    return command.ANYONE if row is None else row[0]
 
 def get_access_dic():
-    '''  '''
-    #return access_dic
-    pass
-
-def register_host(nick, password):
-    ''' Adds host to user in the database '''
-    pass
-
-# /access *[nick] *[9999] - sets, lists, and gets access levels for users
+    ''' Returns {nick: access level} of the users with a level '''
+    return dict(db.query('SELECT nick, access_level FROM users '
+                         'WHERE access_level > 0 ORDER BY nick'))
+
+def register_host(nick, mask, access=access_list):
+    ''' Adds host to user in the database, False if there's no user '''
+    def update(connection):
+        row = connection.execute('SELECT user_id, access_level FROM users '
+                                 'WHERE nick = ?', (nick,)).fetchone()
+        if row is not None:
+            connection.execute('INSERT OR IGNORE INTO access_levels '
+                               '(user_id, host_mask) VALUES (?, ?)',
+                               (row[0], mask))
+        return row
+    row = db.transaction(update)
+    if row is None:
+        return False
+    access.grant(mask, row[1])
+    return True
+
+def get_masks(nick):
+    ''' Returns the user's hostmasks from the database '''
+    return [mask for mask, in
+            db.query('SELECT host_mask FROM users JOIN access_levels '
+                     'USING (user_id) WHERE nick = ?', (nick,))]
+
+def _masks(connection, user_id):
+    ''' The user's hostmasks '''
+    return [mask for mask, in
+            connection.execute('SELECT host_mask FROM access_levels '
+                               'WHERE user_id = ?', (user_id,))]
+
+# /access *[nick] *[9999] *[mask] - sets, lists, and gets access levels
 # /access - lists all access levels
 # /access [nick] - returns user access level
-# /access [nick] [9999] - sets user access level
-def access(cmd):
-    if cmd.args is None:
-        cmd.reply('Access levels: %s' % (', ').join(get_access_dic()))
-    if len(cmd.args) == 1:
-        cmd.reply('%s has access level: %s' %
-                  (cmd.args[0], get_access(cmd.args[0])))
-    if len(cmd.args) == 2:
-        set_access(cmd.args[0], cmd.args[1])
-        cmd.reply('%s access level set to: %s' % (cmd.args[0], cmd.args[1]))
-    if len(cmd.args) > 2:
-        cmd.reply('Improper syntax. Requires: /access *[nick] *[9999] \
-                  (*optional)')
-
-init_user_tables()
-db.close()
+# /access [nick] [9999] - sets user access level, for *!user@host of
+#                         nick if the bot has seen it or the user's
+#                         hostmasks, otherwise asks for a mask
+# /access [nick] [9999] [mask] - sets it and adds a hostmask
+@command.command(args='*nick *level:int *mask', access=command.OWNER)
+def access_(cmd):
+    ''' Lists, gets or sets the access levels of users '''
+    nick, level, mask = cmd.args
+    if db is None:
+        cmd.reply('There is no database for access levels.'); return
+    if nick is None:
+        cmd.reply('Access levels: %s' % (', ').join(
+                '%s (%s)' % item for item in get_access_dic().items()))
+    elif level is None:
+        cmd.reply('%s has access level: %s' % (nick, get_access(nick)))
+    elif not command.ANYONE <= level < command.OWNER:
+        cmd.reply('Access levels go from %s to %s.' %
+                  (command.ANYONE, command.OWNER - 1))
+    else:
+        user = cmd.bot.roster.user(nick)
+        if mask is None and user is not None and user.host:
+            mask = '*!%s@%s' % (user.user, user.host)
+        if mask is None and not get_masks(nick):
+            cmd.reply('I have not seen %s, so give a hostmask: %saccess %s '
+                      '%s %s!user@host' % (nick, cmd.bot.cmd_prefix, nick,
+                                          level, nick)); return
+        masks = set_access(nick, level, mask, cmd.bot.access)
+        cmd.reply('%s access level set to: %s (%s)' %
+                  (nick, level, ', '.join(masks)))
 
 def main():
     pass
@@ -0,0 +1,267 @@
+'''
+Created on Oct 18, 2026
+
+This module holds the AsyncBot class, an asyncio engine for the Bot.
+
+The blocking Bot reads, handles and sends on one thread, so a slow
+command stops everything else.  AsyncBot splits that work into three
+tasks on an event loop:
+
+    reader     - reads the connection and frames lines into Messages
+    dispatcher - hands Messages to the event handlers
+    pacer      - writes queued lines to the server with flood control
+
+User command functions defined with 'async def' run as tasks on the
+loop.  Ordinary command functions keep working unchanged; they run in
+the bot's worker pool, where blocking calls such as bot.who() wait for
+their replies without stopping the loop.  Coroutine commands wait for a
+query with 'await bot.wait_request(bot.who(nick))'.  Both kinds count
+against the pool's limits, and a coroutine command that times out is
+cancelled on the loop.
+
+Ex. bearbot = AsyncBot('irc.rizon.net', 'Garcia!*@bears.example.org',
+                       'pass123', '#my_channel')
+    bearbot._connect()  # or: await bearbot.run_async()
+
+'''
+
+import asyncio
+import inspect
+import logging
+import threading
+from time import monotonic
+
+from bearbot.core.bot import Bot, EXCEPTION, CLOSE_TIMEOUT
+from bearbot.core.framing import ConnectionClosed
+from bearbot.core.workers import Refused
+from bearbot.core.log import Lines
+from bearbot.core import log
+
+class AsyncBot(Bot):
+    ''' Bot that runs on an asyncio event loop '''
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.irc = None  # Replaced by asyncio streams
+        self.loop = None
+        self._loop_thread = None
+        self._inbound = None  # Messages waiting for the dispatcher
+        self._wakeup = None  # Set when a line is queued for the pacer
+        self._writer = None
+        self._session_tasks = []  # Reader, dispatcher and pacer
+        self._tasks = set()  # Running command tasks
+
+    # Initialization
+
+    def _connect(self):
+        ''' Runs the bot on a new event loop until it dies '''
+        asyncio.run(self.run_async())
+        self.workers.shutdown()
+        self.isolation.shutdown()
+
+    async def run_async(self):
+        ''' Connects to the server and reconnects until the bot dies '''
+        if not log.configured():
+            log.setup()
+        self.loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._inbound = asyncio.Queue()
+        self._wakeup = asyncio.Event()
+        self.outbound.notify = lambda: self.loop.call_soon_threadsafe(
+                self._wakeup.set)
+
+        while self.alive:
+            try:
+                await self._session()
+            except (OSError, ConnectionClosed) as e:
+                self.log('%s (Connection) %s' % (EXCEPTION, e),
+                         logging.ERROR)
+            self._drop_connection()
+            if not (self.alive and self.reconnect):
+                break
+            delay = self.backoff.next()
+            self.log('Reconnecting in %.1f seconds.' % delay)
+            await asyncio.sleep(delay)
+
+    async def _session(self):
+        ''' Runs one connection until it drops '''
+        reader, self._writer = await asyncio.open_connection(
+                self.host, self.port,
+                ssl=self._ssl_context() if self.ssl else None)
+        self._register()
+
+        tasks = self._session_tasks = [
+                self.loop.create_task(self._read(reader)),
+                self.loop.create_task(self._dispatch()),
+                self.loop.create_task(self._pace())]
+        try:
+            done, pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def _drop_connection(self):
+        ''' Closes the streams and forgets per-connection state '''
+        if self._writer is not None:
+            self._save_session()
+            self._writer.close()
+            self._writer = None
+        self._reset_state()
+
+    def _save_session(self):
+        ''' Keeps the TLS session for the next connection '''
+        if self._tls is not None and self._writer is not None:
+            self._tls.save_session(self._writer.get_extra_info('ssl_object'))
+
+    # Tasks
+
+    async def _read(self, reader):
+        ''' Reads the connection and queues Messages '''
+        while True:
+            try:
+                data = await asyncio.wait_for(reader.read(self.buffer),
+                                              self.ping_timeout)
+            except asyncio.TimeoutError:
+                if self._link_dead():
+                    raise ConnectionClosed('Ping timeout: %s seconds' %
+                                           (2 * self.ping_timeout))
+                continue
+            self._awaiting_pong = False
+            if not data:
+                if not self.alive:
+                    return  # Closed by close_connection()
+                raise ConnectionClosed('Connection closed by server')
+            self.lines.feed(data)
+            for line in self.lines.lines():
+                msg = self._parse(line)
+                if msg is not None:
+                    self._inbound.put_nowait(msg)
+
+    async def _dispatch(self):
+        ''' Hands queued Messages to the handlers '''
+        while True:
+            msg = await self._inbound.get()
+            self.handle(msg)
+
+    async def _pace(self):
+        ''' Writes queued lines to the server with flood control '''
+        while True:
+            self._wakeup.clear()
+            msgs, wait = self.outbound.pop()
+            if msgs is None:
+                if wait is None:
+                    await self._wakeup.wait()
+                else:
+                    await asyncio.sleep(wait)
+                continue
+            try:
+                self._writer.write(
+                        ''.join('%s\r\n' % msg for msg in msgs).encode())
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug('%s', Lines(msgs))
+                await self._writer.drain()
+            finally:
+                self.outbound.task_done(len(msgs))
+
+    # Sending Methods
+
+    def join(self, channels, keys=None):
+        ''' Joins channel(s)
+
+        On the event loop the JOINs are only sent, since waiting for the
+        replies would stop the loop; failures are logged as they come
+        in.  From a command running in the worker pool, it waits for the
+        replies and returns the results like Bot.join does.
+
+        '''
+        if not self._on_loop():
+            return super().join(channels, keys)
+        self._send_joins(channels, keys)
+        return None
+
+    # Commands
+
+    def run_command(self, cmd_def, cmd):
+        ''' Runs coroutine commands as tasks, others in the worker pool '''
+        if not inspect.iscoroutinefunction(inspect.unwrap(cmd_def)):
+            return super().run_command(cmd_def, cmd)
+        try:
+            job = self.workers.admit(cmd_def, cmd)
+        except Refused as e:
+            cmd.notice(str(e))
+            return
+        coro = cmd_def(cmd)  # None if a decorator refused the command
+        if coro is None:
+            self.workers.release(job)
+            return
+        task = self.loop.create_task(coro)
+        job.on_cancel = lambda: self.loop.call_soon_threadsafe(task.cancel)
+        if job.timeout:
+            handle = self.loop.call_later(job.timeout, self.workers.expire,
+                                          job)
+            task.add_done_callback(lambda task: handle.cancel())
+        self._tasks.add(task)
+        task.add_done_callback(lambda task: self._command_done(task, job))
+
+    def _command_done(self, task, job):
+        self._tasks.discard(task)
+        self.workers.release(job)
+        if not task.cancelled() and task.exception() is not None:
+            self.log('! User command exception: %s' % task.exception(),
+                     logging.ERROR)
+
+    # Utils
+
+    def _wait_for(self, request, timeout):
+        ''' Blocks a command in the worker pool until request is done '''
+        if self._on_loop():
+            raise RuntimeError('Waiting for replies would block the event '
+                               'loop, use wait_request()')
+        return request.done.wait(timeout)
+
+    async def wait_request(self, request, timeout=None):
+        ''' Waits for a Request on the loop and returns its replies '''
+        future = self.loop.create_future()
+        request.add_done_callback(lambda request:
+                self.loop.call_soon_threadsafe(_resolve, future))
+        if timeout is None:
+            timeout = max(0, request.deadline - monotonic())
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            request.expire()
+        return request.replies
+
+    def _on_loop(self):
+        return threading.get_ident() == self._loop_thread
+
+    def close_connection(self):
+        ''' Flushes queued lines and closes the connection '''
+        self.alive = False
+        if self._on_loop():
+            self.loop.create_task(self._close())
+        else:
+            asyncio.run_coroutine_threadsafe(self._close(), self.loop)
+
+    async def _close(self):
+        deadline = self.loop.time() + CLOSE_TIMEOUT
+        while self.outbound.unfinished and self.loop.time() < deadline:
+            await asyncio.sleep(.05)
+        if self._writer is not None:
+            self._writer.close()
+            try:  # TLS waits for the server to confirm the shutdown
+                await asyncio.wait_for(self._writer.wait_closed(),
+                                       CLOSE_TIMEOUT)
+            except (asyncio.TimeoutError, OSError):
+                pass
+        for task in self._session_tasks:
+            task.cancel()
+
+def _resolve(future):
+    if not future.done():
+        future.set_result(None)
@@ -7,21 +7,39 @@ functionality.  Anything beyond that scope should be in a different
 module.
 
 Note: The msg_gen produces an infinite amount of messages for the
-      duration of the bot's life. There's a get_reply method that
-      waits for a particular server reply and returns it. It is very
-      helpful. It throws all the messages to the handle method until it
-      finds what its looking for and then returns flow back to the
-      listener.
+      duration of the bot's life.  Queries such as who() register a
+      Request for the replies they expect before sending, and every
+      message handled is offered to those requests (see the pending
+      module).  Only commands in the worker pool can wait on a
+      Request; waiting from the reader thread, which is the one that
+      would read the replies, raises RuntimeError, as waiting on
+      AsyncBot's event loop does.
 
 '''
 
 import socket, ssl
 import platform
+import logging
+import threading
 from time import sleep
 
 from bearbot.core.message import *
 from bearbot.core.event import *
-from bearbot.core import config
+from bearbot.core.framing import LineBuffer, ConnectionClosed, MAX_LINE
+from bearbot.core.encoding import Decoder, ENCODINGS, command_token,\
+                                  param_token
+from bearbot.core.connection import Backoff, client_context
+from bearbot.core.roster import Roster, irc_lower
+from bearbot.core.pending import PendingRequests, Request
+from bearbot.core.outbound import OutboundQueue, HIGH, ADMIN, NORMAL
+from bearbot.core.command import registry, OWNER, ANYONE
+from bearbot.core.access import AccessList, owner_mask
+from bearbot.core.workers import CommandPool, Refused, WORKERS
+from bearbot.core.isolation import IsolatedPool, PROCESSES
+from bearbot.core.throttle import Throttle
+from bearbot.core.plugins import loader
+from bearbot.core import admin, config, log
+from bearbot.core.log import Lines
 
 # Metadata
 
@@ -36,6 +54,12 @@ source = 'https://github.com/FrederickGarcia/Bearbot'
 
 EXCEPTION = '! EXCEPTION OCCURRED - '
 CRLF = '\r\n'.encode()
+CLOSE_TIMEOUT = 5  # Seconds to flush queued lines before closing
+MAX_COMMAND = 510  # Bytes in a line to the server, without CRLF
+
+# Error reply commands from IRC RFC 2812 for JOIN
+JOIN_ERRORS = ('403', '405', '407', '437', '471', '473', '474', '475',
+               '476', '479')
 
 class Bot(object):
     ''' Connects to an irc server and listens to incoming messages
@@ -44,46 +68,212 @@ class Bot(object):
     creates Message objects to pass to a message handler.  To drive
     this class, create a Bot object and use its connect command.
 
-    Ex. bearbot = Bot('irc.rizon.net', 'Garcia', 'pass123',
-                      '#my_channel')
+    The owner is a hostmask, ie. Garcia!*@bears.example.org; the owner
+    can run every command.
+
+    Ex. bearbot = Bot('irc.rizon.net', 'Garcia!*@bears.example.org',
+                      'pass123', '#my_channel')
         bearbot._connect()
 
     '''
 
     def __init__(self, host, owner, password, channels, user_name='Bear',
                  nick='Bearbot', real_name='I am the bearest', cmd_prefix='.',
-                 buffer=4096, port=9999, msg_delay=.5, ssl=True):
+                 buffer=4096, port=9999, msg_delay=.5, ssl=True,
+                 max_line=MAX_LINE, bulk_read=True, flood_burst=4,
+                 commands=None, reconnect=True, ping_timeout=120,
+                 encodings=ENCODINGS, events=None, workers=WORKERS,
+                 processes=PROCESSES, throttle=None, plugins=config.PLUGINS,
+                 access=None, database=config.DATABASE):
         
         self.host = host
-        self.owner = owner
+        self.logger = log.get_logger(host)  # See the log module
+        self.owner = owner.partition('!')[0]  # owner is a hostmask
+        self.access = AccessList() if access is None else access  # Own
+        try:
+            self.access.grant(owner_mask(owner), OWNER)
+        except ValueError as e:  # A bare nick, anyone could take it
+            self.log('! %s, so no one owns the bot.' % e, logging.WARNING)
+        if database is not None:
+            admin.setup(database, self.access)  # Users' access levels
         self.password = password
         self.channels = self._set_channels(channels)
         self.user_name = user_name
-        self.nick = nick
+        self.nick = nick  # The nick the server knows the bot by
+        self.preferred_nick = nick  # Registered with on every connection
         self.realname = real_name
         self.cmd_prefix = cmd_prefix
+        self.commands = commands  # Enabled command roots (None for all)
         self.buffer = buffer  # Buffer size in bytes
+        self.lines = LineBuffer(buffer, max_line, bulk_read)  # Framing
+        self.decoder = Decoder(encodings)  # Fallback chain, ie. utf-8, cp1252
+        self._command_names = {}  # Command bytes: str, for _parse
         self.port = port
         self.msg_delay = msg_delay  # Flood control
+        self.outbound = OutboundQueue(self._flood_rate(msg_delay),
+                                      flood_burst)
         self.ssl = ssl
         self.alive = True  # Running status
+        self.reconnect = reconnect  # Reconnects when the link drops
+        self.ping_timeout = ping_timeout  # Seconds of silence before PING
+        self.registered = False  # Server accepted NICK/USER (001)
+        self.ready = False  # Server finished its greeting (376/422)
+        self.isupport = {}  # Features the server announced (005)
+        self.roster = Roster()  # Channels and users seen
+        self.pending = PendingRequests()  # Queries waiting for replies
+        self.events = bus if events is None else events  # Event handlers
+        self.workers = CommandPool(workers)  # Threads running commands
+        self.isolation = IsolatedPool(processes)  # For @isolated commands
+        self.throttle = Throttle() if throttle is None else throttle
+        self.throttle.on_ignore = self._ignored  # Inbound request limits
+        self.backoff = Backoff()  # Delays between reconnects
+        self.loader = loader  # Loads plugin modules on first use
+        for package in plugins:
+            self.loader.add(package)  # Stubs, nothing is imported yet
         self.irc = socket.socket()
         self.version = '%s / %s' % (version, system_info)
+        self._tls = None  # TLS context, kept to resume sessions
+        self._awaiting_pong = False
+        self._writer_thread = None
+        self._reader_thread = None
     
     # Initialization
     
     def _connect(self):
-        ''' Connects to server and configures irc details  '''
-        self.irc.connect((self.host, self.port))
-        
+        ''' Connects to the server and reconnects until the bot dies '''
+        if not log.configured():
+            log.setup()
+        while self.alive:
+            try:
+                self._open()
+                self._listen()
+            except (OSError, ConnectionClosed) as e:
+                self.log('%s (Connection) %s' % (EXCEPTION, e),
+                         logging.ERROR)
+            self._drop_connection()
+            if not (self.alive and self.reconnect):
+                break
+            delay = self.backoff.next()
+            self.log('Reconnecting in %.1f seconds.' % delay)
+            sleep(delay)
+        self.workers.shutdown()
+        self.isolation.shutdown()
+
+    def _open(self):
+        ''' Opens the connection and registers with the server '''
+        self.irc = socket.create_connection((self.host, self.port),
+                                            self.ping_timeout)
         if self.ssl:
-            self.irc = ssl.wrap_socket(self.irc)
-        
-        self.set_nick(self.nick)
-        self.send('USER %s 0 * :%s' % (self.user_name, self.realname))
-        errors = self.join(self.channels)
-        self._listen()
-    
+            self.irc = self._ssl_context().wrap_socket(
+                    self.irc, server_hostname=self.host)
+        if self._writer_thread is None:
+            self._writer_thread = threading.Thread(
+                    target=self._write_loop, name='bearbot-writer',
+                    daemon=True)
+            self._writer_thread.start()
+        self._register()
+
+    def _register(self):
+        ''' Sends NICK and USER, JOINs follow the server's welcome
+
+        Each connection asks for preferred_nick again, even if the last
+        one fell back to another nick because it was in use.
+
+        '''
+        self.nick = self.preferred_nick
+        self.outbound.put_many(
+                ['NICK %s' % self.nick,
+                 'USER %s 0 * :%s' % (self.user_name, self.realname)],
+                priority=HIGH)
+
+    def on_welcome(self):
+        ''' Called on RPL_WELCOME (001) once registration succeeded
+
+        Resets the reconnect backoff.
+
+        '''
+        self.registered = True
+        self.backoff.reset()
+        self._save_session()
+
+    def on_ready(self):
+        ''' Called at the end of the MOTD (376) or on ERR_NOMOTD (422)
+
+        The server has announced its limits (005) by then, so every
+        channel is joined in one burst of packed JOIN lines.
+
+        '''
+        if self.ready:
+            return  # A MOTD someone asked for later
+        self.ready = True
+        self._send_joins(self.channels, priority=HIGH)
+
+    def set_isupport(self, tokens):
+        ''' Applies RPL_ISUPPORT (005) tokens from the server '''
+        for name, value in tokens.items():
+            if name.startswith('-'):
+                self.isupport.pop(name[1:], None)
+            else:
+                self.isupport[name] = value
+        if tokens.get('PREFIX'):
+            self.roster.set_prefix(tokens['PREFIX'])
+        if 'CHANMODES' in tokens:
+            self.roster.set_chanmodes(tokens['CHANMODES'])
+        if tokens.get('CHANTYPES'):
+            self.roster.chantypes = tokens['CHANTYPES']
+
+    def _drop_connection(self):
+        ''' Closes the socket and forgets per-connection state '''
+        self._save_session()
+        try:
+            self.irc.close()
+        except OSError:
+            pass
+        self._reset_state()
+
+    def _reset_state(self):
+        ''' Forgets what belonged to the last connection '''
+        self.lines.clear()
+        self.outbound.clear()
+        self.roster.clear()
+        self.pending.clear()
+        self.isupport.clear()
+        self.registered = False
+        self.ready = False
+        self._awaiting_pong = False
+
+    def _ssl_context(self):
+        ''' Returns the bot's SSL context, created on first use
+
+        One context is kept for the bot's life so reconnects can resume
+        the previous TLS session.
+
+        '''
+        if self._tls is None:
+            self._tls = client_context()
+        return self._tls
+
+    def _save_session(self):
+        ''' Keeps the TLS session for the next connection '''
+        if self._tls is not None and isinstance(self.irc, ssl.SSLSocket):
+            try:
+                self._tls.save_session(self.irc)
+            except (OSError, ValueError):
+                pass
+
+    def _link_dead(self):
+        ''' Called when the server has been silent for ping_timeout
+
+        Sends a PING the first time and returns True if the server
+        stayed silent after it.
+
+        '''
+        if self._awaiting_pong:
+            return True
+        self._awaiting_pong = True
+        self.send('PING :%s' % self.host, priority=HIGH)
+        return False
+
     def _set_channels(self, channels):
         ''' Sets channels as list '''
         if isinstance(channels, str):
@@ -91,76 +281,268 @@ class Bot(object):
         return channels
     
     def _listen(self):
+        self._reader_thread = threading.get_ident()
         while self.alive:
             for msg in self.msg_gen():
                 self.handle(msg)
     
     def msg_gen(self):
-        ''' Provides messages until bot dies '''
-        for msg in self.irc.recv(self.buffer).split(CRLF):
-            if not len(msg) > 3:
-                continue
+        ''' Reads the socket once and provides every complete message
+
+        Partial lines are kept in the receive buffer until the rest of
+        the line arrives with a later read.
+
+        '''
+        try:
+            self.lines.fill(self.irc)
+        except socket.timeout:
+            if self._link_dead():
+                self.irc.close()
+                raise ConnectionClosed('Ping timeout: %s seconds' %
+                                       (2 * self.ping_timeout))
+            return
+        self._awaiting_pong = False
+        for line in self.lines.lines():
+            msg = self._parse(line)
+            if msg is not None:
+                yield msg
+
+    def _parse(self, line):
+        ''' Returns a Message from a raw line, or None
+
+        Lines are only decoded when their command has a parser in
+        message.server_commands, a handler subscribed on self.events or
+        a pending request waiting for it.  Other lines are dropped
+        without creating a Message.
+
+        '''
+        if not len(line) > 3:
+            return None
+        command, at = command_token(line)
+        name = self._command_names.get(command)
+        if name is None:
+            name = self._command_name(command)
+        if name not in server_commands and not self.events.handles(name)\
+                and name not in self.pending:
+            return None
+        try:
+            return Message(self.decoder.decode(line, param_token(line, at)))
+        except Exception as e:
+            self.log('%s %s' % (EXCEPTION, e), logging.ERROR)
+
+    def _command_name(self, command):
+        ''' Returns command bytes as str, remembering common ones '''
+        name = command.decode('ascii', 'replace')
+        if len(self._command_names) < 1024:
+            self._command_names[command] = name
+        return name
+
+    def _write_loop(self):
+        ''' Writes queued lines as flood control allows them out
+
+        Each batch of lines is joined and written with one send call.
+
+        '''
+        while True:
+            msgs = self.outbound.get()
+            if msgs is None:
+                return
             try:
-                yield Message(msg.decode())
-            except Exception as e:
-                self.log('%s %s\n' % (EXCEPTION, str(e)))
+                self._write(''.join('%s\r\n' % msg for msg in msgs).encode())
+                if self.logger.isEnabledFor(logging.DEBUG):
+                    self.logger.debug('%s', Lines(msgs))
+            except OSError as e:
+                self.log('%s (Write) %s' % (EXCEPTION, e), logging.ERROR)
+            finally:
+                self.outbound.task_done(len(msgs))
+
+    def _write(self, data):
+        ''' Writes all of data, resuming after partial sends '''
+        view = memoryview(data)
+        while view:
+            view = view[self.irc.send(view):]
 
     # Sending Methods
    
-    def send(self, msg):
-        ''' Sends message to the host using socket '''
-        self.irc.send(('%s\r\n' % msg).encode())
-        self.log('>> %s ' % msg)
-        sleep(self.msg_delay)
+    def send(self, msg, target=None, priority=NORMAL):
+        ''' Queues a message for the server and returns immediately
+
+        The priority is one of the outbound lanes (HIGH, ADMIN or
+        NORMAL) and the target is used to take turns between channels.
+
+        '''
+        self.outbound.put(msg, target, priority)
     
-    def send_generic(self, command, target, message):
-        ''' Sends a message to a target using a command '''
-        self.send('%s %s :%s' % (command, target, message))
+    def send_generic(self, command, target, message, priority=NORMAL):
+        ''' Sends a message to a target using a command
 
-    def say(self, target, message):
+        A message with several lines is sent as one message per line,
+        queued together so they leave in the same write.
+
+        '''
+        self.outbound.put_many(['%s %s :%s' % (command, target, line)
+                                for line in message.split('\n')],
+                               target, priority)
+
+    def say(self, target, message, priority=NORMAL):
         ''' Sends  PRIVMSG to target (user|#channel) '''
-        self.send_generic('PRIVMSG', target, message)
+        self.send_generic('PRIVMSG', target, message, priority)
     
-    def notice(self, target, message):
+    def notice(self, target, message, priority=NORMAL):
         ''' Sends NOTICE to target with message '''
-        self.send_generic('NOTICE', target, message)
+        self.send_generic('NOTICE', target, message, priority)
     
-    def action(self, target, action_msg):
+    def action(self, target, action_msg, priority=NORMAL):
         ''' Performs an action (/me msg) '''
-        self.say(target, '\001ACTION %s\001' % action_msg)
+        self.say(target, '\001ACTION %s\001' % action_msg, priority)
     
     def quit(self, quit_msg=''):
         ''' Disconnects from the irc server '''
-        self.send('QUIT :%s' % quit_msg)
+        self.send('QUIT :%s' % quit_msg, priority=ADMIN)
         
     def set_nick(self, nick):
         ''' Changes bot's nickname '''
-        self.send('NICK %s' % nick)
+        self.send('NICK %s' % nick, priority=HIGH)
         # Requires checking for nick change success
         # Needs to change self.nick on success
     
-    def join(self, channels):
-        ''' Joins channel(s) and returns None or error messages '''
-        
-        # Error reply commands from IRC RFC 2812 for JOIN
-        errors = ['403', '405', '407', '437', '461',
-                  '471', '473', '474', '475', '476', '479']
-        error_msgs = []
-        
+    def join(self, channels, keys=None):
+        ''' Joins channel(s) and returns {channel: None or error}
+
+        keys maps channels to their keys.  All the JOINs are sent at
+        once, packed into as few lines as the server allows, and the
+        replies for every channel are collected together.  The error is
+        the server's reason, ie. 'Cannot join channel (+b) (474)'.
+
+        '''
+        requests = self._send_joins(channels, keys)
+        results = {}
+        for channel, request in requests.items():
+            if request is None or isinstance(request, str):  # Not sent
+                results[channel] = request
+                continue
+            request.result()
+            results[channel] = self._join_error(request)
+        return results
+
+    def _send_joins(self, channels, keys=None, priority=NORMAL):
+        ''' Registers a Request per channel and queues the JOIN lines
+
+        Returns {channel: Request}.  Channels the bot is already in map
+        to None, and channels over the server's CHANLIMIT to the reason.
+
+        '''
         if isinstance(channels, str):  # Forces list
             channels = [channels,]
-
+        keys = keys or {}
+        requests, sending = {}, []
+        room = self._chanlimit()
         for channel in channels:
-            self.send('JOIN %s' % channel)
-            for reply in self.get_reply(kill=errors+['353']):  # Verify join success
-                if reply.command in errors:
-                    channels.remove(channel)
-                    error_msgs.append(reply)
-        self.channels.append(channels)
-        
-        if error_msgs == []:
+            if channel in requests:
+                continue
+            if self.roster.channel(channel) is not None:
+                requests[channel] = None
+                continue
+            prefix = channel[:1]
+            if room.get(prefix) is not None:
+                if room[prefix] <= 0:
+                    requests[channel] = 'Channel limit reached (CHANLIMIT)'
+                    continue
+                room[prefix] -= 1
+            request = self.request_for(
+                    channel, ('JOIN', '353'), ('366',), JOIN_ERRORS,
+                    accept=self._own_join)
+            request.add_done_callback(self._join_done)
+            requests[channel] = request
+            sending.append(channel)
+        self.outbound.put_many(self._join_lines(sending, keys),
+                               priority=priority)
+        return requests
+
+    def _own_join(self, msg):
+        ''' Only the bot's own JOIN echo answers a join request '''
+        return msg.command != 'JOIN' or \
+               irc_lower(msg.nick) == irc_lower(self.nick)
+
+    def _join_done(self, request):
+        ''' Keeps self.channels up to date as joins finish '''
+        error = self._join_error(request)
+        if error is None:
+            if request.target not in self.channels:
+                self.channels.append(request.target)
+        else:
+            self.log('Could not join %s: %s' % (request.target, error),
+                     logging.WARNING)
+
+    def _join_error(self, request):
+        ''' Returns None if a join request succeeded, or the reason '''
+        if request.error is not None:
+            return '%s (%s)' % (request.error.trailing or 'Refused',
+                                request.error.command)
+        if request.ok or request.replies:  # 366 or at least the echo
             return None
-        return error_msgs
+        return 'No reply from the server'
+
+    def _join_lines(self, channels, keys=None):
+        ''' Packs channels into as few JOIN lines as the server allows
+
+        Lines stay within 512 bytes and the server's TARGMAX for JOIN.
+        Channels with keys go first in each line, since keys are
+        matched to channels by position.
+
+        '''
+        keys = keys or {}
+        channels = [channel for channel in channels if keys.get(channel)] + \
+                   [channel for channel in channels if not keys.get(channel)]
+        most = self._targmax('JOIN')
+        lines, targets, line_keys = [], [], []
+        size = len('JOIN ')
+        for channel in channels:
+            key = keys.get(channel)
+            extra = len(channel.encode()) + 1
+            if key:
+                extra += len(key.encode()) + 1
+            if targets and (size + extra > MAX_COMMAND or
+                            most and len(targets) >= most):
+                lines.append(self._join_line(targets, line_keys))
+                targets, line_keys, size = [], [], len('JOIN ')
+            targets.append(channel)
+            if key:
+                line_keys.append(key)
+            size += extra
+        if targets:
+            lines.append(self._join_line(targets, line_keys))
+        return lines
+
+    def _join_line(self, channels, keys):
+        if keys:
+            return 'JOIN %s %s' % (','.join(channels), ','.join(keys))
+        return 'JOIN %s' % ','.join(channels)
+
+    def _targmax(self, command):
+        ''' Most targets per command from TARGMAX, None if unlimited '''
+        for entry in self.isupport.get('TARGMAX', '').split(','):
+            name, _, most = entry.partition(':')
+            if name.upper() == command and most.isdigit():
+                return int(most)
+        return None
+
+    def _chanlimit(self):
+        ''' Channels the bot may still join by prefix, from CHANLIMIT
+
+        Prefixes without a limit are left out.
+
+        '''
+        room = {}
+        for entry in self.isupport.get('CHANLIMIT', '').split(','):
+            prefixes, _, most = entry.partition(':')
+            if not most.isdigit():
+                continue
+            joined = sum(1 for channel in self.roster.channels.values()
+                         if channel.name[:1] in prefixes)
+            for prefix in prefixes:
+                room[prefix] = int(most) - joined
+        return room
         
     def part(self, channels, message=''):
         ''' Parts channel(s) with optional message '''
@@ -169,60 +551,162 @@ class Bot(object):
 
         for channel in channels:
             self.send('PART %s %s' % (channel, message))
-        self.channels.remove(channels)
+            if channel in self.channels:
+                self.channels.remove(channel)
     
-    def log(self, message):
-        ''' Logs messages to the console '''
+    def log(self, message, level=logging.INFO):
+        ''' Logs a message on the bot's logger (see the log module) '''
         if not message is None:
-            try:
-                print(str(message))  #logs to console
-            except Exception as e:
-                print('%s %s' % (EXCEPTION, e))
+            self.logger.log(level, '%s', message)
     
     # Receiving methods
     
     def who(self, target):
-        ''' Sends who command and returns reply '''
-        self.send('WHO %s' % target)
-        return self.get_reply('352', kill=['315', '401', '403'])
+        ''' Returns who information for a nick or channel
+
+        The roster answers when it knows the target.  Otherwise this
+        sends a WHO and returns the Request for the server's replies,
+        which can be iterated once they arrive.
+
+        '''
+        cached = self.roster.who(target)
+        if cached is not None:
+            return cached
+        return self.request('WHO %s' % target, self._reply_key(target),
+                            ('352',), ('315',), ('401', '403'))
         # 352 RPL_WHOREPLY, 315 RPL_ENDOFWHO, 401 ERR_NOSUCHNICK,
         # 403 ERR_NOSUCHCHANNEL
     
     def names(self, target):
-        ''' Sends names command and returns reply '''
-        self.send('NAMES %s' % target)
-        return self.get_reply('353', kill=['366', '402'])
+        ''' Sends names command and returns the Request for its replies '''
+        return self.request('NAMES %s' % target, target, ('353',),
+                            ('366',), ('402',))
         # 353 RPL_NAMREPLY, 366 RPL_ENDOFNAMES, 402 ERR_NOSUCHSERVER
 
     # Utils
-    
-    def get_reply(self, commands=[], kill=[]):
-        ''' Generator to return server command replies
-        
-        The commands parameter is the server reply command for the
-        message reply to be returned (ie. '352' for a RPL_WHOREPLY).
-        
-        The kill parameter is the server reply command that signifies
-        StopIteration.  (ie. ['315', '401', '403'] for RPL_ENDOFWHO,
-        ERR_NOSUCHNICK, and ERR_NOSUCHCHANNEL.  If None by default,
-        StopIteration occurs on first command found in commands.
-        
+
+    def request(self, line, target, items=(), terminators=(), errors=(),
+                timeout=None):
+        ''' Sends a query and returns a Request for its replies
+
+        The Request is registered before the line is queued, so no
+        reply can arrive before it.  target is what the replies name
+        (ie. the channel of a NAMES), or None to take replies for any
+        target.
+
         '''
-        while True:
-            for msg in self.msg_gen():
-                self.handle(msg)
-                if msg.command in commands:
-                    if kill is []:
-                        return msg
-                    yield msg
-                if msg.command in kill:
-                    return msg
+        request = self.request_for(target, items, terminators, errors,
+                                   timeout)
+        self.send(line, target)
+        return request
+
+    def request_for(self, target, items=(), terminators=(), errors=(),
+                    timeout=None, accept=None):
+        ''' Registers a Request for replies to a query sent separately '''
+        kwargs = {} if timeout is None else {'timeout': timeout}
+        request = Request(target, items, terminators, errors, accept=accept,
+                          **kwargs)
+        request.wait = self._wait_for
+        return self.pending.register(request)
+
+    def _wait_for(self, request, timeout):
+        ''' Blocks until request is done or timeout seconds pass
+
+        Commands wait in the worker pool for the reader to fill the
+        request in.  The reader thread itself (an event handler or an
+        @inline command) can't wait for replies only it would read, so
+        it gets a RuntimeError, as on AsyncBot's event loop.
+
+        '''
+        if threading.get_ident() == self._reader_thread:
+            raise RuntimeError('Waiting for replies would block the reader '
+                               'thread, run the command in the pool')
+        return request.done.wait(timeout)
+
+    def _reply_key(self, target):
+        ''' Returns target, or None if replies can't name it (a mask) '''
+        if '*' in target or '?' in target or ',' in target:
+            return None
+        return target
 
-    
     def handle(self, msg):
         ''' Handles Messages '''
-        self.log('<< %s' % (msg.raw))
-        SpaghettiHandler(self, msg)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('<< %s', msg, extra={'command': msg.command})
+        self.events.dispatch(self, msg)
+        self.pending.feed(msg)
+
+    def get_command(self, root, load=True):
+        ''' Returns the command Entry root resolves to if it's enabled
+
+        root can be a command's name, alias or unique abbreviation.  A
+        plugin's command loads its module the first time it's asked for,
+        unless load is False, ie. to read its help.
+
+        '''
+        entry = registry.resolve(root)
+        if entry is None or self.commands is not None and\
+                entry.name not in self.commands:
+            return None
+        if load and getattr(entry.function, 'plugin', None):
+            return self.loader.unstubbed(entry)
+        return entry
+
+    def available_commands(self):
+        ''' Returns the Entries of the commands enabled for this bot '''
+        return [entry for entry in registry.entries()
+                if self.commands is None or entry.name in self.commands]
+
+    def allow(self, msg, cost=1):
+        ''' True unless msg's sender or channel is over its request rate
+
+        For user commands and CTCP requests, see the throttle module.
+        The owner is never throttled.
+
+        '''
+        if self.access_level(msg) >= OWNER:
+            return True
+        channel = msg.source if self.roster.is_channel(msg.source) else None
+        return self.throttle.allow(msg, cost, channel)
+
+    def _ignored(self, msg, seconds):
+        self.log('Ignoring %s (%s) for %s seconds: too many requests' %
+                 (msg.nick, msg.uhost, seconds), logging.WARNING)
+        self.notice(msg.nick, 'You are sending requests too fast.  They '
+                    'will be ignored for %s seconds.' % seconds)
+
+    def access_level(self, msg):
+        ''' Returns the access level of the user who sent msg
+
+        The level granted to the hostmasks msg's prefix matches, see
+        the access module.  It's cached by prefix, so after a user's
+        first message this is one dict lookup.
+
+        '''
+        if msg.nick is None:
+            return ANYONE  # The server
+        return self.access.level(msg.prefix)
+
+    def run_command(self, cmd_def, cmd):
+        ''' Runs a user command function in the worker pool
+
+        Commands marked @inline run right away on the calling thread.
+        A command the pool refuses gets a NOTICE saying why.
+
+        '''
+        if getattr(cmd_def, 'inline', False):
+            cmd_def(cmd)
+            return
+        try:
+            self.workers.submit(cmd_def, cmd)
+        except Refused as e:
+            cmd.notice(str(e))
+
+    def _flood_rate(self, seconds):
+        ''' Lines per second allowed for a message delay (None = any) '''
+        if not seconds:
+            return None
+        return 1 / seconds
 
     def set_msg_delay(self, seconds):
         ''' Sets delay for messages '''
@@ -230,18 +714,23 @@ class Bot(object):
             if not 0 <= seconds <= 10:
                 return
             self.msg_delay = seconds
+            self.outbound.set_rate(self._flood_rate(seconds))
             self.log('Message delay set to: %s seconds ' % seconds)
         except Exception as e:
-            self.log('%s (Message delay) ' % (EXCEPTION, e))
+            self.log('%s (Message delay) %s' % (EXCEPTION, e),
+                     logging.ERROR)
 
     def close_connection(self):
-        ''' Closes the irc connection '''
+        ''' Flushes queued lines and closes the irc connection '''
+        self.outbound.join(CLOSE_TIMEOUT)
+        self.outbound.close()
         self.irc.shutdown(socket.SHUT_RDWR)
         self.irc.close()
 
 def main():
     ''' Driver '''
-    bearbot = Bot('irc.rizon.net', 'Garcia', 'hbdhbd123', '#botparty')
+    bearbot = Bot('irc.rizon.net', 'Garcia!*@Garcia.users.rizon.net',
+                  'hbdhbd123', '#botparty')
     bearbot._connect()
 
 if __name__ == '__main__':
@@ -3,24 +3,41 @@ Created on Sep 18, 2013
 @author: Garcia
 
 This module is for user commands.  User commands are commands received
-by the bot from irc users in PRIVMSG's.  The Command class creates a
-user command object and runs the user commands' associated functions
-passing the user command object to them.  Functions for user commands
-can be defined in different modules.  This module provides ease for
-defining command functions, or other structures, that trigger when the
-bot receives a user command.
+by the bot from irc users in PRIVMSG's.  Command functions can be
+defined in different modules and register themselves in the command
+registry with the @command decorator, declaring once what they take:
+
+    @command(args='nick *seconds:float', access=OWNER,
+             aliases=('tb',))
+    def timeban(cmd):
+        nick, seconds = cmd.args
+
+The registry compiles the declaration into one validator when the
+command is registered.  When a user runs the command, the validator
+checks access and arguments and converts them, so the function gets
+cmd.args as a list of values, one per argument, or replies to the user
+and the function isn't called.  Commands can also be run by a unique
+abbreviation of their name (.rev for .reverse), and the help command
+is generated from the same declarations and the function docstrings.
 
 For examples and a robust description of how to use this module, see
 the misc_commands module.
 
 '''
 
-import re
+import threading
+from contextlib import contextmanager
 from functools import wraps
 
-# Dictionary of commands and associated functions
-# Updated from modules containing command definitions
-command_dic = {}
+from bearbot.core.outbound import ADMIN, NORMAL
+from bearbot.core.isolation import isolated
+
+# Access levels
+ANYONE = 0  # Users without an access level
+ADMINISTRATOR = 1000  # Admins, who @admin lets in
+OWNER = 10000  # The bot's owner, above every level users can be given
+
+MIN_ABBREVIATION = 2  # Shortest abbreviation of a command name
 
 class Command(object):
     ''' Creates PRIVMSG command objects from user commands.
@@ -28,40 +45,46 @@ class Command(object):
     All user commands have a prefix, root, and arguments.
     Subsequential arguments are separated by spaces.  This class
     creates an object for each command with root (string) and arguments
-    (list) attributes.  It then runs the associated command function
-    depending on its root.
+    (list) attributes.
 
     Command: <prefix> <root> <args>
     Example: <.>      <quit> <['Bye','everyone!']>
     Raw:     <Garcia> .quit Bye everyone!
              * Bearbot has quit (Quit: Bye everyone!)
 
-    This class is also a proxy class to the Bot class to make command
-    definitions simpler.  However, using proxy methods in command
-    function definitions reduces performance slightly.  It's only for
-    ease of use. Also, be careful when using proxy attributes.  They
-    are shallow copies and will not change the Bot attributes.
+    root is what the user typed and name the registered name it
+    resolved to (.rev runs 'reverse').  args are the words after the
+    root, or None, until the command's validator converts them.
+
+    The sending methods are shortcuts to the Bot's.  Replies to the
+    owner and admins go out in the ADMIN lane of the outbound queue,
+    ahead of other users' replies.  Once the command is cancelled (see
+    the workers module) its replies are dropped.
     '''
 
-    def __init__(self, bot, msg):
+    __slots__ = ('bot', 'msg', 'content', 'root', 'name', 'args',
+                 'priority', 'job')
+
+    def __init__(self, bot, msg, entry=None, words=None):
         self.bot, self.msg = bot, msg
-        self.content = msg.content[1:].split()
-        self.root, self.args = self.content[0], None
-        if len(self.content) > 1:
-            self.args = self.content[1:]
-    
-    def __getattr__(self, attr):
-        ''' Makes class a proxy class to Bot '''
-        return getattr(self.bot, attr)
-    
-    # Overriden Methods
-    
-    def notice(self, message):
-        ''' Sends NOTICE response to user command '''
-        self.bot.notice(self.msg.nick, message)
+        if words is None:
+            words = msg.content[1:].split()
+        self.content = words
+        self.root, self.args = words[0], None
+        self.name = self.root if entry is None else entry.name
+        if len(words) > 1:
+            self.args = words[1:]
+        self.priority = ADMIN if bot.access_level(msg) >= ADMINISTRATOR\
+                        else NORMAL
+        self.job = None  # The workers.Job running the command, if any
     
     # Accessors
-    
+
+    @property
+    def cancelled(self):
+        ''' True once the command timed out or was cancelled '''
+        return self.job is not None and self.job.cancelled.is_set()
+
     @property
     def cmd_prefix(self):
         return self.bot.cmd_prefix
@@ -75,27 +98,362 @@ class Command(object):
     # Command methods
 
     def reply(self, message):
-        ''' Replies to user command source with message '''
-        if re.search(r'\n', message):
-            messages = message.split('\n')
-            for msg in messages:
-                self.bot.say(self.msg.source, msg)
+        ''' Replies to user command source with message
+
+        Each line of a multi-line message is sent as its own PRIVMSG.
+
+        '''
+        if not self.cancelled:
+            self.bot.say(self.msg.source, message, self.priority)
+
+    def notice(self, message):
+        ''' Sends NOTICE response to user command '''
+        if not self.cancelled:
+            self.bot.notice(self.msg.nick, message, self.priority)
+
+    def say(self, target, message):
+        ''' Sends PRIVMSG to target (user|#channel) '''
+        if not self.cancelled:
+            self.bot.say(target, message, self.priority)
+
+    def action(self, target, message):
+        ''' Performs an action (/me msg) at target '''
+        if not self.cancelled:
+            self.bot.action(target, message, self.priority)
+
+''' Argument specs
+
+A command declares its arguments as a string of space separated
+parameters, each written as
+
+    [*]name[:type][+|...]
+
+    *       - optional, only trailing parameters can be
+    :type   - str (the default), int, float or channel
+    +       - takes the rest of the words as a list (at least one,
+              none with *)
+    ...     - takes the rest of the words as one string
+
+Ex. 'nick'                  - one word
+    '*seconds:float'        - an optional number
+    'channels:channel+'     - one or more channels, as a list
+    'target message...'     - a word, then the rest of the line
+
+'''
+
+class ArgumentError(Exception):
+    ''' Raised for arguments that don't match a command's spec '''
+    pass
+
+def _channel(word):
+    if word[:1] not in '#&+!':
+        raise ValueError('%s is not a channel' % word)
+    return word
+
+TYPES = {'str': str, 'int': int, 'float': float, 'channel': _channel}
+TYPE_NAMES = {'int': 'a whole number', 'float': 'a number',
+              'channel': 'a channel'}
+
+class Param(object):
+    ''' A parameter of an argument spec '''
+
+    __slots__ = ('name', 'type', 'convert', 'optional', 'many', 'rest')
+
+    def __init__(self, token):
+        self.optional = token.startswith('*')
+        token = token.lstrip('*')
+        self.rest = token.endswith('...')
+        self.many = token.endswith('+')
+        token = token.rstrip('.+')
+        self.name, _, self.type = token.partition(':')
+        self.type = self.type or 'str'
+        if self.type not in TYPES:
+            raise ValueError('Unknown argument type: %s' % self.type)
+        self.convert = TYPES[self.type]
+
+    @property
+    def usage(self):
+        ''' The parameter as help shows it, ie. *[seconds] '''
+        name = self.name
+        if self.rest:
+            name += '...'
+        elif self.many:
+            name += ' ...'
+        return '%s[%s]' % ('*' if self.optional else '', name)
+
+def compile_args(spec):
+    ''' Returns (params, validate) for an argument spec
+
+    validate(words) returns the converted argument list for the words
+    after the root (None for none), or raises ArgumentError.
+
+    '''
+    params = [Param(token) for token in spec.split()]
+    for param in params[:-1]:
+        if param.rest or param.many:
+            raise ValueError('Only the last parameter takes the rest: %s'
+                             % spec)
+    for before, param in zip(params, params[1:]):
+        if before.optional and not param.optional:
+            raise ValueError('Optional parameters must come last: %s'
+                             % spec)
+    required = len([param for param in params if not param.optional])
+    last = params[-1] if params else None
+    greedy = last is not None and (last.rest or last.many)
+    fixed = params[:-1] if greedy else params
+    most = None if greedy else len(params)
+    size = len(fixed)
+    converters = [(param, param.convert) for param in fixed]
+    plain = all(convert is str for param, convert in converters)
+
+    if not params:
+        def validate(words):
+            if words:
+                raise ArgumentError(None)
+            return []
+        return params, validate
+
+    def validate(words):
+        words = words or ()
+        count = len(words)
+        if count < required or most is not None and count > most:
+            raise ArgumentError(None)
+        if plain:
+            args = list(words[:size])
         else:
-            self.bot.say(self.msg.source, message)
-        
+            args = [_convert(param, convert, word)
+                    for (param, convert), word in zip(converters, words)]
+        if count < size:
+            args += [None] * (size - count)
+        if greedy:
+            extra = words[len(fixed):]
+            if last.rest:
+                args.append(' '.join(extra) if extra else None)
+            else:
+                args.append([_convert(last, last.convert, word)
+                             for word in extra])
+        return args
+
+    return params, validate
+
+def _convert(param, convert, word):
+    if convert is str:
+        return word
+    try:
+        return convert(word)
+    except ValueError:
+        raise ArgumentError('%s must be %s.' %
+                            (param.name, TYPE_NAMES[param.type]))
+
+class Entry(object):
+    ''' A registered command: its function and what it declared '''
+
+    __slots__ = ('name', 'function', 'spec', 'params', 'validate',
+                 'access', 'aliases', 'abbreviate', 'cost', 'description')
+
+    def __init__(self, name, function, args=None, access=ANYONE,
+                 aliases=(), abbreviate=True, cost=1, description=None):
+        self.name = name
+        self.function = function
+        self.spec = args  # None for commands that check their own args
+        self.params, self.validate = (None, None) if args is None else\
+                                     compile_args(args)
+        self.access = access
+        self.aliases = tuple(aliases)
+        self.abbreviate = abbreviate
+        self.cost = cost  # Tokens a request takes, see the throttle module
+        if description is None:
+            description = (function.__doc__ or '').strip()
+        self.description = description
+
+    def check(self, cmd):
+        ''' Checks access and arguments, True if the command can run
+
+        Converts cmd.args for commands with an argument spec.  If the
+        command can't run, the user is told why.
+
+        '''
+        if self.access and cmd.bot.access_level(cmd.msg) < self.access:
+            cmd.notice('You do not have permission to run this command.')
+            return False
+        if self.validate is None:
+            return True
+        try:
+            cmd.args = self.validate(cmd.args)
+        except ArgumentError as e:
+            reason = '%s ' % e if e.args[0] else ''
+            cmd.reply('Invalid entry. %sRequires: %s' %
+                      (reason, self.usage(cmd.cmd_prefix)))
+            return False
+        return True
+
+    def usage(self, prefix):
+        ''' The command's syntax, ie. .delay *[seconds] '''
+        if self.params is None:
+            return '%s%s' % (prefix, self.name)
+        return ' '.join(['%s%s' % (prefix, self.name)] +
+                        [param.usage for param in self.params])
+
+    def help(self, prefix):
+        ''' One line of help generated from the declaration '''
+        line = self.usage(prefix)
+        if self.description:
+            line += ' - %s' % self.description
+        notes = []
+        if self.access >= OWNER:
+            notes.append('owner only')
+        elif self.access:
+            notes.append('access %s' % self.access)
+        if self.aliases:
+            notes.append('aliases: %s' % ', '.join(
+                    prefix + alias for alias in self.aliases))
+        if notes:
+            line += ' (%s)' % '; '.join(notes)
+        return line
+
+class Registry(object):
+    ''' The commands bots can run, by name, alias and abbreviation
+
+    Registering builds new lookup tables and swaps them in, so lookups
+    need no lock.  It also reads like the dict command_dic used to be:
+    command_dic.update({'root': function}) registers functions that
+    check their own arguments.
+
+    '''
+
+    def __init__(self):
+        self._entries = {}  # name: Entry
+        self._lookup = {}  # name, alias or unique abbreviation: Entry
+        self._local = threading.local()  # The thread's staging() list
+
+    def command(self, name=None, args='', access=ANYONE, aliases=(),
+                abbreviate=True, cost=1, help=None):
+        ''' Decorator registering a command function
+
+        The name defaults to the function's without trailing '_'
+        (quit_ is 'quit').  args is an argument spec ('' takes none),
+        access the level needed to run it.  abbreviate=False keeps the
+        command from running by an abbreviation.  cost is how much of a
+        user's request rate it uses, ie. more for long replies.  help
+        replaces the docstring as the help description.
+
+        '''
+        def decorator(function):
+            self.register(name or function.__name__.rstrip('_'), function,
+                          args, access, aliases, abbreviate, cost, help)
+            return function
+        return decorator
+
+    def register(self, name, function, args=None, access=ANYONE,
+                 aliases=(), abbreviate=True, cost=1, help=None):
+        ''' Registers function as a command, returns its Entry '''
+        entry = Entry(name, function, args, access, aliases, abbreviate,
+                      cost, help)
+        staged = getattr(self._local, 'staged', None)
+        if staged is not None:
+            staged.append(entry)
+            return entry
+        entries = dict(self._entries)
+        entries[name] = entry
+        self._swap(entries)
+        return entry
+
+    def unregister(self, name):
+        ''' Removes a command '''
+        entries = dict(self._entries)
+        entries.pop(name, None)
+        self._swap(entries)
+
+    @contextmanager
+    def staging(self):
+        ''' Collects the Entries registered in the block, for replace()
+
+        Only this thread's registrations are collected.
+
+        '''
+        self._local.staged = staged = []
+        try:
+            yield staged
+        finally:
+            self._local.staged = None
+
+    def replace(self, module, entries):
+        ''' Swaps a module's commands for entries, all at once '''
+        kept = dict((name, entry) for name, entry in self._entries.items()
+                    if entry.function.__module__ != module)
+        for entry in entries:
+            kept[entry.name] = entry
+        self._swap(kept)
+
+    def resolve(self, root):
+        ''' Returns the Entry root names, abbreviates or aliases, or None '''
+        return self._lookup.get(root)
+
+    def entries(self):
+        ''' Returns the registered Entries sorted by name '''
+        return [self._entries[name] for name in sorted(self._entries)]
+
+    def _swap(self, entries):
+        lookup = {}
+        prefixes = {}  # Abbreviation: Entries it could mean
+        for entry in entries.values():
+            if entry.abbreviate:
+                for end in range(MIN_ABBREVIATION, len(entry.name)):
+                    prefixes.setdefault(entry.name[:end], []).append(entry)
+        for prefix, matches in prefixes.items():
+            if len(matches) == 1:
+                lookup[prefix] = matches[0]
+        for entry in entries.values():
+            for alias in entry.aliases:
+                lookup[alias] = entry
+        for name, entry in entries.items():
+            lookup[name] = entry
+        self._entries, self._lookup = entries, lookup
+
+    # Dictionary methods, for modules that still use command_dic
+
+    def update(self, commands):
+        for name, function in commands.items():
+            self.register(name, function)
+
+    def get(self, name, default=None):
+        entry = self._entries.get(name)
+        return default if entry is None else entry.function
+
+    def __getitem__(self, name):
+        return self._entries[name].function
+
+    def __contains__(self, name):
+        return name in self._entries
+
+    def __iter__(self):
+        return iter(sorted(self._entries))
+
+    def __len__(self):
+        return len(self._entries)
+
+registry = Registry()  # The commands every bot shares
+command = registry.command
+command_dic = registry  # Its old name, from when it was a dict
+
 ''' Decorators
 
 These make writing commands simple by providing the ability to add
-common functionality to commands.
+common functionality to commands.  The access and argument decorators
+are from before @command(args=..., access=...) and are kept for
+commands registered through command_dic.
 
-* = to be added
-@no_access*    - Command accessible to all users
-@admin*        - Command accessible only to highest access level
+@command       - Registers the command, see Registry.command
+@access(level) - Command accessible only from an access level up
+@admin         - Command accessible only to admins and the owner
 @owner         - Command accessible only to the owner
 @requires_args - Command that requires arguments
 @no_args       - Command require no arguments
 @one_arg       - Command requires one argument
 @as_string     - Parses arguments to string, @requires_args
+@inline        - Runs on the thread reading the connection
+@limits        - Timeout and concurrency limits in the worker pool
+@isolated      - Runs in a separate process, see the isolation module
 
 '''
 
@@ -106,7 +464,7 @@ def no_args(cmd_def):
     @wraps(cmd_def)
     def new_cmd_def(cmd):
         if cmd.args is None:
-            cmd_def(cmd)
+            return cmd_def(cmd)
         else:
             cmd.reply('Invalid entry. This command accepts no arguments.')
     return new_cmd_def
@@ -118,7 +476,7 @@ def one_arg(cmd_def):
         if cmd.args is None or len(cmd.args) > 1:
             cmd.reply('Invalid entry. This command requires one argument.')
         else:
-            cmd_def(cmd)
+            return cmd_def(cmd)
     return new_cmd_def
 
 # One or many args
@@ -127,22 +485,38 @@ def requires_args(cmd_def):
     @wraps(cmd_def)
     def new_cmd_def(cmd):
         if not cmd.args is None:
-            cmd_def(cmd)
+            return cmd_def(cmd)
         else:
             cmd.reply('Invalid entry. This command requires arguments.')
     return new_cmd_def
 
 # Access decorators
 
+def access(level):
+    ''' Sets the command to only be used from access level up
+
+    The sender's level comes from the bot's cached hostmask grants, see
+    the access module, so checking it doesn't query the database.
+
+    '''
+    def decorator(cmd_def):
+        @wraps(cmd_def)
+        def new_cmd_def(cmd, *args):
+            if cmd.bot.access_level(cmd.msg) >= level:
+                return cmd_def(cmd, *args)
+            else:
+                cmd.notice('You do not have permission to run this '
+                           'command.')
+        return new_cmd_def
+    return decorator
+
+def admin(cmd_def):
+    ''' Sets the command to only be used by admins and the owner '''
+    return access(ADMINISTRATOR)(cmd_def)
+
 def owner(cmd_def):
     ''' Sets the command to only be used by the owner '''
-    @wraps(cmd_def)
-    def new_cmd_def(cmd):
-        if cmd.msg.nick == cmd.bot.owner:
-            cmd_def(cmd)
-        else:
-            cmd.notice('You do not have permission to run this command.')
-    return new_cmd_def
+    return access(OWNER)(cmd_def)
 
 # More decorators
 
@@ -152,5 +526,39 @@ def as_string(cmd_def):
     @wraps(cmd_def)
     def new_cmd_def(cmd):
         cmd.args = (' ').join(cmd.args)
-        cmd_def(cmd)
+        return cmd_def(cmd)
     return new_cmd_def
+
+# Execution decorators
+
+def inline(cmd_def):
+    ''' Runs the command on the reading thread instead of the pool
+
+    Only for commands that return at once without blocking, since
+    nothing else is read or handled while they run.
+
+    '''
+    cmd_def.inline = True
+    return cmd_def
+
+def limits(timeout=None, per_command=None, per_user=None):
+    ''' Sets the command's limits in the worker pool
+
+    timeout is seconds before the command is cancelled, per_command and
+    per_user how many of its jobs can be queued or running at once, in
+    all and per user.  0 is no limit, and limits left out use the
+    pool's.
+
+    Ex. @limits(timeout=60, per_user=1)
+        def ip_info(cmd):
+
+    '''
+    def decorator(cmd_def):
+        if timeout is not None:
+            cmd_def.timeout = timeout
+        if per_command is not None:
+            cmd_def.per_command = per_command
+        if per_user is not None:
+            cmd_def.per_user = per_user
+        return cmd_def
+    return decorator
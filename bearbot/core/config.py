@@ -3,5 +3,15 @@ Created on Oct 22, 2013
 @author: Garcia
 '''
 
-# import apps
-from applications import *
+import os
+
+# The resources directory, next to the bearbot package
+RESOURCES = os.path.normpath(os.path.join(os.path.dirname(
+        os.path.abspath(__file__)), '..', '..', 'resources'))
+
+# Packages of plugins bots load on first use, see the plugins module
+PLUGINS = ('applications',)
+
+# SQLite file for users and their access levels, see the admin module
+# (resources/bearbot.db, wherever the bot is started from)
+DATABASE = os.path.join(RESOURCES, 'bearbot.db')
@@ -0,0 +1,84 @@
+'''
+Created on Oct 18, 2026
+
+Helpers for keeping a connection up: reconnect backoff and a TLS
+context that resumes sessions.
+
+Bot and AsyncBot reconnect in a loop while the bot is alive.  Backoff
+spaces the attempts out with jittered exponential delays, so a network
+restart doesn't bring every bot back in the same second, and resets
+once the server accepts the registration.
+
+A SessionContext is created once per bot.  It remembers the TLS session
+of the last connection and offers it on the next handshake, which lets
+the server skip the expensive part of the handshake.
+
+'python -m bearbot.core.fake_ircd' checks both against a fake server on
+localhost.
+
+'''
+
+import random
+import ssl
+
+class Backoff(object):
+    ''' Jittered exponential delays: base, base * factor, ... up to cap
+
+    Each delay is picked between half and all of the exponential value.
+
+    '''
+
+    def __init__(self, base=1, cap=300, factor=2):
+        self.base = base
+        self.cap = cap
+        self.factor = factor
+        self.attempt = 0
+
+    def next(self):
+        ''' Returns the next delay in seconds '''
+        delay = min(self.cap, self.base * self.factor ** self.attempt)
+        self.attempt += 1
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def reset(self):
+        ''' Starts over from the base delay '''
+        self.attempt = 0
+
+class SessionContext(ssl.SSLContext):
+    ''' SSL context that resumes the last TLS session it was given
+
+    Store the session of an established connection in .session and the
+    next wrap_socket() or wrap_bio() (used by asyncio) offers it.
+
+    '''
+
+    session = None
+
+    def wrap_socket(self, sock, server_side=False,
+                    do_handshake_on_connect=True, suppress_ragged_eofs=True,
+                    server_hostname=None, session=None):
+        return super().wrap_socket(
+                sock, server_side, do_handshake_on_connect,
+                suppress_ragged_eofs, server_hostname, session or self.session)
+
+    def wrap_bio(self, incoming, outgoing, server_side=False,
+                 server_hostname=None, session=None):
+        return super().wrap_bio(incoming, outgoing, server_side,
+                                server_hostname, session or self.session)
+
+    def save_session(self, ssl_object):
+        ''' Keeps the session of an SSLSocket or SSLObject for reuse '''
+        if ssl_object is not None and ssl_object.session is not None:
+            self.session = ssl_object.session
+
+def client_context():
+    ''' Returns a SessionContext for irc servers
+
+    Like the old ssl.wrap_socket(), it doesn't verify the server
+    certificate.  Many irc networks use self-signed certificates.
+
+    '''
+    context = SessionContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    return context
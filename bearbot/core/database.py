@@ -0,0 +1,273 @@
+'''
+Created on Oct 18, 2026
+
+SQLite databases shared by the core and the plugins.
+
+SQLite allows one writer at a time, and each commit waits for the disk.
+A Database sends every write through a queue to one writer thread,
+which runs whatever is queued in a single transaction and commits once,
+so a burst of writes costs one commit.  Each write runs in its own
+savepoint, so one that fails is rolled back alone and the error goes
+back to whoever made it.
+
+Reads don't go through the writer.  Each thread that queries gets its
+own read-only connection, and in WAL mode readers never wait for the
+writer.  A read sees the writes committed so far; a write made with
+write() may still be queued.
+
+Every connection keeps its prepared statements, keyed by their SQL, so
+the SQL should be constant and take its values as parameters.
+
+migrate() brings a part of the schema, ie. the admin tables, up to date.
+Each part's version is kept in the schema_versions table, and the steps
+after it run in order, each in the transaction that records it.
+
+Ex. db = database.get('bearbot.db')
+    db.migrate('notes', ('CREATE TABLE notes (nick TEXT, note TEXT)',))
+    db.write('INSERT INTO notes VALUES (?, ?)', ('bob', 'hi'))  # Queued
+    db.execute('DELETE FROM notes WHERE nick = ?', ('bob',))  # Waits
+    db.query('SELECT note FROM notes WHERE nick = ?', ('bob',))
+
+'''
+
+import atexit
+import os
+import queue
+import sqlite3
+import threading
+
+from bearbot.core import log
+
+BATCH = 500  # Writes committed together at most
+STATEMENTS = 256  # Prepared statements each connection keeps
+BUSY_TIMEOUT = 5000  # Milliseconds to wait for a lock, ie. another process
+PRAGMAS = ('PRAGMA journal_mode = WAL',
+           'PRAGMA synchronous = NORMAL',  # Durable at checkpoints, in WAL
+           'PRAGMA foreign_keys = ON',
+           'PRAGMA temp_store = MEMORY',
+           'PRAGMA busy_timeout = %d' % BUSY_TIMEOUT)
+READ_PRAGMAS = ('PRAGMA query_only = ON',
+                'PRAGMA busy_timeout = %d' % BUSY_TIMEOUT)
+
+databases = {}  # Absolute path: Database, see get()
+_lock = threading.Lock()
+
+def get(path):
+    ''' The Database for path, opened once and shared '''
+    path = os.path.abspath(path)
+    with _lock:
+        db = databases.get(path)
+        if db is None:
+            db = databases[path] = Database(path)
+        return db
+
+class Write(object):
+    ''' A write queued for the writer thread, see Database.submit '''
+
+    __slots__ = ('function', 'value', 'error', 'done')
+
+    def __init__(self, function):
+        self.function = function
+        self.value = None
+        self.error = None
+        self.done = threading.Event()
+
+    def result(self, timeout=None):
+        ''' Waits for the write, returns its value or raises its error '''
+        if not self.done.wait(timeout):
+            raise TimeoutError('The database write is still queued')
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+class Database(object):
+    ''' An SQLite file with one writer thread, see the module docs '''
+
+    def __init__(self, path, batch=BATCH):
+        self.path = path
+        self.batch = batch
+        self.commits = 0  # Transactions committed by the writer
+        self.writes = 0  # Writes run by the writer, committed or failed
+        self.logger = log.get_logger('database')
+        self._queue = queue.Queue()
+        self._local = threading.local()  # Each thread's read connection
+        self._readers = []  # Every read connection, for close()
+        self._writer = None  # The thread, started by the first use
+        self._connection = None  # The writer's connection
+        self._lock = threading.Lock()
+
+    # Writing
+
+    def submit(self, function):
+        ''' Queues function(connection) for the writer, returns its Write
+
+        The function runs in the writer's transaction, so everything it
+        does is committed together or, if it raises, not at all.
+
+        '''
+        write = Write(function)
+        self._start()
+        self._queue.put(write)
+        return write
+
+    def transaction(self, function, timeout=None):
+        ''' Runs function(connection) on the writer and returns its value '''
+        return self.submit(function).result(timeout)
+
+    def write(self, statement, parameters=()):
+        ''' Queues a statement without waiting for it '''
+        return self.submit(lambda connection:
+                           connection.execute(statement, parameters).rowcount)
+
+    def execute(self, statement, parameters=()):
+        ''' Runs a statement on the writer, returns the rows it changed '''
+        return self.write(statement, parameters).result()
+
+    def executemany(self, statement, rows):
+        return self.transaction(lambda connection: connection.executemany(
+                statement, rows).rowcount)
+
+    def migrate(self, name, steps):
+        ''' Runs the steps of name's schema it hasn't run yet
+
+        A step is SQL, one or more statements, or a function called
+        with the writer's connection.  Steps are never changed once
+        released, only added to; the version is how many have run.
+
+        '''
+        return self.transaction(lambda connection:
+                                _migrate(connection, name, steps))
+
+    # Reading
+
+    def query(self, statement, parameters=()):
+        ''' Returns the rows a query selects, read on this thread '''
+        return self._reader().execute(statement, parameters).fetchall()
+
+    def query_one(self, statement, parameters=()):
+        ''' Returns the first row a query selects, or None '''
+        return self._reader().execute(statement, parameters).fetchone()
+
+    def close(self):
+        ''' Commits what's queued, stops the writer and closes '''
+        with self._lock:
+            writer, self._writer = self._writer, None
+            readers, self._readers = self._readers, []
+        if writer is None:
+            return
+        self._queue.put(None)
+        writer.join()
+        for connection in readers:
+            connection.close()
+        self._local = threading.local()
+
+    # Connections
+
+    def _start(self):
+        ''' Opens the writer's connection and starts it, the first time '''
+        if self._writer is not None:
+            return
+        with self._lock:
+            if self._writer is not None:
+                return
+            connection = sqlite3.connect(self.path, isolation_level=None,
+                                         check_same_thread=False,
+                                         cached_statements=STATEMENTS)
+            for pragma in PRAGMAS:
+                connection.execute(pragma)
+            self._connection = connection
+            self._writer = threading.Thread(target=self._write,
+                                            name='bearbot-database',
+                                            daemon=True)
+            self._writer.start()
+            atexit.register(self.close)
+
+    def _reader(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            self._start()  # The writer creates the file and sets WAL
+            connection = sqlite3.connect(self.path, check_same_thread=False,
+                                         cached_statements=STATEMENTS)
+            for pragma in READ_PRAGMAS:  # query_only makes it read-only
+                connection.execute(pragma)
+            with self._lock:
+                self._readers.append(connection)
+            self._local.connection = connection
+        return connection
+
+    # The writer thread
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            writes = [write for write in batch if write is not None]
+            if writes:
+                self._commit(writes)
+            if None in batch:
+                break
+        try:
+            self._connection.execute('PRAGMA optimize')
+        except sqlite3.Error:
+            pass
+        self._connection.close()
+
+    def _commit(self, writes):
+        ''' Runs writes in one transaction, each in a savepoint '''
+        connection = self._connection
+        try:
+            connection.execute('BEGIN IMMEDIATE')
+            for write in writes:
+                connection.execute('SAVEPOINT write')
+                try:
+                    write.value = write.function(connection)
+                except Exception as e:
+                    connection.execute('ROLLBACK TO write')
+                    write.error = e
+                    self.logger.error('! Database write failed: %s' % e)
+                connection.execute('RELEASE write')
+            connection.execute('COMMIT')
+            self.commits += 1
+        except sqlite3.Error as e:  # The transaction itself failed
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            self.logger.error('! Database commit failed: %s' % e)
+            for write in writes:
+                write.error = write.error or e
+        self.writes += len(writes)
+        for write in writes:
+            write.done.set()
+
+def _migrate(connection, name, steps):
+    ''' Runs the steps after name's version, returns the version '''
+    connection.execute('CREATE TABLE IF NOT EXISTS schema_versions ('
+                       'name TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+    row = connection.execute('SELECT version FROM schema_versions '
+                             'WHERE name = ?', (name,)).fetchone()
+    version = 0 if row is None else row[0]
+    for step in steps[version:]:
+        if callable(step):
+            step(connection)
+        else:
+            for statement in statements(step):
+                connection.execute(statement)
+    if len(steps) > version:
+        connection.execute('INSERT OR REPLACE INTO schema_versions '
+                           '(name, version) VALUES (?, ?)',
+                           (name, len(steps)))
+    return max(version, len(steps))
+
+def statements(script):
+    ''' Splits SQL into statements, since executescript() would commit '''
+    statement = ''
+    for line in script.splitlines(True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            yield statement.strip()
+            statement = ''
+    if statement.strip():
+        yield statement.strip()
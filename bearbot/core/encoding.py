@@ -0,0 +1,103 @@
+'''
+Created on Oct 18, 2026
+
+Byte-level helpers for raw lines from the server.
+
+irc has no fixed encoding.  Most clients send utf-8, but older ones
+still send cp1252 or latin-1, so a strict utf-8 decode drops their
+messages.  The Decoder tries a chain of encodings instead.
+
+The command of a line is found in the raw bytes with command_token(),
+so the bot can drop lines nothing handles before decoding them or
+creating a Message.
+
+'''
+
+import codecs
+
+ENCODINGS = ('utf-8', 'cp1252', 'latin-1')  # Tried in order
+CACHE_SIZE = 1024  # Targets whose fallback encoding is remembered
+
+def command_token(line):
+    ''' Returns (command, at) for a raw line
+
+    command is the command as bytes (ie. b'PRIVMSG' or b'352') and at
+    is where the params start.
+
+    '''
+    start = 0
+    if line[:1] == b':':
+        start = line.find(b' ') + 1
+        if not start:
+            return b'', len(line)
+    end = line.find(b' ', start)
+    if end < 0:
+        return line[start:], len(line)
+    return line[start:end], end + 1
+
+def param_token(line, at):
+    ''' Returns the param starting at at, without a leading colon '''
+    if line[at:at + 1] == b':':
+        at += 1
+    end = line.find(b' ', at)
+    return line[at:end] if end >= 0 else line[at:]
+
+class Decoder(object):
+    ''' Decodes lines with a chain of encodings
+
+    The first encoding (utf-8) is always tried first, since a strict
+    utf-8 decode rarely succeeds on text that isn't utf-8.  When it
+    fails, the encoding that last worked for the same target (channel
+    or nick) is tried next, then the rest of the chain in order.  With
+    latin-1 last in the chain every line decodes.
+
+    '''
+
+    def __init__(self, encodings=ENCODINGS, cache_size=CACHE_SIZE):
+        if isinstance(encodings, str):
+            encodings = (encodings,)
+        for encoding in encodings:
+            codecs.lookup(encoding)  # Raises LookupError for bad names
+        self.encodings = tuple(encodings)
+        self.cache_size = cache_size
+        self.fallbacks = 0  # Lines the first encoding couldn't decode
+        self._cached = {}  # Target: fallback encoding that worked last
+
+    def decode(self, line, target=b''):
+        ''' Returns line as text '''
+        try:
+            return line.decode(self.encodings[0])
+        except UnicodeDecodeError:
+            pass
+        self.fallbacks += 1
+        cached = self._cached.get(target)
+        if cached is not None:
+            try:
+                return line.decode(cached)
+            except UnicodeDecodeError:
+                pass
+        for encoding in self.encodings[1:]:
+            if encoding == cached:
+                continue
+            try:
+                text = line.decode(encoding)
+            except UnicodeDecodeError:
+                continue
+            self._remember(target, encoding)
+            return text
+        return line.decode(self.encodings[0], 'replace')
+
+    def _remember(self, target, encoding):
+        if target not in self._cached and \
+                len(self._cached) >= self.cache_size:
+            del self._cached[next(iter(self._cached))]  # Oldest target
+        self._cached[target] = encoding
+
+    def encoding_of(self, target):
+        ''' The fallback encoding remembered for target, or None '''
+        if isinstance(target, str):
+            target = target.encode(self.encodings[0])
+        return self._cached.get(target)
+
+    def clear(self):
+        self._cached.clear()
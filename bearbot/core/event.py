@@ -2,37 +2,224 @@
 Created on Oct 2, 2013
 @author: Garcia, Evan
 
-This module will contain event/handler/listener logic.  It's a
-spaghetti right now.
+This module holds the event bus, which routes server messages to the
+functions that handle them.
+
+Handlers subscribe to commands with the bus.on() decorator and are
+called with the bot and the Message:
+
+    @bus.on('PING', priority=10)
+    def ping_(bot, msg):
+        ...
+
+    @bus.on('PRIVMSG', when=lambda msg: msg.trailing.startswith('\\001'))
+    def ctcp_(bot, msg):
+        ...
+
+A subscription names commands ('PRIVMSG', '353'), every command ('*')
+or a range of numerics ('400-599').  Handlers with a higher priority
+run first; equal priorities run in the order they subscribed.  The
+optional when predicate is checked before the handler is called, so a
+handler only runs for the messages it wants.
+
+The bus compiles its subscriptions into a table of command to handlers.
+Dispatching a message is one dict lookup and a loop over the handlers
+found, without creating any objects.  Commands only matched by '*' or a
+range are added to the table the first time they're seen, up to
+CACHED of them, so a peer sending made up commands can't grow it.
 
 '''
 
+import logging
 import threading
+from contextlib import contextmanager
 
-from bearbot.core import command
-from bearbot.core.command import Command
+CACHED = 256  # Commands matched by '*' or a range kept in the table
 
-#TODO
-# The applications import will be eliminated with a proper loading system
-from applications import chatter, misc_commands
-from bearbot.sub_modules import irc_commands, bot_commands, ctcp_commands
+class Subscription(object):
+    ''' A handler subscribed to some commands, see EventBus.subscribe '''
+
+    __slots__ = ('patterns', 'handler', 'priority', 'when', 'order')
+
+    def __init__(self, patterns, handler, priority, when, order):
+        self.patterns = patterns
+        self.handler = handler
+        self.priority = priority
+        self.when = when
+        self.order = order
+
+    def matches(self, command):
+        for pattern in self.patterns:
+            if pattern == '*' or pattern == command:
+                return True
+            if isinstance(pattern, range) and command.isdigit() and\
+                    int(command) in pattern:
+                return True
+        return False
+
+class EventBus(object):
+    ''' Routes Messages to subscribed handlers by command '''
+
+    def __init__(self):
+        self._subscriptions = []
+        self._order = 0  # Subscription counter, for stable ordering
+        self._table = {}  # Command: ((when, handler), ...)
+        self._patterns = False  # Some subscription uses '*' or a range
+        self._cached = 0  # Entries _entry() added to the table
+        self._lock = threading.Lock()
+        self._local = threading.local()  # The thread's staging() list
+
+    # Registration
+
+    def subscribe(self, commands, handler, priority=0, when=None):
+        ''' Subscribes handler(bot, msg) to commands
+
+        commands is a command, '*', a numeric range as 'low-high' or a
+        range object, or a list of those.  Returns the Subscription,
+        which can be passed to unsubscribe().
+
+        '''
+        if isinstance(commands, (str, range)):
+            commands = [commands,]
+        patterns = tuple(self._pattern(command) for command in commands)
+        with self._lock:
+            self._order += 1
+            subscription = Subscription(patterns, handler, priority, when,
+                                        self._order)
+            staged = getattr(self._local, 'staged', None)
+            if staged is not None:
+                staged.append(subscription)
+                return subscription
+            self._subscriptions = self._subscriptions + [subscription]
+            self._compile()
+        return subscription
+
+    def on(self, *commands, priority=0, when=None):
+        ''' Decorator subscribing a function to commands '''
+        def decorator(handler):
+            self.subscribe(list(commands), handler, priority, when)
+            return handler
+        return decorator
+
+    def unsubscribe(self, subscription):
+        ''' Removes a Subscription, or every subscription of a handler '''
+        with self._lock:
+            self._subscriptions = [
+                    s for s in self._subscriptions
+                    if s is not subscription and s.handler is not subscription]
+            self._compile()
 
-#Dictionary of server command/command_handlers
-#TODO create methods to manage adding to this, similar to the command manager
-command_handlers = {'PRIVMSG': [bot_commands.privmsg_, ctcp_commands.ctcp_],
-                    'PING': [irc_commands.ping_]}
+    @contextmanager
+    def staging(self):
+        ''' Collects the Subscriptions made in the block, for replace()
 
-# TODO For later
-# t = threading.Thread(target=handler, args=args, kwargs=kwargs)
-# t.start()
+        Only this thread's subscriptions are collected; other threads'
+        take effect as usual.
 
-class SpaghettiHandler(object):
-    '''Determines what to do based off the message the bot receives '''
+        '''
+        self._local.staged = staged = []
+        try:
+            yield staged
+        finally:
+            self._local.staged = None
 
-    def __init__(self, bot, msg):
-        self.bot = bot
+    def replace(self, module, subscriptions):
+        ''' Swaps a module's handlers for subscriptions, all at once
 
-        # Sends each command to respective method
-        if msg.command in command_handlers:
-            for handler in command_handlers[msg.command]:
-                handler(self, msg)
\ No newline at end of file
+        A handler that replaces one of the same name keeps its place
+        among handlers of equal priority.
+
+        '''
+        with self._lock:
+            kept, order = [], {}
+            for s in self._subscriptions:
+                if s.handler.__module__ == module:
+                    order[s.handler.__qualname__] = s.order
+                else:
+                    kept.append(s)
+            for s in subscriptions:
+                s.order = order.get(s.handler.__qualname__, s.order)
+            self._subscriptions = kept + list(subscriptions)
+            self._compile()
+
+    def handlers(self, command):
+        ''' Returns the handler functions for command, in calling order '''
+        return [handler for when, handler in self._entry(command)]
+
+    def handles(self, command):
+        ''' True if any handler subscribes to command '''
+        entry = self._table.get(command)
+        if entry is None:
+            entry = self._entry(command)
+        return bool(entry)
+
+    def subscriptions(self):
+        ''' Returns every Subscription, in calling order '''
+        return list(self._subscriptions)
+
+    # Dispatching
+
+    def dispatch(self, bot, msg):
+        ''' Calls the handlers subscribed to msg's command '''
+        entry = self._table.get(msg.command)
+        if entry is None:
+            entry = self._entry(msg.command)
+        for when, handler in entry:
+            if when is not None and not when(msg):
+                continue
+            try:
+                handler(bot, msg)
+            except Exception as e:
+                bot.log('! Handler exception (%s): %s' % (handler.__name__, e),
+                        logging.ERROR)
+
+    # Compiling
+
+    def _pattern(self, command):
+        if isinstance(command, range) or command == '*':
+            return command
+        low, dash, high = command.partition('-')
+        if dash and low.isdigit() and high.isdigit():
+            return range(int(low), int(high) + 1)
+        return command
+
+    def _compile(self):
+        ''' Rebuilds the table for the named commands (lock held) '''
+        self._subscriptions = sorted(self._subscriptions,
+                                     key=lambda s: (-s.priority, s.order))
+        self._patterns = any(not isinstance(pattern, str) or pattern == '*'
+                             for s in self._subscriptions
+                             for pattern in s.patterns)
+        commands = set(pattern for s in self._subscriptions
+                       for pattern in s.patterns
+                       if isinstance(pattern, str) and pattern != '*')
+        self._table = dict((command, self._build(command))
+                           for command in commands)  # Swapped in whole
+        self._cached = 0
+
+    def _build(self, command):
+        return tuple((s.when, s.handler) for s in self._subscriptions
+                     if s.matches(command))
+
+    def _entry(self, command):
+        ''' Returns the table entry for command, adding it if handled
+
+        Only commands with handlers are added, CACHED at most, and under
+        the lock, so the table _compile() swaps in isn't changed.
+
+        '''
+        entry = self._table.get(command)
+        if entry is None:
+            if not self._patterns:
+                return ()
+            with self._lock:
+                entry = self._build(command)
+                if entry and self._cached < CACHED:
+                    self._table[command] = entry
+                    self._cached += 1
+        return entry
+
+bus = EventBus()  # The bus bots use unless given their own
+
+from bearbot.sub_modules import irc_commands, bot_commands, ctcp_commands
+from bearbot.sub_modules import roster_commands
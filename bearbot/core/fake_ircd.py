@@ -0,0 +1,176 @@
+'''
+Created on Oct 18, 2026
+
+A fake irc server on localhost, and checks of how bots recover with it.
+
+    python -m bearbot.core.fake_ircd
+
+FakeIRCd listens on a free local port, over TLS if given a certificate,
+greets every client (001 and 422, no MOTD) and records the lines each
+connection sends.  A handler called with each line can reply or drop
+the connection.
+
+The checks run Bot and AsyncBot against it.  The server drops the first
+connection once the bot joins, and the bot has to reconnect, rejoin all
+its channels in one JOIN line and, over TLS, resume the first
+connection's session.  The TLS checks make a self-signed certificate
+with the openssl command, and are skipped without it.
+
+'''
+
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import sys
+import tempfile
+import threading
+
+from bearbot.core.async_bot import AsyncBot
+from bearbot.core.bot import Bot
+
+SERVER = 'fake.ircd'
+CHANNELS = ('#bears', '#honey', '#botparty')
+TIMEOUT = 10  # Seconds a check may take
+
+class FakeIRCd(object):
+    ''' An irc server for one test, see the module docs
+
+    handler(server, number, line) is called with each line connection
+    number (from 0) sends.  lines holds (number, line) of every line,
+    and reused whether each TLS connection resumed a session.
+
+    '''
+
+    def __init__(self, handler=None, certificate=None, key=None):
+        self.handler = handler
+        self.lines = []
+        self.reused = []
+        self.connections = []
+        self._tls = None
+        if certificate is not None:
+            self._tls = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+            self._tls.load_cert_chain(certificate, key)
+        self._socket = socket.create_server(('127.0.0.1', 0))
+        self.port = self._socket.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def send(self, number, line):
+        self.connections[number].sendall(('%s\r\n' % line).encode())
+
+    def drop(self, number):
+        ''' Closes connection number, as a netsplit would '''
+        connection = self.connections[number]
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        connection.close()
+
+    def close(self):
+        self._socket.close()
+        for number in range(len(self.connections)):
+            self.drop(number)
+
+    def _accept(self):
+        while True:
+            try:
+                connection, address = self._socket.accept()
+                if self._tls is not None:
+                    connection = self._tls.wrap_socket(connection,
+                                                       server_side=True)
+                    self.reused.append(connection.session_reused)
+            except OSError:  # Closed, or a failed handshake
+                if self._socket.fileno() == -1:
+                    return
+                continue
+            number = len(self.connections)
+            self.connections.append(connection)
+            threading.Thread(target=self._read, args=(connection, number),
+                             daemon=True).start()
+
+    def _read(self, connection, number):
+        try:
+            for line in connection.makefile('rb'):
+                line = line.decode('utf-8', 'replace').rstrip('\r\n')
+                self.lines.append((number, line))
+                if line.startswith('NICK '):
+                    nick = line.split()[1]
+                    self.send(number, ':%s 001 %s :Welcome' % (SERVER, nick))
+                    self.send(number, ':%s 422 %s :MOTD File is missing' %
+                              (SERVER, nick))
+                if self.handler is not None:
+                    self.handler(self, number, line)
+        except (OSError, ValueError):  # Dropped
+            pass
+
+def make_certificate(directory):
+    ''' Writes a self-signed certificate, returns (cert, key) or None '''
+    if shutil.which('openssl') is None:
+        return None
+    certificate = os.path.join(directory, 'cert.pem')
+    key = os.path.join(directory, 'key.pem')
+    subprocess.run(['openssl', 'req', '-x509', '-newkey', 'rsa:2048',
+                    '-nodes', '-days', '1', '-subj', '/CN=%s' % SERVER,
+                    '-keyout', key, '-out', certificate],
+                   check=True, capture_output=True)
+    return certificate, key
+
+def check_recovery(cls, certificate=None, key=None):
+    ''' Runs a cls bot through a dropped connection, returns the problems '''
+    bot = None
+    def handler(server, number, line):
+        if not line.startswith('JOIN '):
+            return
+        if number == 1:
+            bot.alive = False  # Done after the rejoin
+        server.drop(number)
+    server = FakeIRCd(handler, certificate, key)
+    bot = cls('127.0.0.1', 'Owner!owner@fake.ircd', '', list(CHANNELS),
+              port=server.port, ssl=certificate is not None, msg_delay=0,
+              plugins=(), database=None)
+    bot.backoff.base = .1
+    bot.log = lambda message, level=None: None
+    thread = threading.Thread(target=bot._connect, daemon=True)
+    thread.start()
+    thread.join(TIMEOUT)
+    server.close()
+
+    problems = []
+    if thread.is_alive():
+        bot.alive = False
+        problems.append('the bot was still running after %s seconds' %
+                        TIMEOUT)
+    joins = [[line for number, line in server.lines
+              if number == each and line.startswith('JOIN ')]
+             for each in range(len(server.connections))]
+    if len(joins) < 2:
+        problems.append('the bot did not reconnect')
+    elif joins[1] != ['JOIN %s' % ','.join(CHANNELS)]:
+        problems.append('the rejoin was not one JOIN of every channel: %s'
+                        % joins[1])
+    if certificate is not None and server.reused[1:2] != [True]:
+        problems.append('the TLS session was not resumed: %s' %
+                        server.reused)
+    return problems
+
+def main():
+    ''' Runs the checks, exits with 1 if any failed '''
+    failed = False
+    with tempfile.TemporaryDirectory() as directory:
+        tls = make_certificate(directory)
+        for cls in (Bot, AsyncBot):
+            for name, files in (('plain', (None, None)), ('TLS', tls)):
+                if files is None:
+                    print('%s %s: skipped, no openssl command' %
+                          (cls.__name__, name))
+                    continue
+                problems = check_recovery(cls, *files)
+                failed = failed or bool(problems)
+                print('%s %s: %s' % (cls.__name__, name,
+                                     '; '.join(problems) or 'ok'))
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,170 @@
+'''
+Created on Oct 18, 2026
+
+Line framing for the irc byte stream.
+
+A socket read returns whatever bytes happen to be available, which is
+rarely a whole number of lines.  The LineBuffer class keeps one
+preallocated receive buffer per connection, reads into it with
+recv_into(), and hands out complete lines.  A partial line at the end
+of a read stays in the buffer until the rest of it arrives.
+
+Lines longer than max_line are discarded instead of growing the buffer
+without bound.  With bulk reading on, fill() keeps reading until the
+socket has nothing left or the buffer is full, so a large buffer size
+pays off during NAMES/WHO bursts.
+
+'''
+
+import select
+import socket
+import ssl
+
+MAX_LINE = 8704  # 512 byte RFC 2812 line plus 8191 bytes of IRCv3 tags
+LF = ord('\n')
+CR = ord('\r')
+
+class ConnectionClosed(Exception):
+    ''' Raised when the server closes the connection '''
+    pass
+
+class LineBuffer(object):
+    ''' Reusable receive buffer that yields complete lines
+
+    The buffer holds size bytes for reading plus max_line bytes for a
+    carried over partial line, so a read always has room.  Lines are
+    returned as bytes without the trailing CRLF, which is the only copy
+    made of each line.
+
+    The buffer state lives on the object rather than in the generator,
+    so a nested lines() call (a handler waiting for a server reply)
+    continues where the outer one stopped and lines stay in order.
+
+    '''
+
+    def __init__(self, size=4096, max_line=MAX_LINE, bulk=True):
+        self.size = size
+        self.max_line = max_line
+        self.bulk = bulk
+        self.overlong = 0  # Count of discarded lines
+        self._buf = bytearray(size + max_line)
+        self._view = memoryview(self._buf)
+        self._start = 0  # Start of the first unread line
+        self._scan = 0  # Where to resume searching for LF
+        self._end = 0  # End of received data
+        self._discard = False  # Skipping the rest of an overlong line
+
+    def __len__(self):
+        ''' Number of buffered bytes not yet returned as lines '''
+        return self._end - self._start
+
+    # Input
+
+    def fill(self, sock):
+        ''' Reads from sock into the buffer and returns bytes read
+
+        Raises ConnectionClosed when the peer has closed the connection.
+        A non-blocking socket with nothing to read returns 0.
+
+        '''
+        self._compact()
+        if self._end == len(self._buf):
+            return 0  # Unread lines still fill the buffer
+        total = self._recv(sock)
+        if total is None:
+            return 0
+        if total == 0:
+            raise ConnectionClosed('Connection closed by server')
+        while self.bulk and self._end < len(self._buf) and\
+                self._readable(sock):
+            try:
+                n = self._recv(sock)
+            except socket.timeout:  # Readable, but only part of a TLS record
+                break  # Not a silent server, the first read had data
+            if not n:
+                break
+            total += n
+        return total
+
+    def feed(self, data):
+        ''' Copies already received bytes into the buffer '''
+        self._compact()
+        end = self._end + len(data)
+        if end > len(self._buf):
+            self._view.release()  # A bytearray can't resize while viewed
+            self._buf.extend(bytes(end - len(self._buf)))
+            self._view = memoryview(self._buf)
+        self._buf[self._end:end] = data
+        self._end = end
+
+    def _recv(self, sock):
+        try:
+            n = sock.recv_into(self._view[self._end:])
+        except (BlockingIOError, InterruptedError, ssl.SSLWantReadError):
+            return None
+        self._end += n
+        return n
+
+    def _readable(self, sock):
+        ''' Checks for data without blocking (SSL buffers it internally) '''
+        pending = getattr(sock, 'pending', None)
+        if pending is not None and pending():
+            return True
+        try:
+            return bool(select.select([sock], [], [], 0)[0])
+        except (OSError, ValueError):
+            return False
+
+    # Output
+
+    def lines(self):
+        ''' Yields every complete line currently buffered '''
+        while True:
+            line = self.next_line()
+            if line is None:
+                return
+            yield line
+
+    def next_line(self):
+        ''' Returns the next complete line or None '''
+        buf = self._buf
+        while True:
+            i = buf.find(LF, self._scan, self._end)
+            if i == -1:
+                self._scan = self._end
+                if self._end - self._start > self.max_line:
+                    self._drop()  # No LF within max_line bytes
+                    self._start = self._scan = self._end = 0
+                self._compact()
+                return None
+            start, end = self._start, i
+            self._start = self._scan = i + 1
+            if self._discard:
+                self._discard = False
+                continue
+            if end - start > self.max_line:
+                self.overlong += 1
+                continue
+            if end > start and buf[end - 1] == CR:
+                end -= 1
+            return bytes(self._view[start:end])
+
+    def _drop(self):
+        if not self._discard:
+            self.overlong += 1
+        self._discard = True
+
+    def _compact(self):
+        ''' Moves a partial line to the front of the buffer '''
+        if not self._start:
+            return
+        remaining = self._end - self._start
+        if remaining:
+            self._buf[:remaining] = self._buf[self._start:self._end]
+        self._scan -= self._start
+        self._start, self._end = 0, remaining
+
+    def clear(self):
+        ''' Discards all buffered data (ie. after a reconnect) '''
+        self._start = self._scan = self._end = 0
+        self._discard = False
@@ -0,0 +1,380 @@
+'''
+Created on Oct 18, 2026
+
+This module runs user commands in separate processes.
+
+Worker threads still share the GIL with the bot, so a CPU heavy command
+slows everything down, and one that loops forever or eats all memory
+takes the bot with it.  A command marked @isolated runs in a process of
+a pre-warmed ProcessPoolExecutor instead:
+
+    @command(args='number:int')
+    @isolated(cpu=5, memory=64 * 1024 * 1024)
+    def factor(cmd):
+        cmd.reply(' * '.join(map(str, factors(cmd.args[0]))))
+
+The process gets a CommandSnapshot instead of the Command, with the
+root, args, Message and a few of the bot's attributes.  Sending methods
+(cmd.reply, cmd.notice, cmd.bot.say..) only record the lines, which the
+bot sends once the command returns.  Decorators under @isolated run in
+the process, decorators above it in the bot.
+
+Each call is limited to cpu seconds of CPU time and memory bytes more
+address space (on systems with the resource module).  Going over the
+CPU limit kills the process, going over the memory limit raises
+MemoryError in the command.
+
+A command cancelled by its timeout, or with .cancel, is interrupted in
+its process: the process's watcher thread sees the call's number in the
+pool's shared list of cancelled calls and raises Cancelled in it, and
+the process goes on to the next call.  Only a call stuck in C code for
+GRACE seconds, which can't be interrupted, has the processes killed.
+ProcessPoolExecutor can't lose one process and go on, so killing or
+losing a process breaks the executor: a new one is started and warmed,
+and the other commands it was running are reported as crashed.
+
+multiprocessing is slow to import, so it's only imported when the
+first isolated command runs.
+
+'''
+
+import _thread
+import importlib
+import itertools
+import logging
+import math
+import os
+import signal
+import threading
+from concurrent.futures import wait
+from functools import wraps
+from time import sleep
+
+try:
+    import resource
+except ImportError:  # Not on Windows, calls run without limits there
+    resource = None
+
+PROCESSES = 2  # Processes started for isolated commands
+CPU = 10  # Seconds of CPU time per call
+MEMORY = 256 * 1024 * 1024  # Bytes of address space per call
+POLL = .25  # Seconds between checks for a cancelled command
+GRACE = 2  # Seconds a cancelled call has to stop before a kill
+CANCELLED = 64  # Cancelled calls the processes are told of at once
+
+_registry = {}  # 'module.qualname': undecorated command function
+_cancelled = None  # In a process, the pool's cancelled calls, see _init
+_current = None  # In a process, the number of the call running
+
+class Cancelled(BaseException):
+    ''' Raised in a process to stop a cancelled call
+
+    A BaseException, so a command's own 'except Exception' doesn't
+    swallow it.
+
+    '''
+    pass
+
+class CommandSnapshot(object):
+    ''' The picklable part of a Command, for running in another process
+
+    Lines sent through it are recorded in outbox as (method, args) and
+    sent by the bot afterwards.
+
+    '''
+
+    def __init__(self, cmd):
+        self.root, self.name, self.args = cmd.root, cmd.name, cmd.args
+        self.content = cmd.content
+        self.msg = cmd.msg
+        self.priority = cmd.priority
+        self.cancelled = False
+        self.outbox = []
+        self.bot = BotSnapshot(cmd.bot, self.outbox, cmd.msg)
+
+    @property
+    def cmd_prefix(self):
+        return self.bot.cmd_prefix
+
+    def notice(self, message):
+        self.bot.notice(self.msg.nick, message, self.priority)
+
+    def reply(self, message):
+        self.bot.say(self.msg.source, message, self.priority)
+
+    def say(self, target, message):
+        self.bot.say(target, message, self.priority)
+
+    def action(self, target, message):
+        self.bot.action(target, message, self.priority)
+
+class BotSnapshot(object):
+    ''' The Bot attributes an isolated command can read, and its senders '''
+
+    def __init__(self, bot, outbox, msg):
+        self.host = bot.host
+        self.nick = bot.nick
+        self.owner = bot.owner
+        self.cmd_prefix = bot.cmd_prefix
+        self.channels = list(bot.channels)
+        self.version = bot.version
+        self.outbox = outbox
+        self._levels = {msg.prefix: bot.access_level(msg)}  # The sender's
+
+    def access_level(self, msg):
+        return self._levels.get(msg.prefix, 0)
+
+    def say(self, target, message, priority=None):
+        self.outbox.append(('say', (target, message, priority)))
+
+    def notice(self, target, message, priority=None):
+        self.outbox.append(('notice', (target, message, priority)))
+
+    def action(self, target, message, priority=None):
+        self.outbox.append(('action', (target, message, priority)))
+
+class IsolatedPool(object):
+    ''' Pre-warmed process pool that runs @isolated commands
+
+    The processes are started by the first call.  A pool can be shared
+    by several bots, ie. the bots of a Supervisor.
+
+    '''
+
+    def __init__(self, processes=PROCESSES):
+        self.size = processes
+        self.crashes = 0  # Processes lost and replaced
+        self._executor = None
+        self._cancelled = None  # Shared with the executor's processes
+        self._numbers = itertools.count(1)
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def run(self, cmd_def, cmd, cpu=CPU, memory=MEMORY):
+        ''' Runs cmd_def on a snapshot of cmd and sends its replies
+
+        Blocks until the command returns, crashes or is cancelled.
+
+        '''
+        executor, cancelled = self._start()
+        key = '%s.%s' % (cmd_def.__module__, cmd_def.__qualname__)
+        number = next(self._numbers)
+        future = executor.submit(_call, key, CommandSnapshot(cmd), cpu,
+                                 memory, number)
+        while not wait([future], POLL).done:
+            if cmd.cancelled:
+                self._cancel(executor, cancelled, future, number)
+                return
+        from concurrent.futures.process import BrokenProcessPool
+        try:
+            outbox, error = future.result()
+        except BrokenProcessPool:
+            self._restart(executor)
+            cmd.bot.log('! Isolated command %s crashed' % cmd.root,
+                        logging.ERROR)
+            cmd.notice('%s%s crashed.' % (cmd.cmd_prefix, cmd.root))
+            return
+        if cmd.cancelled:
+            return
+        for method, (target, message, priority) in outbox:
+            if priority is None:
+                priority = cmd.priority
+            getattr(cmd.bot, method)(target, message, priority)
+        if error is not None:
+            cmd.bot.log('! User command exception: %s' % error,
+                        logging.ERROR)
+
+    def warm(self):
+        ''' Starts every process now instead of on the first calls '''
+        executor, cancelled = self._start()
+        for future in [executor.submit(os.getpid)
+                       for _ in range(self.size)]:
+            future.result()
+
+    def recycle(self):
+        ''' Starts new processes for the next calls, ie. after a reload
+
+        Calls already running finish in the old processes.
+
+        '''
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._cancelled = None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def shutdown(self):
+        ''' Stops the processes without waiting for running commands '''
+        with self._lock:
+            self._closed = True
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self):
+        ''' Returns the executor and its cancelled calls, started once '''
+        from concurrent.futures.process import ProcessPoolExecutor
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('The isolated pool is shut down')
+            if self._executor is None:
+                context = _context()
+                self._cancelled = context.Array('q', CANCELLED)
+                self._executor = ProcessPoolExecutor(
+                        self.size, mp_context=context, initializer=_init,
+                        initargs=(self._cancelled,))
+                warm = True
+            else:
+                warm = False
+            executor, cancelled = self._executor, self._cancelled
+        if warm:
+            for _ in range(self.size):  # Starts the processes right away
+                executor.submit(os.getpid)
+        return executor, cancelled
+
+    def _cancel(self, executor, cancelled, future, number):
+        ''' Stops a cancelled call, leaving the other calls running
+
+        A call still queued is dropped.  A running one is interrupted in
+        its process, and only if it hasn't stopped after GRACE seconds
+        are the processes killed.
+
+        '''
+        if future.cancel():
+            return
+        with cancelled.get_lock():
+            cancelled[number % CANCELLED] = number
+        if not wait([future], GRACE).done:  # Stuck in C code
+            self._restart(executor, kill=True)
+
+    def _restart(self, executor, kill=False):
+        ''' Replaces a broken (or hung, with kill) executor
+
+        Killing takes every process of the executor, since it can't go
+        on without one of them; the pool's other calls then crash.
+
+        '''
+        with self._lock:
+            if self._executor is not executor:
+                return  # Already replaced by another command
+            self._executor = self._cancelled = None
+            self.crashes += 1
+        if kill:
+            for process in list((executor._processes or {}).values()):
+                process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+        if not self._closed:
+            self._start()
+
+def isolated(cpu=CPU, memory=MEMORY):
+    ''' Runs the command in a separate process, see the module docs
+
+    cpu is seconds of CPU time and memory bytes of address space a call
+    can use.  The command function must be defined at the top level of
+    a module so the process can import it.
+
+    '''
+    def decorator(cmd_def):
+        _registry['%s.%s' % (cmd_def.__module__,
+                             cmd_def.__qualname__)] = cmd_def
+        @wraps(cmd_def)
+        def new_cmd_def(cmd):
+            cmd.bot.isolation.run(cmd_def, cmd, cpu, memory)
+        new_cmd_def.inline = False  # Waits for the process in the pool
+        return new_cmd_def
+    return decorator
+
+def _context():
+    ''' Avoids forking the bot's threads where another method exists '''
+    import multiprocessing
+    methods = multiprocessing.get_all_start_methods()
+    if 'forkserver' in methods:
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+# In the worker process
+
+def _init(cancelled):
+    ''' Starts a process: keeps the cancelled calls and watches them '''
+    global _cancelled
+    _cancelled = cancelled
+    signal.signal(signal.SIGINT, _interrupt)
+    threading.Thread(target=_watch, name='bearbot-isolated-watch',
+                     daemon=True).start()
+
+def _watch():
+    ''' Interrupts the running call once the bot cancels it '''
+    while True:
+        sleep(POLL)
+        if _current is not None and _is_cancelled(_current):
+            _thread.interrupt_main()  # Runs _interrupt on the main thread
+
+def _interrupt(signum, frame):
+    ''' Raises Cancelled in a call that's cancelled, ignores the rest '''
+    if _current is not None and _is_cancelled(_current):
+        raise Cancelled()
+
+def _is_cancelled(number):
+    with _cancelled.get_lock():
+        return _cancelled[number % CANCELLED] == number
+
+def _call(key, cmd, cpu, memory, number=None):
+    ''' Runs a registered command and returns (outbox, error or None)
+
+    A cancelled call returns an empty outbox.
+
+    '''
+    global _current
+    cmd_def = _registry.get(key)
+    if cmd_def is None:
+        importlib.import_module(key.rsplit('.', 1)[0])  # Registers it
+        cmd_def = _registry[key]
+    limits = _limit(cpu, memory)
+    try:
+        _current = number
+        cmd_def(cmd)
+        error = None
+    except Cancelled:
+        del cmd.outbox[:]
+        error = None
+    except MemoryError:
+        error = 'Memory limit of %s bytes reached' % memory
+    except Exception as e:
+        error = '%s: %s' % (type(e).__name__, e)
+    finally:
+        _current = None
+        _unlimit(limits)
+    return cmd.outbox, error
+
+def _limit(cpu, memory):
+    ''' Limits the process for one call, returns the limits to restore '''
+    if resource is None:
+        return None
+    saved = (resource.getrlimit(resource.RLIMIT_CPU),
+             resource.getrlimit(resource.RLIMIT_AS))
+    if cpu:
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = usage.ru_utime + usage.ru_stime
+        _set(resource.RLIMIT_CPU, math.ceil(used + cpu), saved[0][1])
+    size = _address_space()
+    if memory and size is not None:
+        _set(resource.RLIMIT_AS, size + memory, saved[1][1])
+    return saved
+
+def _set(limit, soft, hard):
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(limit, (soft, hard))
+
+def _unlimit(saved):
+    if saved is not None:
+        resource.setrlimit(resource.RLIMIT_CPU, saved[0])
+        resource.setrlimit(resource.RLIMIT_AS, saved[1])
+
+def _address_space():
+    ''' Bytes of address space the process uses, None if unknown '''
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return None
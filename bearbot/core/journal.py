@@ -0,0 +1,293 @@
+'''
+Created on Oct 18, 2026
+
+An append-only key/value store that survives crashes.
+
+Rewriting a whole file for every change is slow and loses everything if
+the bot dies halfway through.  A Journal never rewrites its file: each
+set or delete appends one record, written by a background thread, and
+the file is replayed when it's loaded.
+
+    #bearbot journal 1
+    +hbd<TAB>Happy Bear Day!<TAB>1c291ca3
+    -hbd<TAB>5d8f2a11
+
+A record is one line, a + (set) or - (delete), the key, the value for a
+set and a CRC-32 of the rest.  Tabs, newlines and backslashes in keys
+and values are escaped, so both can hold anything.  A record cut short
+by a crash fails its CRC, and is dropped (and cut off the end of the
+file) when the journal is loaded.
+
+Loading maps the file into memory and parses the records in one pass.
+Once more than ratio of the records are dead, replaced or deleted, the
+writer thread compacts the file: it writes the live keys to a new file
+and renames it over the old one, so the journal is never half written.
+
+Ex. store = Journal('chatter.journal')
+    data = store.load()  # {key: value}
+    store.set('hbd', 'Happy Bear Day!')
+    store.delete('hbd')
+
+'''
+
+import atexit
+import mmap
+import os
+import queue
+import re
+import threading
+import zlib
+
+from bearbot.core import log
+
+HEADER = b'#bearbot journal 1\n'
+RATIO = .5  # Dead records out of all before compacting
+MINIMUM = 100  # Records before compacting at all
+ESCAPES = {'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'}
+UNESCAPES = {'\\\\': '\\', '\\t': '\t', '\\n': '\n', '\\r': '\r'}
+_escaped = re.compile(r'[\\\t\n\r]')
+_unescaped = re.compile(r'\\[\\tnr]')
+
+class Journal(object):
+    ''' Append-only store of str keys and values, see the module docs '''
+
+    def __init__(self, path, ratio=RATIO, minimum=MINIMUM, sync=True):
+        self.path = path
+        self.ratio = ratio
+        self.minimum = minimum
+        self.sync = sync  # fsync each batch of records written
+        self.data = {}  # Key: value, as of the last set or delete
+        self.records = 0  # Records in the file, live or dead
+        self.dropped = 0  # Damaged records skipped by load()
+        self.compactions = 0
+        self.logger = log.get_logger('journal')
+        self._file = None
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._writer = None
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def load(self):
+        ''' Reads the file, starts the writer and returns the data
+
+        Raises ValueError if the file isn't a journal.
+
+        '''
+        with self._lock:
+            self.data.clear()
+            self.records = self.dropped = 0  # Counted again by _replay()
+            end = self._replay()
+            self._file = open(self.path, 'ab')
+            if end is not None and end < self._file.tell():
+                self._file.truncate(end)  # A record cut short by a crash
+            elif end is None:
+                self._file.truncate(0)
+                self._file.write(HEADER)
+                self._file.flush()
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write,
+                                                name='bearbot-journal',
+                                                daemon=True)
+                self._writer.start()
+                atexit.register(self.close)
+        return self.data
+
+    def replace(self, items):
+        ''' Replaces the file with items, ie. when importing another format
+
+        Call it before load().
+
+        '''
+        self.data.clear()
+        self.data.update(items)
+        self._rewrite(self.data)
+
+    def set(self, key, value):
+        with self._lock:
+            self.data[key] = value
+            self._queue.put(('+', key, value))
+
+    def delete(self, key):
+        with self._lock:
+            if self.data.pop(key, None) is not None:
+                self._queue.put(('-', key, None))
+
+    def flush(self, timeout=None):
+        ''' Waits until what was set and deleted so far is written '''
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        ''' Writes what's queued and stops the writer '''
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+        self._file.close()
+
+    # Reading
+
+    def _replay(self):
+        ''' Applies the file's records to data, returns where they end
+
+        The file is mapped and split into lines at once, then each line
+        is checked against its CRC and applied.
+
+        Returns None if there's no file yet, or it's empty.
+
+        '''
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return None
+        if not size:
+            return None
+        data = self.data
+        with open(self.path, 'rb') as f,\
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            if m[:len(HEADER)] != HEADER:
+                raise ValueError('%s is not a journal' % self.path)
+            lines = m[len(HEADER):].split(b'\n')
+        tail = lines.pop()  # After the last newline, cut short by a crash
+        position = end = len(HEADER)
+        crc32 = zlib.crc32
+        for line in lines:
+            position += len(line) + 1
+            body, _, crc = line.rpartition(b'\t')
+            try:
+                valid = len(crc) == 8 and crc32(body) == int(crc, 16)
+            except ValueError:
+                valid = False
+            if not valid:
+                self.dropped += 1  # Damaged, skip the line
+                continue
+            fields = body[1:].decode('utf-8').split('\t')
+            if b'\\' in body:
+                fields = [_unescape(field) for field in fields]
+            if body[:1] == b'+' and len(fields) == 2:
+                data[fields[0]] = fields[1]
+            elif body[:1] == b'-' and len(fields) == 1:
+                data.pop(fields[0], None)
+            else:
+                self.dropped += 1
+                continue
+            self.records += 1
+            end = position
+        if tail:
+            self.dropped += 1
+        if self.dropped:
+            self.logger.warning('Skipped %s damaged records in %s' %
+                                (self.dropped, self.path))
+        return end
+
+    # Writing, on the writer thread
+
+    def _write(self):
+        while True:
+            batch = [self._queue.get()]
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            records = [item for item in batch if isinstance(item, tuple)]
+            if records:
+                try:
+                    self._append(records)
+                except OSError as e:
+                    self.logger.error('! Journal write failed: %s' % e)
+            if records and self._dead():
+                self._compact()
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if None in batch:
+                return
+
+    def _append(self, records):
+        lines = []
+        for op, key, value in records:
+            body = op + _escape(key)
+            if value is not None:
+                body += '\t' + _escape(value)
+            body = body.encode('utf-8')
+            lines.append(b'%s\t%s\n' % (body, _crc(body)))
+        self._file.write(b''.join(lines))
+        self._file.flush()
+        if self.sync:
+            os.fsync(self._file.fileno())
+        self.records += len(records)
+
+    def _dead(self):
+        return self.records >= self.minimum and\
+               self.records - len(self.data) > self.records * self.ratio
+
+    def _compact(self):
+        ''' Rewrites the file with only the live keys '''
+        with self._lock:
+            snapshot = dict(self.data)
+            records, pending = [], []  # Records queued since are in it
+            while True:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                (records if isinstance(item, tuple) else pending).append(item)
+            for item in pending:
+                self._queue.put(item)
+        self._file.close()
+        try:
+            self._rewrite(snapshot)
+            self.compactions += 1
+        except OSError as e:
+            self.logger.error('! Journal compaction failed: %s' % e)
+            self._file = open(self.path, 'ab')
+            self._append(records)  # Kept in the old file instead
+            return
+        self._file = open(self.path, 'ab')
+
+    def _rewrite(self, data):
+        ''' Writes data as a new file and renames it over the journal '''
+        temporary = self.path + '.tmp'
+        with open(temporary, 'wb') as f:
+            f.write(HEADER)
+            for key, value in data.items():
+                body = ('+%s\t%s' % (_escape(key), _escape(value)))\
+                        .encode('utf-8')
+                f.write(b'%s\t%s\n' % (body, _crc(body)))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+        _sync_directory(self.path)
+        self.records = len(data)
+
+def _crc(body):
+    return b'%08x' % zlib.crc32(body)
+
+def _escape(text):
+    if _escaped.search(text) is None:
+        return text
+    return _escaped.sub(lambda m: ESCAPES[m.group()], text)
+
+def _unescape(text):
+    if '\\' not in text:
+        return text
+    return _unescaped.sub(lambda m: UNESCAPES[m.group()], text)
+
+def _sync_directory(path):
+    ''' Makes a rename in path's directory durable, where that's possible '''
+    try:
+        descriptor = os.open(os.path.dirname(os.path.abspath(path)),
+                             os.O_RDONLY)
+    except OSError:  # ie. on Windows
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
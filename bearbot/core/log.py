@@ -0,0 +1,159 @@
+'''
+Created on Oct 18, 2026
+
+Leveled logging that stays off the bot's hot path.
+
+Bots log through the standard logging module, each on its own logger
+('bearbot.<host>').  setup() sends every record through a bounded
+queue to one background writer thread, which formats it and writes it
+to the console and, optionally, a rotating log file.  The thread that
+logs only checks the level, applies sampling and queues the record;
+messages are rendered by the writer.  If the queue is full the record
+is dropped and counted instead of blocking the bot.
+
+Server traffic is logged at DEBUG:
+
+    << lines received, with the Message as the argument, so
+       str(msg) is only called when the record is written
+    >> lines sent
+
+With DEBUG off, the listener skips the traffic records before building
+them.  With DEBUG on, noisy commands can be sampled, ie. one PRIVMSG in
+ten, with setup(sample={'PRIVMSG': 10}).
+
+Ex. from bearbot.core import log
+    log.setup(logging.DEBUG, path='bearbot.log', sample={'PRIVMSG': 10})
+
+'''
+
+import atexit
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+FORMAT = '%(asctime)s %(levelname)s %(name)s: %(message)s'
+CONSOLE_FORMAT = '%(message)s'
+QUEUE_SIZE = 10000  # Records waiting for the writer before dropping
+MAX_BYTES = 5 * 1024 * 1024  # Size of a log file before it's rotated
+BACKUPS = 5  # Rotated log files kept
+
+root = logging.getLogger('bearbot')
+_listener = None
+_handler = None
+
+class DroppingQueueHandler(QueueHandler):
+    ''' Queues records without formatting them or ever blocking
+
+    Records that don't fit in the queue are counted in dropped.
+
+    '''
+
+    def __init__(self, record_queue):
+        super().__init__(record_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        return record  # Formatted by the writer thread
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+class _Listener(QueueListener):
+    ''' QueueListener that waits for room to queue its stop sentinel '''
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+class SampleFilter(logging.Filter):
+    ''' Passes one in every n records per irc command
+
+    rates maps a command to n, ie. {'PRIVMSG': 10}.  Records are matched
+    by their 'command' attribute (logged with extra={'command': ...});
+    records without one always pass.
+
+    '''
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = dict(rates)
+        self._counts = dict.fromkeys(self.rates, 0)
+
+    def filter(self, record):
+        command = getattr(record, 'command', None)
+        rate = self.rates.get(command)
+        if rate is None:
+            return True
+        count = self._counts[command]
+        self._counts[command] = count + 1
+        return count % rate == 0
+
+class Lines(object):
+    ''' Lines rendered one per row when (and only if) they're logged '''
+
+    __slots__ = ('lines', 'mark')
+
+    def __init__(self, lines, mark='>>'):
+        self.lines = lines
+        self.mark = mark
+
+    def __str__(self):
+        return '\n'.join('%s %s' % (self.mark, line) for line in self.lines)
+
+def get_logger(name):
+    ''' Returns the logger for a bot, ie. get_logger('irc.rizon.net') '''
+    return root.getChild(name.replace('.', '_'))
+
+def setup(level=logging.INFO, path=None, sample=None, queue_size=QUEUE_SIZE,
+          max_bytes=MAX_BYTES, backups=BACKUPS, console=True):
+    ''' Starts the writer thread and routes bot logging through it
+
+    path adds a rotating log file.  Calling setup() again replaces the
+    previous configuration.
+
+    '''
+    global _listener, _handler
+    shutdown()
+    handlers = []
+    if console:
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(stream)
+    if path is not None:
+        rotating = RotatingFileHandler(path, maxBytes=max_bytes,
+                                       backupCount=backups, encoding='utf-8')
+        rotating.setFormatter(logging.Formatter(FORMAT))
+        handlers.append(rotating)
+
+    record_queue = queue.Queue(queue_size)
+    _handler = DroppingQueueHandler(record_queue)
+    if sample:
+        _handler.addFilter(SampleFilter(sample))
+    _listener = _Listener(record_queue, *handlers,
+                          respect_handler_level=True)
+    _listener.start()
+    root.addHandler(_handler)
+    root.setLevel(level)
+    root.propagate = False
+
+def configured():
+    ''' True once setup() has been called '''
+    return _listener is not None
+
+def dropped():
+    ''' Records dropped because the queue was full '''
+    return _handler.dropped if _handler is not None else 0
+
+def shutdown():
+    ''' Writes the queued records and stops the writer thread '''
+    global _listener, _handler
+    if _listener is not None:
+        root.removeHandler(_handler)
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = _handler = None
+
+atexit.register(shutdown)
@@ -13,160 +13,476 @@ structure.
 This module provides a class to create message objects that structures
 a message into its respective attributes.
 
-'''
-
-import re
+Messages are parsed lazily.  Only the command is found when a Message
+is created; the prefix and the parameters are split the first time
+they're used, so messages nobody handles cost little more than their
+raw string.  Message(raw) returns an instance of the subclass for the
+command (ie. Privmsg for PRIVMSG), which adds the command's attributes
+as properties.
 
-server_commands = {}  # Dictionary of server commands/setup methods
+'''
 
 class Message(object):
     ''' Structures irc messages from into useful objects
-    
+
     An object of this class has attributes dependent on its command,
     so be careful to know what command the message has before calling
     its attribute.
 
+    Every message has raw, command, prefix, params, middle and trailing.
+    nick, user, host and uhost are None unless the prefix is a
+    nick!user@host.
+
     '''
 
-    def __init__(self, raw):
-        self.raw = raw.strip('\r\n')  # Raw message from host
-        self.parse(self.raw)  # Sets prefix, command, and params
-        self.parse_params()  # Sets attributes according to command type
-
-    def parse(self, raw):
-        ''' Parses message into three main parts and subparts '''
-        
-        # Message = *prefix, command, params
-        if not raw[0] == ':':
-            self.prefix = ''
-            self.command, self.params = raw.split(' ', 1)
-        else:
-            self.prefix, self.command, self.params = raw.split(' ', 2)
-            self.prefix = self.prefix[1:]  # Removes colon
-            if '!' in self.prefix:  # Checks for nick!user@host
-                self.nick, self.uhost = self.prefix.split('!')  # nick, uhost
-                self.user, self.host = self.uhost.split('@')  # user, host
-
-        # Params = middle, trailing
-        if ':' in self.params:
-            self.middle, self.trailing = self.params.split(':', 1)
+    __slots__ = ('raw', 'command', '_at', '_origin', '_middle', '_trailing',
+                 '_fields')
+
+    def __new__(cls, raw):
+        raw = raw.strip('\r\n')  # Raw message from host
+        start = raw.index(' ') + 1 if raw[0] == ':' else 0
+        end = raw.find(' ', start)
+        if end < 0:
+            end = len(raw)
+        command = raw[start:end]
+        if cls is Message:
+            cls = server_commands.get(command, Message)
+        self = object.__new__(cls)
+        self.raw = raw
+        self.command = command
+        self._at = end + 1  # Where the params start
+        self._origin = self._middle = self._fields = None  # Not parsed yet
+        return self
+
+    def __reduce__(self):
+        return (Message, (self.raw,))
+
+    # Prefix
+
+    def _parse_prefix(self):
+        ''' Returns (prefix, nick, user, host), parsed on first use '''
+        if self._origin is None:
+            raw = self.raw
+            if raw[0] != ':':
+                self._origin = ('', None, None, None)
+                return self._origin
+            prefix = raw[1:self._at - len(self.command) - 2]
+            bang = prefix.find('!')
+            if bang < 0:
+                self._origin = (prefix, None, None, None)
+            else:  # nick!user@host
+                at = prefix.find('@', bang)
+                if at < 0:
+                    at = len(prefix)
+                self._origin = (prefix, prefix[:bang], prefix[bang + 1:at],
+                                prefix[at + 1:])
+        return self._origin
+
+    @property
+    def prefix(self):
+        ''' The origin of the message without its colon, or '' '''
+        return self._parse_prefix()[0]
+
+    @property
+    def nick(self):
+        return self._parse_prefix()[1]
+
+    @property
+    def user(self):
+        return self._parse_prefix()[2]
+
+    @property
+    def host(self):
+        return self._parse_prefix()[3]
+
+    @property
+    def uhost(self):
+        ''' user@host of the sender '''
+        prefix, nick, user, host = self._parse_prefix()
+        return None if user is None else '%s@%s' % (user, host)
+
+    # Params
+
+    @property
+    def params(self):
+        ''' Everything after the command '''
+        return self.raw[self._at:]
+
+    @property
+    def middle(self):
+        ''' Params before the trailing param, without the last space '''
+        if self._middle is None:
+            self._split_params()
+        return self._middle
+
+    @property
+    def trailing(self):
+        ''' The param after the first ' :', or '' '''
+        if self._middle is None:
+            self._split_params()
+        return self._trailing
+
+    def _split_params(self):
+        ''' Params = middle, trailing (after the first ' :') '''
+        raw, at = self.raw, self._at
+        if raw.startswith(':', at):
+            self._middle, self._trailing = '', raw[at + 1:]
+            return
+        colon = raw.find(' :', at)
+        if colon < 0:
+            self._middle, self._trailing = raw[at:].strip(), ''
         else:
-            self.middle, self.trailing = self.params, ''
-        self.middle = self.middle.strip()  # Removes trailing ' '
+            self._middle, self._trailing = raw[at:colon].strip(), \
+                                           raw[colon + 2:]
 
-    def parse_params(self):
-        ''' Sets attributes depending on message type '''
-        if self.command in server_commands.keys(): 
-            server_commands[self.command](self)
+    def _split_middle(self):
+        ''' Returns the middle params as a list, split once per message '''
+        if self._fields is None:
+            self._fields = self.middle.split()
+        return self._fields
+
+    @property
+    def string(self):
+        ''' Human-readable form of the message '''
+        return ('%s %s %s %s' % (self.prefix, self.command, self.middle,
+                                 self.trailing))
 
     def __str__(self):
         ''' Outputs attributes in human-readable format '''
-        if hasattr(self, 'string'):
-            return self.string
-        
-        # Default strings for messages undefined
-        if not self.prefix is None:
-            return ('%s %s %s %s' % (self.prefix, self.command, self.middle,
-                                     self.trailing))
-        return ('%s %s %s' % (self.command, self.middle, self.trailing))
+        return self.string
+
+    def __repr__(self):
+        return '<%s %r>' % (type(self).__name__, self.raw)
 
 
-''' Parameter setup functions
+''' Command messages
 
 All messages have parameters. Parameters are unique to the command.
-These functions serve to set the appropriate attributes depending on
-the command.  The Message class passes itself to the appropriate
-function and the function sets its attributes according to the type of
-command.
-
-These functions are left outside of the class for performance.  There
-will eventually be too many for the program to build references to
-every time a Message object is created, which can be hundreds to
-thousands per second.  The set_params() method uses the server_commands
-dictionary to point the object to these functions depending on its
-command type. To manage its parameters, use its msg.
+The subclasses below give the parameters of a command their names.
+Message(raw) picks the subclass from the server_commands dictionary at
+the bottom of the module, so supporting a new command means adding a
+subclass and an entry there.
+
+Subclasses add no instance attributes (__slots__ = ()); what they
+return is worked out from middle and trailing when it's asked for.
 
 '''
 
-def privmsg(pm):
-    ''' Sets PRIVMSG attributes '''
-    pm.source, pm.content = pm.middle, pm.trailing  # Sets source, content
-    
-    # Sets human-readable string
-    if hasattr(pm, 'nick'):
-        pm.string = ('%s <%s> %s' % (pm.source, pm.nick, pm.content)); return
-    pm.string = ('%s %s <%s> %s' % (pm.prefix, pm.command,pm.source,
-                                    pm.content))
-
-def ping(pmsg):
-    ''' Sets PING attributes '''
-    pmsg.string = ('%s %s' % (pmsg.command, pmsg.trailing))
-    
-def join(jmsg):
-    ''' Sets JOIN attributes '''
-    jmsg.channel = jmsg.middle
-    jmsg.string = ('━━▶  %s (%s) has joined %s' %
-                   (jmsg.nick, jmsg.uhost, jmsg.channel))
-
-def part(pmsg):
-    ''' Sets PART attributes '''
-    pmsg.channel = pmsg.middle
-    pmsg.string = ('◀━━  %s (%s) has left %s' %
-                   (pmsg.nick, pmsg.uhost, pmsg.channel))
-
-def nick(nmsg):
-    ''' Sets NICK attributes '''
-    nmsg.new_nick = nmsg.trailing
-    nmsg.string = ('❢  %s is now known as %s' %
-                   (nmsg.nick, nmsg.new_nick))
-    
-def quit_(qmsg):
-    ''' Sets QUIT attributes '''
-    qmsg.quit_message = qmsg.params[1:]
-    qmsg.string = ('◀━━  %s (%s) has quit (%s)' % (qmsg.nick,
-                      qmsg.uhost, qmsg.quit_message))
-
-def notice(nmsg):
-    ''' Sets NOTICE attributes '''
-    nmsg.source, nmsg.content = nmsg.middle, nmsg.trailing
-    if hasattr(nmsg, 'nick'):
-        nmsg.string = ('%s (%s) - NOTICE - %s' %
-                       (nmsg.nick, nmsg.uhost, nmsg.content)); return
-    nmsg.string = ('%s - NOTICE - %s' % (nmsg.prefix, nmsg.content))
+class Privmsg(Message):
+    ''' PRIVMSG: source is the channel or nick it was sent to '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self.middle
+
+    @property
+    def content(self):
+        return self.trailing
+
+    @property
+    def string(self):
+        if self.nick is not None:
+            return '%s <%s> %s' % (self.source, self.nick, self.content)
+        return ('%s %s <%s> %s' % (self.prefix, self.command, self.source,
+                                   self.content))
+
+class Ping(Message):
+    ''' PING from the server '''
+
+    __slots__ = ()
+
+    @property
+    def string(self):
+        return '%s %s' % (self.command, self.trailing)
+
+class Join(Message):
+    ''' JOIN of the sender to channel '''
+
+    __slots__ = ()
+
+    @property
+    def channel(self):
+        return self.middle or self.trailing  # JOIN :#channel
+
+    @property
+    def string(self):
+        return ('━━▶  %s (%s) has joined %s' %
+                (self.nick, self.uhost, self.channel))
+
+class Part(Message):
+    ''' PART of the sender from channel '''
+
+    __slots__ = ()
+
+    @property
+    def channel(self):
+        return self.middle
+
+    @property
+    def string(self):
+        return ('◀━━  %s (%s) has left %s' %
+                (self.nick, self.uhost, self.channel))
+
+class Nick(Message):
+    ''' NICK change of the sender to new_nick '''
+
+    __slots__ = ()
+
+    @property
+    def new_nick(self):
+        return self.trailing or self.middle
+
+    @property
+    def string(self):
+        return '❢  %s is now known as %s' % (self.nick, self.new_nick)
+
+class Quit(Message):
+    ''' QUIT of the sender '''
+
+    __slots__ = ()
+
+    @property
+    def quit_message(self):
+        return self.params[1:]
+
+    @property
+    def string(self):
+        return ('◀━━  %s (%s) has quit (%s)' %
+                (self.nick, self.uhost, self.quit_message))
+
+class Kick(Message):
+    ''' KICK of kicked from channel by the sender '''
+
+    __slots__ = ()
+
+    @property
+    def channel(self):
+        return self._split_middle()[0]
+
+    @property
+    def kicked(self):
+        return self._split_middle()[1]
+
+    @property
+    def reason(self):
+        return self.trailing
+
+    @property
+    def string(self):
+        return ('◀━━  %s was kicked from %s by %s (%s)' %
+                (self.kicked, self.channel, self.nick, self.reason))
+
+class Mode(Message):
+    ''' MODE change: target, modes ('+o-v') and mode_args (list) '''
+
+    __slots__ = ()
+
+    def _mode_params(self):
+        params = list(self._split_middle())
+        if self.trailing:
+            params.append(self.trailing)
+        return params
+
+    @property
+    def target(self):
+        return self._split_middle()[0]
+
+    @property
+    def modes(self):
+        return self._mode_params()[1]
+
+    @property
+    def mode_args(self):
+        return self._mode_params()[2:]
+
+    @property
+    def string(self):
+        return ('❢  %s sets mode %s %s' %
+                (self.nick if self.nick is not None else self.prefix,
+                 self.target, ' '.join(self._mode_params()[1:])))
+
+class Notice(Message):
+    ''' NOTICE: source is the channel or nick it was sent to '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self.middle
+
+    @property
+    def content(self):
+        return self.trailing
+
+    @property
+    def string(self):
+        if self.nick is not None:
+            return ('%s (%s) - NOTICE - %s' %
+                    (self.nick, self.uhost, self.content))
+        return '%s - NOTICE - %s' % (self.prefix, self.content)
 
 ''' Command Response Messages
 
-Just like above, these functions serve to set attributes unique to the
-type of command a message has.  These are server replies that have
-three digit control codes as commands.  In the range 200-399 are server
+Just like above, these classes name the parameters unique to the type
+of command a message has.  These are server replies that have three
+digit control codes as commands.  In the range 200-399 are server
 responses to commands given to them.
 
 '''
 
-def who_reply(who):
-    ''' (352 - RPL_WHOREPLY) sets attributes for WHO command replies '''
-    who.source, who.channel, who.user, who.host, who.server, who.nick,\
-    who.flags = who.middle.split()
-    who.hopcount, who.realname = who.trailing.split()
-    
-    who.string = ('%s %s %s@%s (%s)' %
-                  (who.channel, who.nick, who.user, who.host, who.realname))
-
-def end_of_who(end_msg):
-    ''' (315 - RPL_ENDOFWHO) sets attributes for ENDOFWHO messages '''
-    end_msg.source, end_msg.target = end_msg.middle.split()
-    end_msg.content = end_msg.trailing
-
-def motd(motd_msg):
-    ''' (372, 375, 376 - MOTD) sets attributes for MOTD messages'''
-    motd_msg.source, motd_msg.content = motd_msg.middle, motd_msg.trailing
-    motd_msg.string = ('✉  %s' % motd_msg.content)
-
-# Dictionary of server commands to their respective setup methods
+class ISupport(Message):
+    ''' (005 - RPL_ISUPPORT) the server features it announces
+
+    isupport maps each token to its value ('' for tokens without one).
+    A token the server withdraws is kept as '-TOKEN'.
+
+    '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self._split_middle()[0]
+
+    @property
+    def isupport(self):
+        tokens = {}
+        for token in self._split_middle()[1:]:
+            name, _, value = token.partition('=')
+            tokens[name] = value.replace('\\x20', ' ')
+        return tokens
+
+class WhoReply(Message):
+    ''' (352 - RPL_WHOREPLY) a WHO command reply
+
+    nick, user and host are those of the user described, not of the
+    server that sent the reply.
+
+    '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self._split_middle()[0]
+
+    @property
+    def channel(self):
+        return self._split_middle()[1]
+
+    @property
+    def user(self):
+        return self._split_middle()[2]
+
+    @property
+    def host(self):
+        return self._split_middle()[3]
+
+    @property
+    def uhost(self):
+        return '%s@%s' % (self.user, self.host)
+
+    @property
+    def server(self):
+        return self._split_middle()[4]
+
+    @property
+    def nick(self):
+        return self._split_middle()[5]
+
+    @property
+    def flags(self):
+        return self._split_middle()[6]
+
+    @property
+    def hopcount(self):
+        return self.trailing.split(' ', 1)[0]
+
+    @property
+    def realname(self):
+        return (self.trailing.split(' ', 1) + [''])[1]
+
+    @property
+    def string(self):
+        return ('%s %s %s@%s (%s)' %
+                (self.channel, self.nick, self.user, self.host, self.realname))
+
+class EndOfWho(Message):
+    ''' (315 - RPL_ENDOFWHO) end of the replies to a WHO for target '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self._split_middle()[0]
+
+    @property
+    def target(self):
+        return self._split_middle()[1]
+
+    @property
+    def content(self):
+        return self.trailing
+
+class NamesReply(Message):
+    ''' (353 - RPL_NAMREPLY) names (list) of members of channel '''
+
+    __slots__ = ()
+
+    @property
+    def channel(self):
+        return self._split_middle()[-1]
+
+    @property
+    def names(self):
+        return self.trailing.split()
+
+    @property
+    def string(self):
+        return '%s %s' % (self.channel, self.trailing)
+
+class EndOfNames(Message):
+    ''' (366 - RPL_ENDOFNAMES) end of the NAMES replies for channel '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self._split_middle()[0]
+
+    @property
+    def channel(self):
+        return self._split_middle()[1]
+
+    @property
+    def content(self):
+        return self.trailing
+
+class Motd(Message):
+    ''' (372, 375, 376 - MOTD) a line of the message of the day '''
+
+    __slots__ = ()
+
+    @property
+    def source(self):
+        return self.middle
+
+    @property
+    def content(self):
+        return self.trailing
+
+    @property
+    def string(self):
+        return '✉  %s' % self.content
+
+# Dictionary of server commands to their Message subclasses
 server_commands = {
-        'PRIVMSG': privmsg, 'PING': ping, '352': who_reply, '315': end_of_who, '372': motd,
-        '375': motd, '376': motd, 'JOIN': join, 'PART': part, 'NICK': nick,
-        'QUIT': quit_, 'NOTICE': notice
+        'PRIVMSG': Privmsg, 'PING': Ping, '352': WhoReply, '315': EndOfWho,
+        '372': Motd, '375': Motd, '376': Motd, 'JOIN': Join, 'PART': Part,
+        'NICK': Nick, 'QUIT': Quit, 'NOTICE': Notice, 'KICK': Kick,
+        'MODE': Mode, '353': NamesReply, '366': EndOfNames, '005': ISupport
     }
 
 def main():
@@ -186,10 +502,10 @@ def main():
         ':#chat',
         ':MisterKpak!~IceChat77@Rizon-589BB261.bflony.fios.verizon.net QUIT '\
         ':Killed (irc.sxci.net (4 joins/parts in #chat within 3 seconds.))',
-        ':Ziginox!~geek@418.I.am.a.teapot PRIVMSG #chat :ACTION is blown aw'\
-        "ay by the force of Rosie's statement",
-        ':Global!service@rizon.net NOTICE Bearbot :[Logon News - May 21 201'\
-        '1] First time on Rizon? Be sure to read the FAQ! http://s.rizon.ne'\
+        ':Ziginox!~geek@418.I.am.a.teapot PRIVMSG #chat :ACTION is blown aw'\
+        "ay by the force of Rosie's statement",
+        ':Global!service@rizon.net NOTICE Bearbot :[Logon News - May 21 201'\
+        '1] First time on Rizon? Be sure to read the FAQ! http://s.rizon.ne'\
         't/FAQ',
         ':irc.cccp-project.net NOTICE AUTH :*** Looking up your hostname...'
     ]
@@ -198,4 +514,4 @@ def main():
         print(str(Message(test)))
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
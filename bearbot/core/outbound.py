@@ -0,0 +1,205 @@
+'''
+Created on Oct 18, 2026
+
+Outbound flood control.
+
+Servers disconnect clients that send too fast, so every line the bot
+sends goes through an OutboundQueue.  Sending only queues the line and
+returns.  A writer (a thread for Bot, a task for AsyncBot) takes lines
+off the queue as a token bucket allows: up to burst lines at once, then
+rate lines per second.
+
+Lines are queued in priority lanes.  The writer always empties a higher
+lane first, so a PONG is never stuck behind chatter:
+
+    HIGH   - PONG and connection registration
+    ADMIN  - Replies to the owner and admins
+    NORMAL - Everything else
+
+Inside a lane, lines are queued per target (channel or nick) and the
+targets take turns, so one busy channel can't hold up the others.
+
+The writer takes every line the bucket allows out at once as a batch,
+so a multi-line reply is written with one socket call instead of one
+per line.
+
+'''
+
+import threading
+from collections import OrderedDict, deque
+from time import monotonic
+
+# Priority lanes
+HIGH, ADMIN, NORMAL = 0, 1, 2
+LANES = 3
+
+BATCH_BYTES = 8192  # Most text written with one socket call
+
+class TokenBucket(object):
+    ''' Allows burst events at once and rate events per second after
+
+    A rate of None (or 0) means unlimited.
+
+    '''
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.stamp = monotonic()
+
+    def _refill(self):
+        now = monotonic()
+        if self.rate:
+            self.tokens = min(self.burst,
+                              self.tokens + (now - self.stamp) * self.rate)
+        else:
+            self.tokens = self.burst
+        self.stamp = now
+
+    def take(self, n=1):
+        ''' Takes n tokens and returns 0, or returns seconds to wait '''
+        self._refill()
+        if self.tokens >= n:
+            self.tokens -= n
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def set_rate(self, rate, burst=None):
+        ''' Changes the refill rate (and burst) keeping current tokens '''
+        self._refill()
+        self.rate = rate
+        if burst is not None:
+            self.burst = burst
+            self.tokens = min(self.tokens, burst)
+
+class OutboundQueue(object):
+    ''' Thread-safe queue of outbound lines with priority lanes
+
+    put() never blocks.  A writer thread uses get(), which blocks until
+    a line is allowed out.  An event loop uses pop(), which returns
+    right away with how long to wait instead, and sets notify to a
+    callback that wakes it when a line is queued.
+
+    '''
+
+    def __init__(self, rate, burst=1):
+        self.bucket = TokenBucket(rate, burst)
+        self.lanes = [OrderedDict() for _ in range(LANES)]  # target: deque
+        self.size = 0  # Lines queued
+        self.unfinished = 0  # Lines queued or being written
+        self.closed = False
+        self.notify = None  # Called after every put()
+        self._cond = threading.Condition()
+
+    def __len__(self):
+        return self.size
+
+    def put(self, line, target=None, priority=NORMAL):
+        ''' Queues a line for target in a priority lane '''
+        self.put_many((line,), target, priority)
+
+    def put_many(self, lines, target=None, priority=NORMAL):
+        ''' Queues lines together so one batch can carry all of them '''
+        with self._cond:
+            lane = self.lanes[priority]
+            queued = lane.get(target)
+            if queued is None:
+                queued = lane[target] = deque()
+            queued.extend(lines)
+            self.size += len(lines)
+            self.unfinished += len(lines)
+            self._cond.notify_all()
+        if self.notify is not None:
+            self.notify()
+
+    def get(self, max_bytes=BATCH_BYTES):
+        ''' Blocks until lines may be sent and returns them as a list
+
+        Returns None once the queue is closed and empty.
+
+        '''
+        with self._cond:
+            while True:
+                if self.size:
+                    wait = self.bucket.take()
+                    if not wait:
+                        return self._pop_batch(max_bytes)
+                    self._cond.wait(wait)
+                elif self.closed:
+                    return None
+                else:
+                    self._cond.wait()
+
+    def pop(self, max_bytes=BATCH_BYTES):
+        ''' Returns (lines, 0) or (None, seconds to wait) without blocking
+
+        The wait is None when the queue is empty.
+
+        '''
+        with self._cond:
+            if not self.size:
+                return None, None
+            wait = self.bucket.take()
+            if wait:
+                return None, wait
+            return self._pop_batch(max_bytes), 0
+
+    def _pop_batch(self, max_bytes):
+        ''' Takes lines while tokens last (the first is already paid) '''
+        batch = [self._pop()]
+        size = len(batch[0])
+        while self.size and size < max_bytes and not self.bucket.take():
+            line = self._pop()
+            batch.append(line)
+            size += len(line)
+        return batch
+
+    def _pop(self):
+        ''' Takes the next line, rotating between targets '''
+        for lane in self.lanes:
+            if lane:
+                target, lines = next(iter(lane.items()))
+                line = lines.popleft()
+                if lines:
+                    lane.move_to_end(target)  # Next target's turn
+                else:
+                    del lane[target]
+                self.size -= 1
+                return line
+
+    def task_done(self, count=1):
+        ''' Marks lines returned by get() or pop() as written '''
+        with self._cond:
+            self.unfinished -= count
+            self._cond.notify_all()
+
+    def join(self, timeout=None):
+        ''' Waits until every queued line is written
+
+        Returns False if the timeout passed first.
+
+        '''
+        with self._cond:
+            return self._cond.wait_for(lambda: not self.unfinished, timeout)
+
+    def close(self):
+        ''' Lets get() return None once the queue is empty '''
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def clear(self):
+        ''' Drops every queued line '''
+        with self._cond:
+            for lane in self.lanes:
+                lane.clear()
+            self.unfinished -= self.size
+            self.size = 0
+            self._cond.notify_all()
+
+    def set_rate(self, rate, burst=None):
+        ''' Changes the token bucket rate (and burst) '''
+        with self._cond:
+            self.bucket.set_rate(rate, burst)
+            self._cond.notify_all()
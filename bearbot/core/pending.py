@@ -0,0 +1,239 @@
+'''
+Created on Oct 18, 2026
+
+Correlates server replies with the queries that asked for them.
+
+A query such as WHO, NAMES or JOIN is answered by a run of numeric
+replies: items (352 RPL_WHOREPLY ..), then a terminator (315
+RPL_ENDOFWHO) or an error (401 ERR_NOSUCHNICK).  Before sending the
+query, the bot registers a Request naming those numerics and the target
+the replies will mention.  The read loop feeds every message to the
+PendingRequests registry, which routes it to the matching Request.
+
+Any number of requests can be in flight at once, even for the same
+numerics, since replies are matched by target.  A message that no
+request is waiting for costs one dict lookup.
+
+'''
+
+import threading
+from collections import deque
+from time import monotonic
+
+from bearbot.core.roster import irc_lower
+
+REPLY_TIMEOUT = 30  # Seconds to wait for the end of a reply
+
+def _second_param(msg):
+    ''' Target of most numerics: <me> <target> ... '''
+    params = msg.middle.split()
+    return (params[1],) if len(params) > 1 else ()
+
+def _who_reply(msg):
+    ''' 352: <me> <channel> <user> <host> <server> <nick> ... '''
+    params = msg.middle.split()
+    return (params[1], params[5]) if len(params) > 5 else ()
+
+def _names_reply(msg):
+    ''' 353: <me> <type> <channel> :names '''
+    return (msg.middle.split()[-1],)
+
+def _join(msg):
+    ''' JOIN echo: the channel joined '''
+    return (msg.middle or msg.trailing,)
+
+# Where a reply names its target, by command.  Other commands use the
+# second parameter.
+TARGETS = {'352': _who_reply, '353': _names_reply, 'JOIN': _join}
+
+class Request(object):
+    ''' A query waiting for its replies
+
+    Iterating a Request, or calling result(), waits until the query
+    has finished, failed or timed out.  Afterwards:
+
+        replies   - item messages received, in order
+        end       - the terminator message, or None
+        error     - the error message, or None
+        timed_out - True if neither came in time
+
+    '''
+
+    def __init__(self, target, items=(), terminators=(), errors=(),
+                 timeout=REPLY_TIMEOUT, accept=None):
+        self.target = target
+        self.key = irc_lower(target) if target is not None else None
+        self.items = frozenset(items)
+        self.terminators = frozenset(terminators)
+        self.errors = frozenset(errors)
+        self.commands = self.items | self.terminators | self.errors
+        self.accept = accept  # Optional check a message must pass
+        self.deadline = monotonic() + timeout
+        self.replies = []
+        self.end = None
+        self.error = None
+        self.timed_out = False
+        self.done = threading.Event()
+        self.wait = None  # Set by the bot: wait(request, timeout)
+        self._callbacks = []
+
+    def __iter__(self):
+        return iter(self.result())
+
+    @property
+    def ok(self):
+        ''' True if the query finished without an error '''
+        return self.end is not None
+
+    def feed(self, msg):
+        ''' Takes a matched message, returns True if it was the last '''
+        if self.done.is_set():
+            return True
+        if msg.command in self.items:
+            self.replies.append(msg)
+            if not self.terminators and not self.errors:
+                self._finish()
+        elif msg.command in self.terminators:
+            self.end = msg
+            self._finish()
+        else:
+            self.error = msg
+            self._finish()
+        return self.done.is_set()
+
+    def result(self, timeout=None):
+        ''' Waits for the request to finish and returns its replies '''
+        if not self.done.is_set():
+            if timeout is None:
+                timeout = max(0, self.deadline - monotonic())
+            if self.wait is not None:
+                self.wait(self, timeout)
+            else:
+                self.done.wait(timeout)
+            if not self.done.is_set():
+                self.expire()
+        return self.replies
+
+    def expire(self):
+        ''' Gives up waiting for replies '''
+        if not self.done.is_set():
+            self.timed_out = True
+            self._finish()
+
+    def add_done_callback(self, callback):
+        ''' Calls callback(request) once the request finishes '''
+        self._callbacks.append(callback)
+        if self.done.is_set():
+            callback(self)
+
+    def _finish(self):
+        self.done.set()
+        for callback in self._callbacks:
+            callback(self)
+
+class PendingRequests(object):
+    ''' Registry routing server replies to waiting Requests
+
+    Requests are indexed by (command, lowered target).  A request with
+    no target (ie. WHO for a mask) takes replies no other request
+    matches, oldest request first.
+
+    '''
+
+    def __init__(self):
+        self._index = {}  # (command, key): deque of Requests
+        self._commands = {}  # command: number of index entries
+        self._order = deque()  # Requests by age, for expiry
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._order)
+
+    def __contains__(self, command):
+        ''' True if some request is waiting for command '''
+        return command in self._commands
+
+    def register(self, request):
+        ''' Starts routing replies to request '''
+        with self._lock:
+            self._expire()
+            for command in request.commands:
+                entry = (command, request.key)
+                if entry not in self._index:
+                    self._index[entry] = deque()
+                    self._commands[command] = \
+                            self._commands.get(command, 0) + 1
+                self._index[entry].append(request)
+            self._order.append(request)
+        request.add_done_callback(self._remove)
+        return request
+
+    def feed(self, msg):
+        ''' Routes msg to the request waiting for it, if any '''
+        if msg.command not in self._commands:
+            return
+        with self._lock:
+            request = self._match(msg)
+        if request is not None:
+            request.feed(msg)
+
+    def _match(self, msg):
+        command = msg.command
+        for target in TARGETS.get(command, _second_param)(msg):
+            request = self._first((command, irc_lower(target)), msg)
+            if request is not None:
+                return request
+        return self._first((command, None), msg)
+
+    def _first(self, entry, msg):
+        requests = self._index.get(entry)
+        if requests:
+            for request in requests:
+                if request.accept is None or request.accept(msg):
+                    return request
+        return None
+
+    def _remove(self, request):
+        ''' Unregisters a finished request '''
+        with self._lock:
+            for command in request.commands:
+                entry = (command, request.key)
+                requests = self._index.get(entry)
+                if requests is None:
+                    continue
+                try:
+                    requests.remove(request)
+                except ValueError:
+                    pass
+                if not requests:
+                    del self._index[entry]
+                    self._commands[command] -= 1
+                    if not self._commands[command]:
+                        del self._commands[command]
+            try:
+                self._order.remove(request)
+            except ValueError:
+                pass
+
+    def _expire(self):
+        ''' Times out requests nobody waited for (lock held) '''
+        now = monotonic()
+        expired = []
+        for request in self._order:
+            if request.deadline > now:
+                break
+            expired.append(request)
+        if expired:
+            self._lock.release()
+            try:
+                for request in expired:
+                    request.expire()
+            finally:
+                self._lock.acquire()
+
+    def clear(self):
+        ''' Times out every request (ie. after a disconnect) '''
+        with self._lock:
+            requests = list(self._order)
+        for request in requests:
+            request.expire()
@@ -0,0 +1,304 @@
+'''
+Created on Oct 18, 2026
+
+This module loads plugins, the modules of user commands and handlers in
+packages like applications, the first time they're used.
+
+Importing every application when the bot started (and ip_info's urllib
+with it) kept it from connecting while it did work most sessions never
+need.  Instead a plugin package has a manifest, a dict in its __init__
+of what each of its modules registers:
+
+    MANIFEST = {
+        'chatter': {
+            'commands': {
+                'chatter': {'args': 'setting',
+                            'help': 'Turns chatter on or off'},
+                ...
+            },
+            'events': ['PRIVMSG'],
+        },
+        ...
+    }
+
+A command's dict takes the arguments of @command (args, access,
+aliases, abbreviate, cost and help), so the manifest is read without
+importing anything.  PluginLoader.add() registers a stub Entry for each
+command, so help, abbreviations and argument checks work right away,
+and a stub handler for each module's events.  The first time a stub is
+used its module is imported, which registers the real commands and
+handlers in place of the stubs.
+
+Loaded modules can be reloaded without restarting the bot, ie. by the
+reload command.  The new code runs in a new module object, so commands
+already running finish on the old code, and its commands and handlers
+replace the old ones in one swap each.  If it fails to import, the old
+code stays.  Module state starts over unless the module names what to
+keep:
+
+    PRESERVE = ('chat_dic', 'chatter_on')
+
+The new module takes those from the old one, and its setup() isn't
+called again.  The loader finds changed modules by polling their
+modification times, with changed(), or every few seconds with watch().
+
+Plugins mustn't do I/O at import.  Opening files or connections goes in
+a setup() function, the module's init hook, which the loader calls once
+after importing it.
+
+The manifest is generated from the modules themselves:
+
+    python -m bearbot.core.plugins applications
+
+'''
+
+import importlib
+import importlib.util
+import os
+import sys
+import threading
+from time import perf_counter, sleep
+
+from bearbot.core.command import registry, ANYONE
+from bearbot.core.event import bus
+from bearbot.core import log
+
+# @command's defaults, left out of generated manifests
+DEFAULTS = {'args': '', 'access': ANYONE, 'aliases': (),
+            'abbreviate': True, 'cost': 1, 'help': ''}
+WATCH = 2  # Seconds between modification time checks in watch()
+
+class PluginLoader(object):
+    ''' Registers the stubs of plugin packages and loads their modules
+
+    The registry and bus are shared by every bot, and so is the loader.
+
+    '''
+
+    def __init__(self, registry=registry, bus=bus):
+        self.registry = registry
+        self.bus = bus
+        self.loaded = {}  # Module name: seconds its import and setup took
+        self.logger = log.get_logger('plugins')
+        self._packages = set()
+        self._stubs = {}  # Module name: (command names, event handler)
+        self._mtimes = {}  # Module name: source modification time loaded
+        self._lock = threading.RLock()
+
+    def add(self, package):
+        ''' Registers stubs for the modules in a package's MANIFEST '''
+        with self._lock:
+            if package in self._packages:
+                return
+            self._packages.add(package)
+            manifest = importlib.import_module(package).MANIFEST
+            for name, declared in manifest.items():
+                module = '%s.%s' % (package, name)
+                if module in sys.modules:  # Imported already, registered
+                    self.load(module)
+                else:
+                    self.stub(module, declared)
+
+    def stub(self, module, declared):
+        ''' Registers stand-ins for what a module declared, until it loads '''
+        names = []
+        for name, options in declared.get('commands', {}).items():
+            self.registry.register(name, self._command_stub(module),
+                                   options.get('args', ''),
+                                   options.get('access', ANYONE),
+                                   options.get('aliases', ()),
+                                   options.get('abbreviate', True),
+                                   options.get('cost', 1),
+                                   options.get('help', ''))
+            names.append(name)
+        handler = None
+        if declared.get('events'):
+            handler = self._event_stub(module)
+            self.bus.subscribe(declared['events'], handler)
+        self._stubs[module] = (names, handler)
+
+    def load(self, module):
+        ''' Imports a plugin module and calls its setup(), once '''
+        if module in self.loaded:
+            return
+        with self._lock:
+            if module in self.loaded:
+                return
+            start = perf_counter()
+            loaded = importlib.import_module(module)
+            setup = getattr(loaded, 'setup', None)
+            if setup is not None:
+                setup()
+            self.loaded[module] = perf_counter() - start
+            self._mtimes[module] = _mtime(loaded)
+            self._unstub(module)
+        self.logger.info('Loaded %s in %.1f ms' %
+                         (module, self.loaded[module] * 1000))
+
+    def load_all(self):
+        ''' Loads every module with stubs, ie. before forking '''
+        for module in list(self._stubs):
+            self.load(module)
+
+    def changed(self):
+        ''' Returns the loaded modules whose source changed since '''
+        return [module for module in list(self.loaded)
+                if _mtime(sys.modules.get(module)) != self._mtimes[module]]
+
+    def reload(self, module):
+        ''' Runs a loaded module's current source in place of the old
+
+        Raises what the module raised, keeping the old code, if it fails.
+
+        '''
+        with self._lock:
+            old = sys.modules[module]
+            mtime = _mtime(old)
+            spec = old.__spec__
+            code = spec.loader.source_to_code(
+                    spec.loader.get_data(spec.origin), spec.origin)
+            new = importlib.util.module_from_spec(spec)
+            with self.registry.staging() as entries,\
+                    self.bus.staging() as subscriptions:
+                exec(code, new.__dict__)
+            preserve = getattr(new, 'PRESERVE', ())
+            for name in preserve:
+                if hasattr(old, name):
+                    setattr(new, name, getattr(old, name))
+            setup = getattr(new, 'setup', None)
+            if setup is not None and not preserve:
+                setup()
+            self.registry.replace(module, entries)
+            self.bus.replace(module, subscriptions)
+            sys.modules[module] = new
+            package, _, name = module.rpartition('.')
+            if package in sys.modules:
+                setattr(sys.modules[package], name, new)
+            self._mtimes[module] = mtime
+        self.logger.info('Reloaded %s' % module)
+
+    def reload_changed(self):
+        ''' Reloads the changed modules, returns {module: error or None} '''
+        results = {}
+        for module in self.changed():
+            try:
+                self.reload(module)
+                results[module] = None
+            except Exception as e:
+                self._mtimes[module] = _mtime(sys.modules[module])
+                self.logger.error('! Reloading %s failed: %s' % (module, e))
+                results[module] = e
+        return results
+
+    def watch(self, interval=WATCH):
+        ''' Starts a thread reloading modules as they change '''
+        def poll():
+            while True:
+                sleep(interval)
+                self.reload_changed()
+        thread = threading.Thread(target=poll, name='bearbot-plugins',
+                                  daemon=True)
+        thread.start()
+        return thread
+
+    def unstubbed(self, entry):
+        ''' Returns the real Entry of a stub's command, loading its module
+
+        Returns None if the module turned out not to register it.
+
+        '''
+        self.load(entry.function.plugin)
+        entry = self.registry.resolve(entry.name)
+        if entry is not None and getattr(entry.function, 'plugin', None):
+            return None
+        return entry
+
+    def _unstub(self, module):
+        ''' Drops the stubs the module didn't replace with the real thing '''
+        names, handler = self._stubs.pop(module, ((), None))
+        for name in names:
+            entry = self.registry.resolve(name)
+            if entry is not None and\
+                    getattr(entry.function, 'plugin', None) == module:
+                self.logger.warning('%s did not register %s, which its '
+                                    'manifest declares' % (module, name))
+                self.registry.unregister(name)
+        if handler is not None:
+            self.bus.unsubscribe(handler)
+
+    def _command_stub(self, module):
+        def stub(cmd):  # For callers that run it without Bot.get_command
+            self.load(module)
+            entry = self.registry.resolve(cmd.name)
+            if entry is not None and entry.function is not stub:
+                entry.function(cmd)
+        stub.plugin = module
+        return stub
+
+    def _event_stub(self, module):
+        def stub(bot, msg):
+            self.load(module)
+            for subscription in self.bus.subscriptions():
+                if subscription.handler.__module__ != module or\
+                        not subscription.matches(msg.command):
+                    continue
+                if subscription.when is None or subscription.when(msg):
+                    subscription.handler(bot, msg)  # The message it missed
+        stub.plugin = module
+        return stub
+
+loader = PluginLoader()  # The loader bots use
+
+def _mtime(module):
+    ''' The module's source modification time, None if it has none '''
+    try:
+        return os.stat(module.__file__).st_mtime_ns
+    except (AttributeError, TypeError, OSError):
+        return None
+
+def manifest(package):
+    ''' Builds a package's MANIFEST by importing each of its modules '''
+    import pkgutil  # Only needed here, and slow to import
+    path = importlib.import_module(package).__path__
+    result = {}
+    for info in pkgutil.iter_modules(path):
+        module = '%s.%s' % (package, info.name)
+        importlib.import_module(module)
+        commands = {}
+        for entry in registry.entries():
+            if entry.function.__module__ != module:
+                continue
+            options = {'args': entry.spec, 'access': entry.access,
+                       'aliases': entry.aliases,
+                       'abbreviate': entry.abbreviate, 'cost': entry.cost,
+                       'help': entry.description}
+            commands[entry.name] = {key: value
+                                    for key, value in options.items()
+                                    if value != DEFAULTS[key]}
+        events = sorted({_pattern(pattern)
+                         for subscription in bus.subscriptions()
+                         if subscription.handler.__module__ == module
+                         for pattern in subscription.patterns})
+        declared = {}
+        if commands:
+            declared['commands'] = commands
+        if events:
+            declared['events'] = events
+        if declared:
+            result[info.name] = declared
+    return result
+
+def _pattern(pattern):
+    if isinstance(pattern, range):
+        return '%s-%s' % (pattern.start, pattern.stop - 1)
+    return pattern
+
+def main(argv=None):
+    ''' Prints the MANIFEST of each package named on the command line '''
+    import pprint
+    for package in (argv or sys.argv[1:]):
+        print('# %s' % os.path.join(package, '__init__.py'))
+        print('MANIFEST = %s' % pprint.pformat(manifest(package)))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+'''
+Created on Oct 18, 2026
+
+Live channel and user state.
+
+The Roster keeps the channels the bot is in and the users in them up to
+date from the messages the server sends anyway: JOIN, PART, KICK,
+QUIT, NICK, MODE, the NAMES replies (353/366) and the WHO replies
+(352/315).  That lets who() and access checks answer from memory
+instead of asking the server every time.
+
+Users are stored once, however many channels they share with the bot,
+and are found by nick or by channel with one dict lookup.  A user is
+forgotten once they share no channel with the bot, so memory follows
+the channels the bot is in.
+
+Nicks and channel names are compared with the rfc1459 case mapping
+irc servers use, where [ ] \\ ~ are the upper case of { } | ^.
+
+The reader thread updates the roster while commands in the worker pool
+read it, so updates and who() hold the roster's lock.  Single lookups,
+ie. user(), need none.
+
+'''
+
+import threading
+from functools import wraps
+
+RFC1459 = str.maketrans('ABCDEFGHIJKLMNOPQRSTUVWXYZ[]\\~',
+                        'abcdefghijklmnopqrstuvwxyz{}|^')
+
+# Defaults until the server's ISUPPORT (005) says otherwise
+PREFIX = '(qaohv)~&@%+'
+CHANMODES = 'beI,k,l,imnpst'
+CHANTYPES = '#&'
+
+def irc_lower(name):
+    ''' Returns name in lower case by the rfc1459 case mapping '''
+    return name.translate(RFC1459)
+
+def _locked(method):
+    ''' Runs a Roster method holding the roster's lock '''
+    @wraps(method)
+    def locked(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return locked
+
+class User(object):
+    ''' A user sharing at least one channel with the bot
+
+    channels maps a lowered channel name to the user's prefix modes in
+    that channel as a string of mode letters (ie. 'ov').
+
+    '''
+
+    __slots__ = ('nick', 'user', 'host', 'realname', 'channels')
+
+    def __init__(self, nick, user=None, host=None):
+        self.nick = nick
+        self.user = user
+        self.host = host
+        self.realname = None
+        self.channels = {}
+
+    @property
+    def prefix(self):
+        ''' nick!user@host, or None if the host isn't known '''
+        if self.host is None:
+            return None
+        return '%s!%s@%s' % (self.nick, self.user, self.host)
+
+    def __str__(self):
+        if self.realname is None:
+            return '%s %s@%s' % (self.nick, self.user, self.host)
+        return '%s %s@%s (%s)' % (self.nick, self.user, self.host,
+                                  self.realname)
+
+class Channel(object):
+    ''' A channel the bot is in
+
+    users maps a lowered nick to its User.  synced is True once the
+    server has sent the whole member list (366 RPL_ENDOFNAMES).
+
+    '''
+
+    __slots__ = ('name', 'users', 'synced')
+
+    def __init__(self, name):
+        self.name = name
+        self.users = {}
+        self.synced = False
+
+class Roster(object):
+    ''' Channels the bot is in and the users it shares them with '''
+
+    def __init__(self):
+        self.users = {}  # Lowered nick: User
+        self.channels = {}  # Lowered channel name: Channel
+        self.chantypes = CHANTYPES
+        self._lock = threading.Lock()
+        self.set_prefix(PREFIX)
+        self.set_chanmodes(CHANMODES)
+
+    # Server settings
+
+    def set_prefix(self, prefix):
+        ''' Sets the PREFIX ISUPPORT value, ie. '(ov)@+' '''
+        modes, symbols = prefix[1:].split(')')
+        self.prefix_modes = modes
+        self.prefix_symbols = dict(zip(symbols, modes))
+
+    def set_chanmodes(self, chanmodes):
+        ''' Sets the CHANMODES ISUPPORT value, ie. 'beI,k,l,imnpst' '''
+        groups = (chanmodes.split(',') + ['', '', '', ''])[:4]
+        self.param_modes = groups[0] + groups[1]  # Always have a param
+        self.set_param_modes = groups[2]  # Have a param when set
+
+    # Lookups
+
+    def user(self, nick):
+        ''' Returns the User for nick or None '''
+        return self.users.get(irc_lower(nick))
+
+    def channel(self, name):
+        ''' Returns the Channel for name or None '''
+        return self.channels.get(irc_lower(name))
+
+    def is_channel(self, name):
+        return name[:1] in self.chantypes
+
+    def prefix_of(self, nick):
+        ''' Returns nick!user@host for nick, or None if unknown '''
+        user = self.users.get(irc_lower(nick))
+        return user.prefix if user is not None else None
+
+    @_locked
+    def who(self, target):
+        ''' Returns who information for a nick or channel from memory
+
+        Returns None when the roster can't answer (an unknown nick, a
+        channel the bot isn't in, or users whose host isn't known yet)
+        so the caller can ask the server instead.
+
+        '''
+        if self.is_channel(target):
+            channel = self.channel(target)
+            if channel is None or not channel.synced:
+                return None
+            users = list(channel.users.values())
+            if any(user.host is None for user in users):
+                return None
+            return ['%s %s' % (channel.name, user) for user in users]
+        user = self.user(target)
+        if user is None or user.host is None:
+            return None
+        for key in user.channels:  # Any channel, none if the user just left
+            return ['%s %s' % (self.channels[key].name, user)]
+        return None
+
+    # Updates
+
+    @_locked
+    def joined(self, channel, nick, user=None, host=None, me=False):
+        ''' Someone (or the bot) joined a channel '''
+        key = irc_lower(channel)
+        if me:
+            self.channels[key] = Channel(channel)
+        chan = self.channels.get(key)
+        if chan is None:
+            return
+        member = self._get_user(nick, user, host)
+        member.channels[key] = ''
+        chan.users[irc_lower(nick)] = member
+
+    @_locked
+    def parted(self, channel, nick, me=False):
+        ''' Someone left a channel by PART or KICK '''
+        key = irc_lower(channel)
+        if me:
+            chan = self.channels.pop(key, None)
+            if chan is not None:
+                for member in chan.users.values():
+                    member.channels.pop(key, None)
+                    self._forget_if_unseen(member)
+            return
+        chan = self.channels.get(key)
+        if chan is None:
+            return
+        member = chan.users.pop(irc_lower(nick), None)
+        if member is not None:
+            member.channels.pop(key, None)
+            self._forget_if_unseen(member)
+
+    @_locked
+    def quit(self, nick):
+        ''' Someone quit irc '''
+        nick_key = irc_lower(nick)
+        member = self.users.pop(nick_key, None)
+        if member is None:
+            return
+        for key in member.channels:
+            self.channels[key].users.pop(nick_key, None)
+
+    @_locked
+    def nick_changed(self, old, new):
+        ''' Someone changed their nick '''
+        old_key, new_key = irc_lower(old), irc_lower(new)
+        member = self.users.pop(old_key, None)
+        if member is None:
+            return
+        member.nick = new
+        self.users[new_key] = member
+        for key in member.channels:
+            users = self.channels[key].users
+            users.pop(old_key, None)
+            users[new_key] = member
+
+    @_locked
+    def mode(self, channel, modes, args):
+        ''' Applies a channel MODE change to the members' prefix modes '''
+        chan = self.channel(channel)
+        if chan is None:
+            return
+        key = irc_lower(channel)
+        args = iter(args)
+        adding = True
+        for mode in modes:
+            if mode == '+' or mode == '-':
+                adding = mode == '+'
+            elif mode in self.prefix_modes:
+                member = chan.users.get(irc_lower(next(args, '')))
+                if member is None:
+                    continue
+                current = member.channels.get(key, '')
+                if adding and mode not in current:
+                    member.channels[key] = current + mode
+                elif not adding:
+                    member.channels[key] = current.replace(mode, '')
+            elif mode in self.param_modes or\
+                    adding and mode in self.set_param_modes:
+                next(args, None)
+
+    @_locked
+    def names(self, channel, names):
+        ''' Adds members from a 353 RPL_NAMREPLY '''
+        chan = self.channel(channel)
+        if chan is None:
+            return
+        key = irc_lower(channel)
+        for name in names:
+            modes = ''
+            while name and name[0] in self.prefix_symbols:
+                modes += self.prefix_symbols[name[0]]
+                name = name[1:]
+            nick, user, host = name, None, None
+            if '!' in name:  # userhost-in-names
+                nick, host = name.split('!', 1)
+                user, host = host.split('@', 1)
+            member = self._get_user(nick, user, host)
+            member.channels[key] = modes
+            chan.users[irc_lower(nick)] = member
+
+    @_locked
+    def end_of_names(self, channel):
+        ''' 366 RPL_ENDOFNAMES, the member list is complete '''
+        chan = self.channel(channel)
+        if chan is not None:
+            chan.synced = True
+
+    @_locked
+    def who_reply(self, nick, user, host, realname):
+        ''' Fills in a member's details from a 352 RPL_WHOREPLY '''
+        member = self.user(nick)
+        if member is not None:
+            member.user, member.host = user, host
+            member.realname = realname
+
+    @_locked
+    def clear(self):
+        ''' Forgets everything (ie. after a disconnect) '''
+        self.users.clear()
+        self.channels.clear()
+
+    def _get_user(self, nick, user, host):
+        ''' Returns the User for nick, creating it or adding its host '''
+        key = irc_lower(nick)
+        member = self.users.get(key)
+        if member is None:
+            member = self.users[key] = User(nick, user, host)
+        elif host is not None:
+            member.user, member.host = user, host
+        return member
+
+    def _forget_if_unseen(self, member):
+        if not member.channels:
+            self.users.pop(irc_lower(member.nick), None)
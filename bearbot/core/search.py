@@ -0,0 +1,159 @@
+'''
+Created on Oct 18, 2026
+
+A searchable SQLite copy of a key/value dict, ie. the chatter triggers.
+
+Listing or searching a large dict in Python means walking all of it and
+building one long reply.  A SearchIndex mirrors the dict into an SQLite
+table with an FTS5 full text index, so a page of keys is one indexed
+query that seeks to the first key of the page, and a search ranks the
+matching keys with bm25, keys counting more than values.  Either way
+only the rows shown are read.
+
+The dict stays the source of truth.  sync() brings the index up to date
+with it when the bot starts, and set() and delete() follow each change,
+queued for the database's writer thread (see the database module), so
+they don't wait for the disk.  The file is only a copy: deleting it is
+harmless, it's rebuilt on the next sync().
+
+Ex. index = SearchIndex('chatterbox.db')
+    index.sync(chat_dic)
+    index.page(2)  # The 2nd PAGE keys, ignoring case
+    index.search('honey bear')  # The best matching keys
+
+'''
+
+from bearbot.core import database
+
+PAGE = 15  # Keys on a page
+RESULTS = 10  # Keys a search returns at most
+KEY_WEIGHT = 2.0  # How much more a match in the key counts, for bm25
+
+# IF NOT EXISTS, for indexes made before the schema had versions
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS entries (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    value TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_by_key ON entries (key COLLATE NOCASE);
+CREATE VIRTUAL TABLE IF NOT EXISTS entries_text USING fts5 (
+    key, value, content='entries', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+    INSERT INTO entries_text (rowid, key, value)
+    VALUES (new.id, new.key, new.value);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+    INSERT INTO entries_text (entries_text, rowid, key, value)
+    VALUES ('delete', old.id, old.key, old.value);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE ON entries BEGIN
+    INSERT INTO entries_text (entries_text, rowid, key, value)
+    VALUES ('delete', old.id, old.key, old.value);
+    INSERT INTO entries_text (rowid, key, value)
+    VALUES (new.id, new.key, new.value);
+END;
+'''
+# Sorts like page() so it can seek, ties in case broken by the key
+KEY_ORDER = '''
+DROP INDEX IF EXISTS entries_by_key;
+CREATE INDEX entries_by_key ON entries (key COLLATE NOCASE, key);
+'''
+MIGRATIONS = (SCHEMA, KEY_ORDER)  # Schema versions, see database.migrate
+UPSERT = ('INSERT INTO entries (key, value) VALUES (?, ?) '
+          'ON CONFLICT (key) DO UPDATE SET value = excluded.value')
+
+class SearchIndex(object):
+    ''' Full text index of a dict's keys and values, see the module docs
+
+    The file is opened on first use, not when the index is created.
+
+    '''
+
+    def __init__(self, path):
+        self.path = path
+        self._database = None
+        self._marks = {}  # (page size, number): the page's first key
+
+    @property
+    def database(self):
+        ''' The Database, opened and migrated the first time '''
+        if self._database is None:
+            db = database.get(self.path)
+            db.migrate('search', MIGRATIONS)
+            self._database = db
+        return self._database
+
+    def sync(self, data):
+        ''' Updates the index to hold exactly data's keys and values '''
+        stale = [(key,) for key, value in
+                 self.database.query('SELECT key, value FROM entries')
+                 if data.get(key) != value]
+        def update(connection):
+            connection.executemany('DELETE FROM entries WHERE key = ?',
+                                   stale)
+            count, = connection.execute('SELECT count(*) FROM entries')\
+                               .fetchone()
+            if count != len(data):  # Rows left all match, some missing
+                connection.executemany('INSERT OR IGNORE INTO entries '
+                                       '(key, value) VALUES (?, ?)',
+                                       list(data.items()))
+        self.database.transaction(update)
+        self._marks = {}
+
+    def set(self, key, value):
+        self._marks = {}  # Pages after key start elsewhere now
+        self.database.write(UPSERT, (key, value))
+
+    def delete(self, key):
+        self._marks = {}
+        self.database.write('DELETE FROM entries WHERE key = ?', (key,))
+
+    def page(self, number, size=PAGE):
+        ''' The keys on page number (from 1), sorted ignoring case
+
+        Reading a page remembers the first key of the next one, so
+        paging on seeks to that key in the index instead of counting
+        every key before it.  A page further on counts from the nearest
+        page start known, and set() and delete() forget them.
+
+        '''
+        marks = self._marks
+        known = max((start for start in range(1, number + 1)
+                     if (size, start) in marks), default=None)
+        if known is None:
+            known, rows = 1, self.database.query(
+                    'SELECT key FROM entries ORDER BY key COLLATE NOCASE, '
+                    'key LIMIT ? OFFSET ?', (size + 1, (number - 1) * size))
+        else:
+            first = marks[size, known]
+            rows = self.database.query(
+                    'SELECT key FROM entries '  # The >= seeks the index
+                    'WHERE key >= ? COLLATE NOCASE '
+                    'AND (key > ? COLLATE NOCASE OR key >= ?) '
+                    'ORDER BY key COLLATE NOCASE, key LIMIT ? OFFSET ?',
+                    (first, first, first, size + 1, (number - known) * size))
+        keys = [key for key, in rows]
+        if keys:
+            marks[size, number] = keys[0]
+        if len(keys) > size:
+            marks[size, number + 1] = keys.pop()
+        return keys
+
+    def search(self, terms, limit=RESULTS):
+        ''' The keys best matching terms, best first
+
+        Every term must be in the key or value, as a word or the start
+        of one.
+
+        '''
+        query = ' '.join('"%s"*' % term.replace('"', '""')
+                         for term in terms.split()
+                         if any(character.isalnum() for character in term))
+        if not query:
+            return []
+        return [key for key, in self.database.query(
+                'SELECT key FROM entries_text WHERE entries_text MATCH ? '
+                'ORDER BY bm25(entries_text, ?, 1.0) LIMIT ?',
+                (query, KEY_WEIGHT, limit))]
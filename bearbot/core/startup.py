@@ -0,0 +1,96 @@
+'''
+Created on Oct 18, 2026
+
+Times the bot's startup: each module's import, the plugins loaded and
+how long until the first PONG.
+
+    python -m bearbot --startup-profile
+
+StartupProfile.start() must run before the modules it's to time are
+imported, so this module only imports the standard library.  It puts a
+finder at the front of sys.meta_path that wraps each module's loader,
+and records the time spent executing the module itself and the total
+with the modules it imported, like python -X importtime.
+
+'''
+
+import sys
+from time import perf_counter
+
+SHOWN = 25  # Slowest modules in the report
+
+class _Timer(object):
+    ''' The finder: times the modules found by the finders after it '''
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path=None, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, 'find_spec'):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                break
+        else:
+            return None
+        loader = spec.loader
+        if isinstance(loader, type) or\
+                not hasattr(loader, 'exec_module'):
+            return spec  # Built in and frozen modules, too quick to time
+        exec_module = loader.exec_module
+        def timed(module):
+            self.profile.enter(name)
+            try:
+                exec_module(module)
+            finally:
+                self.profile.leave(name)
+        loader.exec_module = timed
+        return spec
+
+class StartupProfile(object):
+    ''' Records import times from start() until stop() '''
+
+    def __init__(self):
+        self.began = perf_counter()
+        self.modules = {}  # Name: (own seconds, seconds with its imports)
+        self._stack = []  # [name, started, seconds in nested imports]
+        self._timer = _Timer(self)
+
+    def start(self):
+        sys.meta_path.insert(0, self._timer)
+
+    def stop(self):
+        if self._timer in sys.meta_path:
+            sys.meta_path.remove(self._timer)
+
+    def enter(self, name):
+        self._stack.append([name, perf_counter(), 0.0])
+
+    def leave(self, name):
+        name, started, nested = self._stack.pop()
+        total = perf_counter() - started
+        self.modules[name] = (total - nested, total)
+        if self._stack:
+            self._stack[-1][2] += total
+
+    def report(self, event, plugins=None, out=None):
+        ''' Prints the slowest imports and the time until event '''
+        out = out or sys.stderr
+        elapsed = perf_counter() - self.began
+        print('Startup profile: %s after %.1f ms, %.1f ms importing %s '
+              'modules' % (event, elapsed * 1000, self.imported() * 1000,
+                           len(self.modules)), file=out)
+        print('%10s %10s  module' % ('self ms', 'total ms'), file=out)
+        slowest = sorted(self.modules.items(), key=lambda item: item[1][1],
+                         reverse=True)[:SHOWN]
+        for name, (own, total) in slowest:
+            print('%10.2f %10.2f  %s' % (own * 1000, total * 1000, name),
+                  file=out)
+        for module, seconds in sorted((plugins or {}).items()):
+            print('%10s %10.2f  %s (plugin, with setup)' %
+                  ('', seconds * 1000, module), file=out)
+
+    def imported(self):
+        ''' Seconds spent importing, counting nested imports once '''
+        return sum(own for own, total in self.modules.values())
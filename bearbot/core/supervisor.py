@@ -0,0 +1,99 @@
+'''
+Created on Oct 18, 2026
+
+This module holds the Supervisor class, which runs several bots in one
+process.
+
+Each bot is an AsyncBot with its own server, nick, channels, command
+prefix and set of enabled commands.  All of them share one event loop
+thread, one thread pool for blocking commands, one process pool for
+isolated commands, and the command dictionary and applications loaded
+into the process, so another network costs a connection's buffers and
+queues instead of another interpreter.
+
+Ex. supervisor = Supervisor.from_config([
+        {'host': 'irc.rizon.net', 'owner': 'Garcia!*@bears.example.org',
+         'password': 'pass123', 'channels': ['#bears', '#botparty']},
+        {'host': 'irc.freenode.net', 'owner': 'Garcia!*@bears.example.org',
+         'password': 'pass123', 'channels': '#bears', 'port': 6697,
+         'cmd_prefix': '!', 'commands': ['hbd', 'help', 'rps']},
+    ])
+    supervisor.run()
+
+'''
+
+import asyncio
+import logging
+
+from bearbot.core.async_bot import AsyncBot
+from bearbot.core.bot import EXCEPTION
+from bearbot.core.workers import CommandPool, WORKERS
+from bearbot.core.isolation import IsolatedPool, PROCESSES
+from bearbot.core import log
+
+class Supervisor(object):
+    ''' Runs many AsyncBot connections on one event loop '''
+
+    def __init__(self, bots=(), max_workers=WORKERS, processes=PROCESSES):
+        self.bots = list(bots)
+        self.workers = CommandPool(max_workers)  # Shared by the bots
+        self.isolation = IsolatedPool(processes)  # Also shared
+        self.loop = None
+        self._tasks = {}  # bot: task
+
+    @classmethod
+    def from_config(cls, networks, **kwargs):
+        ''' Creates a supervisor from a list of AsyncBot keyword dicts '''
+        return cls([AsyncBot(**network) for network in networks], **kwargs)
+
+    def add(self, bot):
+        ''' Adds a bot, starting it right away if already running '''
+        self.bots.append(bot)
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._start, bot)
+        return bot
+
+    def add_network(self, *args, **kwargs):
+        ''' Creates an AsyncBot with Bot's arguments and adds it '''
+        return self.add(AsyncBot(*args, **kwargs))
+
+    def remove(self, bot, quit_msg=''):
+        ''' Quits a bot's network and removes it '''
+        self.bots.remove(bot)
+        if bot in self._tasks:
+            bot.quit(quit_msg)
+            bot.close_connection()
+
+    def run(self):
+        ''' Runs every bot until all of them have died '''
+        asyncio.run(self.run_async())
+
+    async def run_async(self):
+        if not log.configured():
+            log.setup()
+        self.loop = asyncio.get_running_loop()
+        for bot in self.bots:
+            self._start(bot)
+        try:
+            while self._tasks:
+                await asyncio.wait(list(self._tasks.values()),
+                                   return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            self.loop = None
+            self.workers.shutdown()
+            self.isolation.shutdown()
+
+    def _start(self, bot):
+        bot.workers = self.workers
+        bot.isolation = self.isolation
+        task = self.loop.create_task(self._run_bot(bot))
+        self._tasks[bot] = task
+
+    async def _run_bot(self, bot):
+        ''' Runs one bot so its failure doesn't stop the others '''
+        try:
+            await bot.run_async()
+        except Exception as e:
+            bot.log('%s (%s) %s' % (EXCEPTION, bot.host, e), logging.ERROR)
+        finally:
+            del self._tasks[bot]
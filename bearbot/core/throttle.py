@@ -0,0 +1,182 @@
+'''
+Created on Oct 18, 2026
+
+Inbound rate limiting for user commands and CTCP requests.
+
+Every command or CTCP request a user sends turns into lines the bot has
+to pace out, so one user repeating .help could fill the outbound queue
+for minutes.  A Throttle decides, before the Command is built, whether
+a request is answered.  It keeps a token bucket (see the outbound
+module) per user, keyed by user@host so changing nick doesn't help, and
+one per channel:
+
+    - a request costs tokens, 1 unless its command declares more
+      (ie. @command(cost=3) for a command with a long reply)
+    - a request the channel's bucket can't pay for is dropped
+    - a request the user's bucket can't pay for is dropped and counts
+      as a strike; too many strikes close together and the user is
+      ignored for a while
+    - each ignore is longer than the last, ie. 1, 5 then 30 minutes,
+      until the user has been quiet for a while
+
+The state stays bounded: users and channels are kept in least recently
+seen order, idle ones are dropped as newer ones come in, and there are
+never more than size of either.
+
+Ex. bot.throttle = Throttle(rate=.5, burst=5, penalties=(60, 600))
+
+'''
+
+from collections import OrderedDict
+from time import monotonic
+
+from bearbot.core.outbound import TokenBucket
+from bearbot.core.roster import irc_lower
+
+RATE = .5  # Requests per second a user can keep up
+BURST = 4  # Requests a user can send at once
+CHANNEL_RATE = 1  # Requests per second in one channel
+CHANNEL_BURST = 8
+STRIKES = 3  # Dropped requests that get a user ignored
+STRIKE_WINDOW = 30  # Seconds within which strikes add up
+PENALTIES = (60, 300, 1800)  # Seconds ignored, for each ignore in a row
+FORGIVE = 3600  # Quiet seconds before the penalties start over
+IDLE = 600  # Seconds before an unused bucket can be dropped
+SIZE = 4096  # Most users (and channels) kept
+
+class _User(object):
+    ''' What a Throttle knows about one user@host '''
+
+    __slots__ = ('bucket', 'seen', 'strikes', 'struck', 'level', 'until')
+
+    def __init__(self, bucket, now):
+        self.bucket = bucket
+        self.seen = now
+        self.strikes = 0
+        self.struck = 0.0  # When the last strike was
+        self.level = 0  # Ignores in a row
+        self.until = 0.0  # Ignored until
+
+    def expired(self, now, idle):
+        ''' True if nothing would be lost by forgetting the user '''
+        return now - self.seen >= idle and self.until <= now and\
+                (not self.level or now - self.struck > FORGIVE)
+
+class _Channel(object):
+
+    __slots__ = ('bucket', 'seen')
+
+    def __init__(self, bucket, now):
+        self.bucket = bucket
+        self.seen = now
+
+    def expired(self, now, idle):
+        return now - self.seen >= idle
+
+class Throttle(object):
+    ''' Token buckets per user and channel, with escalating ignores '''
+
+    def __init__(self, rate=RATE, burst=BURST, channel_rate=CHANNEL_RATE,
+                 channel_burst=CHANNEL_BURST, strikes=STRIKES,
+                 penalties=PENALTIES, size=SIZE, idle=IDLE):
+        self.rate, self.burst = rate, burst
+        self.channel_rate, self.channel_burst = channel_rate, channel_burst
+        self.strikes = strikes
+        self.penalties = penalties
+        self.size = size
+        self.idle = idle
+        self.dropped = 0  # Requests dropped
+        self.on_ignore = None  # Called with (msg, seconds) on an ignore
+        self._users = OrderedDict()  # user@host: _User, oldest first
+        self._channels = OrderedDict()  # Channel: _Channel, oldest first
+
+    def allow(self, msg, cost=1, channel=None):
+        ''' True if msg's request should be answered
+
+        channel is the channel the request was sent to, if any.  A
+        request that isn't allowed is only counted.
+
+        '''
+        now = monotonic()
+        key = msg.uhost or msg.nick
+        user = self._users.get(key)
+        if user is None:
+            user = self._add(self._users, key,
+                             _User(TokenBucket(self.rate, self.burst), now))
+        else:
+            self._users.move_to_end(key)
+            user.seen = now
+        if user.until > now:
+            self.dropped += 1
+            return False
+        if channel is not None and not self._channel_allows(channel, cost,
+                                                            now):
+            self.dropped += 1
+            return False
+        if user.bucket.take(cost):
+            self.dropped += 1
+            self._strike(user, msg, now)
+            return False
+        self._evict(self._users, now)
+        return True
+
+    def ignoring(self, msg):
+        ''' Seconds msg's sender is still ignored for, 0 if not '''
+        user = self._users.get(msg.uhost or msg.nick)
+        if user is None:
+            return 0
+        return max(0, user.until - monotonic())
+
+    def forgive(self, uhost=None):
+        ''' Forgets a user's strikes and ignores, or everybody's '''
+        if uhost is None:
+            self._users.clear()
+        else:
+            self._users.pop(uhost, None)
+
+    def __len__(self):
+        return len(self._users) + len(self._channels)
+
+    def _channel_allows(self, name, cost, now):
+        key = irc_lower(name)
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._add(self._channels, key, _Channel(
+                    TokenBucket(self.channel_rate, self.channel_burst), now))
+        else:
+            self._channels.move_to_end(key)
+            channel.seen = now
+        self._evict(self._channels, now)
+        return not channel.bucket.take(cost)
+
+    def _strike(self, user, msg, now):
+        ''' Counts a dropped request, ignoring the user after enough '''
+        if now - user.struck > FORGIVE:
+            user.level = 0
+        if now - user.struck > STRIKE_WINDOW:
+            user.strikes = 0
+        user.struck = now
+        user.strikes += 1
+        if user.strikes < self.strikes:
+            return
+        seconds = self.penalties[min(user.level, len(self.penalties) - 1)]
+        user.until = now + seconds
+        user.level += 1
+        user.strikes = 0
+        user.struck = user.until  # Forgiving counts from the ignore's end
+        if self.on_ignore is not None:
+            self.on_ignore(msg, seconds)
+
+    def _add(self, table, key, entry):
+        table[key] = entry
+        if len(table) > self.size:
+            table.popitem(last=False)
+        return entry
+
+    def _evict(self, table, now):
+        ''' Drops idle entries from the old end of table '''
+        while table:
+            key, entry = next(iter(table.items()))
+            if not entry.expired(now, self.idle):
+                return
+            del table[key]
@@ -0,0 +1,362 @@
+'''
+Created on Oct 18, 2026
+
+A set of chat triggers matched against a line in one pass.
+
+Looping over every trigger for every line costs more the more triggers
+there are.  Triggers compiles them by kind instead, and the kind comes
+from how the trigger is written:
+
+    honey      - exact: the whole line, ignoring case
+    *honey*    - substring: anywhere in the line
+    ~honey     - word: anywhere in the line, as whole words
+    /ho+ney/   - pattern: a regular expression, ignoring case
+
+Exact triggers are one dict lookup of the casefolded line.  Substring
+and word triggers share an Aho-Corasick automaton, which finds every
+one of them in a single scan of the line.  A pattern is searched for
+only if the scan found the longest text any of its matches must
+contain (ie. 'ney' for /ho+ney/), since searching for many patterns
+with re costs as much as searching for each.  Patterns without such
+text are combined into one regular expression.
+
+A pattern can backtrack for ages on a short line, ie. /(a+)+$/, and
+patterns are matched on the thread reading the connection.  So add()
+refuses patterns with a quantifier inside another, an alternative
+inside an unbounded quantifier or more than MAX_UNBOUNDED unbounded
+quantifiers, and patterns only see the first PATTERN_SPAN characters
+of a line.
+
+When several triggers match, an exact one wins, then the substring or
+word trigger that ends first in the line (the longest, if several end
+together), then the pattern found earliest in the line.
+
+Adding or removing a trigger only invalidates the structure of its
+kind, which is rebuilt on the next match.  Exact triggers never need a
+rebuild.
+
+Ex. triggers = Triggers({'hbd': 'Happy Bear Day!', '*honey*': 'Honey?'})
+    triggers.match('I love honey')  # 'Honey?'
+
+'''
+
+import re
+import threading
+
+try:
+    from re import _parser
+except ImportError:  # Before Python 3.11
+    import sre_parse as _parser
+
+EXACT, SUBSTRING, WORD, PATTERN = range(4)
+MIN_LITERAL = 2  # Shortest text a pattern is filtered by
+MAX_UNBOUNDED = 2  # Unbounded quantifiers (*, +, {n,}) in a pattern
+PATTERN_SPAN = 512  # Characters of a line patterns are searched in
+REPEATS = tuple(getattr(_parser, name) for name in
+                ('MAX_REPEAT', 'MIN_REPEAT', 'POSSESSIVE_REPEAT')
+                if hasattr(_parser, name))
+
+def parse(trigger):
+    ''' Returns (kind, text) of a trigger as written '''
+    if len(trigger) > 2 and trigger[0] == trigger[-1] == '/':
+        return PATTERN, trigger[1:-1]
+    if len(trigger) > 2 and trigger[0] == trigger[-1] == '*':
+        return SUBSTRING, trigger[1:-1].casefold()
+    if len(trigger) > 1 and trigger[0] == '~':
+        return WORD, trigger[1:].casefold()
+    return EXACT, trigger.casefold()
+
+def literal(pattern):
+    ''' The longest text every match of pattern contains, or None
+
+    The text is casefolded, for finding it in casefolded lines.  Only
+    literals outside groups, repeats and alternatives count.
+
+    '''
+    try:
+        parsed = _parser.parse(pattern, re.IGNORECASE)
+    except (re.error, RecursionError):
+        return None
+    longest, run = '', ''
+    for op, value in parsed:
+        character = chr(value) if op is _parser.LITERAL else None
+        if character is not None and\
+                character.casefold() == character.lower():
+            run += character.casefold()
+            continue
+        longest, run = max(longest, run, key=len), ''
+    longest = max(longest, run, key=len)
+    return longest if len(longest) >= MIN_LITERAL else None
+
+def check(pattern):
+    ''' Raises re.error if pattern could backtrack for too long '''
+    parsed = _parser.parse(pattern, re.IGNORECASE)
+    if _quantifiers(parsed, None) > MAX_UNBOUNDED:
+        raise re.error('more than %s unbounded quantifiers' %
+                       MAX_UNBOUNDED)
+
+def _quantifiers(parsed, repeat):
+    ''' Counts the unbounded quantifiers in parsed, checking nesting
+
+    repeat is the (min, max) of the quantifier parsed is inside, if any.
+
+    '''
+    count = 0
+    for op, value in parsed:
+        if op in REPEATS:
+            low, high, body = value
+            if high > 1 and repeat is not None:
+                raise re.error('nested quantifiers')
+            if high == _parser.MAXREPEAT:
+                count += 1
+            count += _quantifiers(body, (low, high) if high > 1 else repeat)
+        elif op is _parser.BRANCH:
+            if repeat is not None and repeat[1] == _parser.MAXREPEAT:
+                raise re.error('alternatives inside an unbounded quantifier')
+            for branch in value[1]:
+                count += _quantifiers(branch, repeat)
+        elif op is _parser.SUBPATTERN:
+            count += _quantifiers(value[-1], repeat)
+        elif op in (_parser.ASSERT, _parser.ASSERT_NOT):
+            count += _quantifiers(value[1], repeat)
+        elif op is _parser.GROUPREF_EXISTS:
+            for branch in value[1:]:
+                if branch is not None:
+                    count += _quantifiers(branch, repeat)
+        elif op is getattr(_parser, 'ATOMIC_GROUP', None):
+            count += _quantifiers(value, repeat)
+    return count
+
+class Automaton(object):
+    ''' Aho-Corasick automaton finding many strings in one scan
+
+    words is a list of (text, trigger) pairs.  Transitions are worked
+    out as the scans need them and kept, so a character costs one dict
+    lookup once the automaton is warm.
+
+    '''
+
+    def __init__(self, words):
+        self.goto = [{}]  # State: {character: next state}
+        self.fail = [0]  # State: longest proper suffix state
+        self.out = [()]  # State: (trigger, length) ending here, longest first
+        for text, trigger in words:
+            state = 0
+            for character in text:
+                following = self.goto[state].get(character)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto[state][character] = following
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.out.append(())
+                state = following
+            self.out[state] += ((trigger, len(text)),)
+        queue = list(self.goto[0].values())
+        for state in queue:  # Breadth first, so fail states come first
+            for character, following in self.goto[state].items():
+                fail = self.fail[state]
+                while fail and character not in self.goto[fail]:
+                    fail = self.fail[fail]
+                fail = self.goto[fail].get(character, 0)
+                self.fail[following] = fail
+                self.out[following] = self.out[following] + self.out[fail]
+                queue.append(following)
+        self.delta = [dict(goto) for goto in self.goto]
+
+    def step(self, state, character):
+        ''' The state after character, worked out and kept '''
+        current = state
+        while True:
+            following = self.goto[current].get(character)
+            if following is not None or not current:
+                break
+            current = self.fail[current]
+        following = following or 0
+        self.delta[state][character] = following
+        return following
+
+    def first(self, text, words, literals, found):
+        ''' Returns the first trigger found in text, or None
+
+        words holds the triggers that must match whole words.  The
+        triggers in literals are only collected in found, up to where
+        the scan stopped.
+
+        '''
+        delta, out = self.delta, self.out
+        state = 0
+        for end, character in enumerate(text):
+            following = delta[state].get(character)
+            state = self.step(state, character) if following is None\
+                    else following
+            for trigger, length in out[state]:
+                if trigger in literals:
+                    found.append(trigger)
+                elif trigger not in words or\
+                        _bounded(text, end - length + 1, end + 1):
+                    return trigger
+        return None
+
+def _bounded(text, start, end):
+    ''' True if text[start:end] isn't part of a longer word '''
+    return (start == 0 or not _word(text[start - 1])) and\
+           (end == len(text) or not _word(text[end]))
+
+def _word(character):
+    return character.isalnum() or character == '_'
+
+class Triggers(object):
+    ''' Chat triggers and their responses, see the module docs '''
+
+    def __init__(self, triggers=None):
+        self._responses = {}  # Trigger: response
+        self._exact = {}  # Casefolded text: trigger
+        self._strings = {}  # Substring and word triggers: casefolded text
+        self._words = set()  # The word triggers among _strings
+        self._patterns = {}  # Pattern trigger: compiled expression
+        self._literals = {}  # Pattern trigger: text it's filtered by
+        self._automaton = None  # Built from _strings and _literals
+        self._combined = None  # (expression, {group: trigger}, separate)
+        self._lock = threading.Lock()
+        for trigger, response in (triggers or {}).items():
+            self.add(trigger, response)
+
+    def add(self, trigger, response):
+        ''' Adds or replaces a trigger
+
+        Raises re.error for bad patterns and for those check() refuses.
+
+        '''
+        kind, text = parse(trigger)
+        if kind == PATTERN:
+            check(text)
+            expression = re.compile(text, re.IGNORECASE)
+            required = literal(text)
+        with self._lock:
+            self._remove(trigger)
+            self._responses[trigger] = response
+            if kind == EXACT:
+                self._exact[text] = trigger
+            elif kind == PATTERN:
+                self._patterns[trigger] = expression
+                if required is None:
+                    self._combined = None
+                else:
+                    self._literals[trigger] = required
+                    self._automaton = None
+            else:
+                self._strings[trigger] = text
+                if kind == WORD:
+                    self._words.add(trigger)
+                self._automaton = None
+
+    def remove(self, trigger):
+        ''' Removes a trigger, if there is one '''
+        with self._lock:
+            self._remove(trigger)
+
+    def match(self, line):
+        ''' Returns the response to the trigger line matches, or None '''
+        folded = line.casefold()
+        trigger = self._exact.get(folded)
+        if trigger is None:
+            found = []  # Patterns whose literal text is in the line
+            if self._strings or self._literals:
+                automaton = self._automaton or self._build_automaton()
+                trigger = automaton.first(folded, self._words,
+                                          self._literals, found)
+            if trigger is None and self._patterns:
+                trigger = self._search(line[:PATTERN_SPAN], found)
+        if trigger is None:
+            return None
+        return self._responses.get(trigger)
+
+    def __contains__(self, trigger):
+        return trigger in self._responses
+
+    def __len__(self):
+        return len(self._responses)
+
+    def _remove(self, trigger):
+        ''' Removes a trigger (lock held) '''
+        if self._responses.pop(trigger, None) is None:
+            return
+        kind, text = parse(trigger)
+        if kind == EXACT:
+            if self._exact.get(text) == trigger:
+                del self._exact[text]
+        elif kind == PATTERN:
+            del self._patterns[trigger]
+            if self._literals.pop(trigger, None) is None:
+                self._combined = None
+            else:
+                self._automaton = None
+        else:
+            del self._strings[trigger]
+            self._words.discard(trigger)
+            self._automaton = None
+
+    def _build_automaton(self):
+        with self._lock:
+            if self._automaton is None:
+                words = [(text, trigger)
+                         for trigger, text in self._strings.items()]
+                words.extend((text, trigger)
+                             for trigger, text in self._literals.items())
+                self._automaton = Automaton(words)
+            return self._automaton
+
+    def _search(self, line, found):
+        ''' The pattern found earliest in line, or None
+
+        Only patterns in found, and those without literal text, are
+        searched.
+
+        '''
+        expression, groups, separate = self._combined or self._combine()
+        best, start = None, None
+        if expression is not None:
+            match = expression.search(line)
+            if match is not None:
+                best, start = groups[match.lastindex], match.start()
+        for trigger in set(found):
+            pattern = self._patterns.get(trigger)
+            match = pattern and pattern.search(line)
+            if match and (start is None or match.start() < start):
+                best, start = trigger, match.start()
+        for trigger, pattern in separate:
+            match = pattern.search(line)
+            if match and (start is None or match.start() < start):
+                best, start = trigger, match.start()
+        return best
+
+    def _combine(self):
+        ''' One expression for the patterns without literal text
+
+        Patterns with capturing groups are left separate, since their
+        group numbers would change (ie. \\1).
+
+        '''
+        with self._lock:
+            if self._combined is not None:
+                return self._combined
+            parts, groups, separate = [], {}, []
+            for trigger, pattern in self._patterns.items():
+                if trigger in self._literals:
+                    continue
+                if pattern.groups:
+                    separate.append((trigger, pattern))
+                    continue
+                parts.append('(%s)' % pattern.pattern)
+                groups[len(parts)] = trigger
+            try:
+                expression = re.compile('|'.join(parts), re.IGNORECASE)\
+                             if parts else None
+            except re.error:  # ie. a global flag that isn't first
+                expression = None
+                separate = [(trigger, pattern) for trigger, pattern
+                            in self._patterns.items()
+                            if trigger not in self._literals]
+            self._combined = (expression, groups, separate)
+            return self._combined
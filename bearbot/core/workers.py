@@ -0,0 +1,288 @@
+'''
+Created on Oct 18, 2026
+
+This module holds the CommandPool, the threads that run user commands.
+
+Commands used to run on the thread reading the connection, so one slow
+command (an ip lookup, a who waiting on the server) held up PINGs and
+everybody else's commands.  The bot now hands them to a CommandPool:
+
+    - a fixed number of worker threads take jobs off a bounded queue,
+      and a command that doesn't fit in the queue is refused
+    - every job has a timeout, after which it's cancelled
+    - a command, and a user, can only have so many jobs queued or
+      running at once (the bot's owner has no per user limit)
+    - depth and running tell how busy the pool is
+
+Threads can't be killed, so cancelling is cooperative.  A cancelled
+command's cmd.reply() and cmd.notice() lines are dropped, and a long
+running command can check cmd.cancelled and return early.  A job still
+holds its place in the limits until its function returns.
+
+Commands change their limits with decorators from the command module:
+
+    @inline                           - runs on the reading thread
+    @limits(timeout=60, per_user=1)   - see limits()
+
+'''
+
+import heapq
+import itertools
+import logging
+import queue
+import threading
+from time import monotonic
+
+from bearbot.core.command import OWNER
+
+WORKERS = 8  # Worker threads
+QUEUE_SIZE = 64  # Jobs waiting for a worker before commands are refused
+TIMEOUT = 30  # Seconds a command runs before it's cancelled
+PER_COMMAND = 4  # Jobs of one command queued or running at once
+PER_USER = 2  # Jobs of one user queued or running at once
+
+class Refused(Exception):
+    ''' Raised by CommandPool.submit when a command can't be queued '''
+    pass
+
+class Job(object):
+    ''' A user command queued or running in a CommandPool '''
+
+    __slots__ = ('cmd_def', 'cmd', 'name', 'user', 'timeout', 'number',
+                 'deadline', 'cancelled', 'on_cancel', 'finished')
+
+    def __init__(self, cmd_def, cmd, timeout, number):
+        self.cmd_def = cmd_def
+        self.cmd = cmd
+        self.name = cmd.name  # The command's name, not the alias typed
+        self.user = (cmd.bot.host, cmd.msg.host or cmd.msg.nick)
+        self.timeout = timeout  # Seconds, 0 or None to run until done
+        self.number = number  # Breaks deadline ties in the heap
+        self.deadline = None  # Set when a worker starts the job
+        self.cancelled = threading.Event()
+        self.on_cancel = None  # Called once when cancelled, ie. task.cancel
+        self.finished = False
+        cmd.job = self
+
+    def cancel(self):
+        ''' Cancels the job, returns False if it was already '''
+        if self.cancelled.is_set():
+            return False
+        self.cancelled.set()
+        if self.on_cancel is not None:
+            self.on_cancel()
+        return True
+
+    def __repr__(self):
+        return '<Job %s %s>' % (self.name, self.user[1])
+
+class CommandPool(object):
+    ''' Bounded thread pool for user commands
+
+    The threads are started by the first submit().  A pool can be shared
+    by several bots, ie. the bots of a Supervisor.
+
+    '''
+
+    def __init__(self, workers=WORKERS, queue_size=QUEUE_SIZE,
+                 timeout=TIMEOUT, per_command=PER_COMMAND, per_user=PER_USER):
+        self.size = workers
+        self.timeout = timeout  # Defaults for commands without @limits
+        self.per_command = per_command
+        self.per_user = per_user
+        self.completed = 0  # Jobs finished
+        self.timed_out = 0  # Jobs cancelled by their timeout
+        self.refused = 0  # Commands refused by a limit or a full queue
+        self._queue = queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._watch = threading.Condition(self._lock)  # Wakes the watchdog
+        self._jobs = set()  # Jobs queued or running
+        self._running = 0
+        self._commands = {}  # Command name: jobs queued or running
+        self._users = {}  # (bot host, user host): jobs queued or running
+        self._deadlines = []  # Heap of (deadline, number, job)
+        self._numbers = itertools.count()
+        self._threads = []
+        self._closed = False
+
+    # Metrics
+
+    @property
+    def depth(self):
+        ''' Jobs waiting for a worker '''
+        return self._queue.qsize()
+
+    @property
+    def running(self):
+        ''' Jobs a worker is running '''
+        return self._running
+
+    def jobs(self):
+        ''' Returns the jobs queued or running '''
+        with self._lock:
+            return list(self._jobs)
+
+    # Running commands
+
+    def submit(self, cmd_def, cmd):
+        ''' Queues cmd_def(cmd) for a worker and returns the Job
+
+        Raises Refused if a limit is reached or the queue is full.
+
+        '''
+        job = self.admit(cmd_def, cmd)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.release(job)
+            with self._lock:
+                self.refused += 1
+            raise Refused('Too many commands are waiting, try again later.')
+        return job
+
+    def admit(self, cmd_def, cmd):
+        ''' Counts a job against the limits without queuing it
+
+        For commands run elsewhere, ie. coroutine commands on an event
+        loop.  release() must be called when the job is done.
+
+        '''
+        timeout = getattr(cmd_def, 'timeout', self.timeout)
+        per_command = getattr(cmd_def, 'per_command', self.per_command)
+        per_user = getattr(cmd_def, 'per_user', self.per_user)
+        with self._lock:
+            if self._closed:
+                raise Refused('Commands are shutting down.')
+            job = Job(cmd_def, cmd, timeout, next(self._numbers))
+            if per_command and\
+                    self._commands.get(job.name, 0) >= per_command:
+                self.refused += 1
+                raise Refused('%s is busy, try again in a moment.' %
+                              job.name)
+            if per_user and self._users.get(job.user, 0) >= per_user\
+                    and cmd.bot.access_level(cmd.msg) < OWNER:
+                self.refused += 1
+                raise Refused('You already have %s commands running.' %
+                              per_user)
+            self._commands[job.name] = self._commands.get(job.name, 0) + 1
+            self._users[job.user] = self._users.get(job.user, 0) + 1
+            self._jobs.add(job)
+            if not self._threads:
+                self._start()
+        return job
+
+    def release(self, job):
+        ''' Frees a job's place in the limits '''
+        with self._lock:
+            if job.finished:
+                return
+            job.finished = True
+            self._jobs.discard(job)
+            self._commands[job.name] -= 1
+            if not self._commands[job.name]:
+                del self._commands[job.name]
+            self._users[job.user] -= 1
+            if not self._users[job.user]:
+                del self._users[job.user]
+
+    def watch(self, job):
+        ''' Starts a job's timeout '''
+        if not job.timeout:
+            return
+        with self._lock:
+            job.deadline = monotonic() + job.timeout
+            heapq.heappush(self._deadlines, (job.deadline, job.number, job))
+            self._watch.notify()
+
+    def cancel(self, name=None, user=None):
+        ''' Cancels the jobs of a command and/or user, returns how many
+
+        name is the command's name, whatever alias started the job.
+        user is a nick or host.  With neither, every job is cancelled.
+
+        '''
+        count = 0
+        for job in self.jobs():
+            if name is not None and job.name != name:
+                continue
+            if user is not None and user not in (job.cmd.msg.nick,
+                                                 job.user[1]):
+                continue
+            count += job.cancel()
+        return count
+
+    def shutdown(self):
+        ''' Cancels every job and stops the threads without waiting '''
+        with self._lock:
+            self._closed = True
+            self._watch.notify()
+            threads = len(self._threads)
+        self.cancel()
+        for _ in range(threads):
+            self._queue.put(None)
+
+    # Threads
+
+    def _start(self):
+        ''' Starts the workers and the watchdog (lock held) '''
+        for number in range(self.size):
+            thread = threading.Thread(target=self._work, daemon=True,
+                                      name='bearbot-worker-%s' % number)
+            self._threads.append(thread)
+            thread.start()
+        threading.Thread(target=self._watchdog, name='bearbot-watchdog',
+                         daemon=True).start()
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            if job.cancelled.is_set():  # Cancelled while queued
+                self.release(job)
+                continue
+            with self._lock:
+                self._running += 1
+            self.watch(job)
+            try:
+                job.cmd_def(job.cmd)
+            except Exception as e:
+                job.cmd.bot.log('! User command exception: %s' % e,
+                                logging.ERROR)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                self.release(job)
+
+    def _watchdog(self):
+        ''' Cancels jobs that run past their deadline '''
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                expired = []
+                now = monotonic()
+                while self._deadlines and self._deadlines[0][0] <= now:
+                    job = heapq.heappop(self._deadlines)[2]
+                    if not job.finished:
+                        expired.append(job)
+                if not expired:
+                    wait = None
+                    if self._deadlines:
+                        wait = self._deadlines[0][0] - now
+                    self._watch.wait(wait)
+                    continue
+            for job in expired:
+                self.expire(job)
+
+    def expire(self, job):
+        ''' Cancels a job that ran out of time and tells its user '''
+        if not job.cancel():
+            return
+        self.timed_out += 1
+        bot, msg = job.cmd.bot, job.cmd.msg
+        bot.log('%s from %s timed out after %s seconds' %
+                (job.name, msg.nick, job.timeout), logging.WARNING)
+        bot.notice(msg.nick, '%s%s took too long and was cancelled.' %
+                   (bot.cmd_prefix, job.name))
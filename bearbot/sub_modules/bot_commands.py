@@ -3,14 +3,26 @@ Created on 29/10/2013
 
 @author: Evan
 '''
+import logging
+
 from bearbot.core.command import *
-from bearbot.sub_modules.ctcp_commands import *
+from bearbot.core.event import bus
+from bearbot.sub_modules.ctcp_commands import C
 
-def privmsg_(handler, msg):
-    ''' Handles user messages (user/channel) '''
-    if msg.content[0] == handler.bot.cmd_prefix and len(msg.content) > 1:
-        try:
-            cmd = Command(handler.bot, msg)
-            command_dic[cmd.root](cmd)  # Runs command
-        except Exception as e:
-            handler.bot.log('! User command exception: %s' % e)
\ No newline at end of file
+@bus.on('PRIVMSG', when=lambda msg: not msg.trailing.startswith(C))
+def privmsg_(bot, msg):
+    ''' Handles user messages (user/channel), CTCP goes to ctcp_ '''
+    if msg.content[:1] != bot.cmd_prefix:
+        return
+    words = msg.content[1:].split()
+    if not words:
+        return
+    entry = bot.get_command(words[0])
+    if entry is None or not bot.allow(msg, entry.cost):
+        return
+    try:
+        cmd = Command(bot, msg, entry, words)
+        if entry.check(cmd):
+            bot.run_command(entry.function, cmd)
+    except Exception as e:
+        bot.log('! User command exception: %s' % e, logging.ERROR)
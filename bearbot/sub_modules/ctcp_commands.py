@@ -8,7 +8,8 @@ Created on 29/10/2013
 
 from time import strftime
 
-from bearbot.core import bot
+from bearbot.core import bot as core_bot
+from bearbot.core.event import bus
 
 C = '\001'  # CTCP token
 CTCP_COMMANDS = {
@@ -23,31 +24,32 @@ CTCP_COMMANDS = {
         'ERRMSG': 'Returns an error message if CTCP command is unavailable.'
     }
 ERRMSG = ' - Invalid CTCP command. Check CLIENTINFO for valid commands.'
+CTCP_COSTS = {'CLIENTINFO': 4}  # Throttle tokens, 1 for the others
 
-def ctcp_(handler, msg):
-
-    # TODO needs is_ctcp prior to ctcp_ call
-    
-    # Return early if not CTCP
-    if not msg.trailing.startswith(C):
-        return
-
+@bus.on('PRIVMSG', when=lambda msg: msg.trailing.startswith(C))
+def ctcp_(bot, msg):
     cmd = msg.trailing.strip(C)
+    name = cmd.split(' ', 1)[0]
+    if name == 'ACTION':  # A /me, not a request
+        return
+    if not bot.allow(msg, CTCP_COSTS.get(name, 1)):
+        return
     
     def reply(reply_msg):
-        handler.bot.notice(msg.nick, '%s%s %s%s' % (C, cmd, reply_msg, C))
+        bot.notice(msg.nick, '%s%s %s%s' % (C, cmd, reply_msg, C))
     
     if cmd.startswith('PING'):
-        handler.bot.notice(msg.nick, msg.content)
+        bot.notice(msg.nick, msg.content)
     elif cmd == 'VERSION':
-        reply(handler.bot.version)
+        reply(bot.version)
     elif cmd == 'SOURCE':
-        reply(bot.source)
+        reply(core_bot.source)
     elif cmd == 'TIME':
         reply(strftime('%Y-%m-%d %H:%M:%S'))
-    elif cmd == 'CLIENTINFO':
-        for command, description in CTCP_COMMANDS.items():
-            reply('[%s] %s' % (command, description))
+    elif cmd == 'CLIENTINFO':  # One notice per line, queued together
+        bot.notice(msg.nick, '\n'.join(
+                '%s%s [%s] %s%s' % (C, cmd, command, description, C)
+                for command, description in CTCP_COMMANDS.items()))
     elif cmd == 'USERINFO':
         reply("I'm a cybernetic bear")
     elif cmd == 'FINGER':
@@ -55,9 +57,9 @@ def ctcp_(handler, msg):
     elif 'DCC' in cmd:  # For DCC, XDCC, RDCC
         # TODO call a DCC parsing function which calls a DCC module to handle
         # DCC commands.  Will presumably ask for permission.
-        handler.bot.notice(msg.nick, 
+        bot.notice(msg.nick, 
                 '%sERRMSG %s - DCC is unsupported currently.%s' % (C, cmd, C))
     else:
-        handler.bot.notice(msg.nick, '%sERRMSG %s %s%s' % (C, cmd, ERRMSG, C))
+        bot.notice(msg.nick, '%sERRMSG %s %s%s' % (C, cmd, ERRMSG, C))
 
 '''what a weird protocol! - Evan'''
@@ -4,6 +4,32 @@ Created on 29/10/2013
 @author: Evan
 '''
 
+from bearbot.core.event import bus
+from bearbot.core.outbound import HIGH
+
 ''' responds to ping command'''
-def ping_(handler, msg):
-    handler.bot.send('PONG %s' % msg.params) 
\ No newline at end of file
+@bus.on('PING', priority=10)
+def ping_(bot, msg):
+    bot.send('PONG %s' % msg.params, priority=HIGH)
+
+''' RPL_WELCOME (001), registration succeeded '''
+@bus.on('001')
+def welcome_(bot, msg):
+    bot.nick = msg.middle  # The nick the server registered
+    bot.on_welcome()
+
+''' ERR_NICKNAMEINUSE (433), retries registration with another nick '''
+@bus.on('433')
+def nick_in_use_(bot, msg):
+    if not bot.registered:
+        bot.set_nick('%s_' % msg.middle.split()[-1])
+
+''' RPL_ISUPPORT (005), the server's features and limits '''
+@bus.on('005')
+def isupport_(bot, msg):
+    bot.set_isupport(msg.isupport)
+
+''' RPL_ENDOFMOTD (376) or ERR_NOMOTD (422), the server is done greeting '''
+@bus.on('376', '422')
+def end_of_motd_(bot, msg):
+    bot.on_ready()
@@ -0,0 +1,64 @@
+'''Keeps the bot's roster of channels and users up to date
+Created on Oct 18, 2026
+
+Each handler passes what a server message says about channel
+membership on to Bot.roster.  See bearbot.core.roster.
+'''
+
+from bearbot.core.event import bus
+from bearbot.core.roster import irc_lower
+
+def is_me(bot, nick):
+    return irc_lower(nick) == irc_lower(bot.nick)
+
+''' JOIN, someone (or the bot) joined a channel '''
+@bus.on('JOIN', priority=5)
+def join_(bot, msg):
+    bot.roster.joined(msg.channel, msg.nick, msg.user, msg.host,
+                      is_me(bot, msg.nick))
+
+''' PART, someone (or the bot) left a channel '''
+@bus.on('PART', priority=5)
+def part_(bot, msg):
+    bot.roster.parted(msg.channel, msg.nick, is_me(bot, msg.nick))
+
+''' KICK, someone (or the bot) was kicked from a channel '''
+@bus.on('KICK', priority=5)
+def kick_(bot, msg):
+    bot.roster.parted(msg.channel, msg.kicked, is_me(bot, msg.kicked))
+    if is_me(bot, msg.kicked) and msg.channel in bot.channels:
+        bot.channels.remove(msg.channel)
+
+''' QUIT, someone quit irc '''
+@bus.on('QUIT', priority=5)
+def quit_(bot, msg):
+    bot.roster.quit(msg.nick)
+    bot.access.forget(msg.nick)  # Cached access levels, see bot.access
+
+''' NICK, someone (or the bot) changed nick '''
+@bus.on('NICK', priority=5)
+def nick_(bot, msg):
+    if is_me(bot, msg.nick):
+        bot.nick = msg.new_nick
+    bot.roster.nick_changed(msg.nick, msg.new_nick)
+    bot.access.forget(msg.nick)
+
+''' MODE, channel prefix modes (op, voice..) changed '''
+@bus.on('MODE', priority=5)
+def mode_(bot, msg):
+    bot.roster.mode(msg.target, msg.modes, msg.mode_args)
+
+''' 353 RPL_NAMREPLY, channel members '''
+@bus.on('353', priority=5)
+def names_(bot, msg):
+    bot.roster.names(msg.channel, msg.names)
+
+''' 366 RPL_ENDOFNAMES, end of channel members '''
+@bus.on('366', priority=5)
+def end_of_names_(bot, msg):
+    bot.roster.end_of_names(msg.channel)
+
+''' 352 RPL_WHOREPLY, a user's details '''
+@bus.on('352', priority=5)
+def who_reply_(bot, msg):
+    bot.roster.who_reply(msg.nick, msg.user, msg.host, msg.realname)
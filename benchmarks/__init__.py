@@ -0,0 +1,24 @@
+'''
+Created on Oct 18, 2026
+
+Micro-benchmarks for the parts of the bot every message goes through.
+
+    parse    - Message(raw) and the attributes handlers read
+    decode   - Bot._parse of raw bytes: command scan, decode, Message
+    dispatch - the event bus over parsed Messages
+    command  - command lookup, Command construction and validation
+    chatter  - matching PRIVMSG content against the chatter triggers,
+               with --triggers 10000 against that many more of every
+               kind (exact, word, substring and pattern)
+
+They run over a synthetic corpus (see the corpus module) shaped like
+real traffic.  Run them from the repository root:
+
+    python -m benchmarks.run --output before.json
+    python -m benchmarks.run --output after.json --compare before.json
+
+Results are written as JSON, one entry per benchmark with messages per
+second, nanoseconds per message and memory retained per message, so
+runs on different revisions can be compared.
+
+'''
@@ -0,0 +1,139 @@
+'''
+Created on Oct 18, 2026
+
+Synthetic irc traffic for the benchmarks.
+
+The corpus is built from seeded random choices, so the same count and
+seed always give the same lines.  It's shaped like a busy network seen
+from a bot in a few dozen channels:
+
+    - mostly PRIVMSG chatter, some of it bot commands and CTCP
+    - bursts of 352 RPL_WHOREPLY and 353 RPL_NAMREPLY (WHO, joins)
+    - JOIN and QUIT storms (netsplits and rejoins)
+    - the odd NOTICE, MODE, NICK, PART and PING
+
+'''
+
+import random
+
+SERVER = 'irc.example.net'
+BOT = 'Bearbot'
+OWNER = 'Garcia'
+OWNER_MASK = '%s!*@%s.example.com' % (OWNER, OWNER)  # See Corpus._prefix
+CHANNELS = ['#chan%d' % i for i in range(40)]
+
+# Weights of the kinds of events picked for each step
+MIX = (('privmsg', 70), ('command', 8), ('ctcp', 2), ('who_burst', 2),
+       ('names_burst', 2), ('join_storm', 1), ('quit_storm', 1),
+       ('notice', 4), ('mode', 3), ('nick', 2), ('part', 2), ('ping', 3))
+
+COMMANDS = ('.hbd', '.reverse bears are great', '.rot13 hello there',
+            '.bots', '.rps bear', '.delay', '.help', '.nosuchcommand',
+            '.hbd extra args')
+CTCP = ('\001VERSION\001', '\001PING 1234567890\001', '\001TIME\001',
+        '\001ACTION waves at everyone\001')
+WORDS = ('the', 'bear', 'honey', 'irc', 'bot', 'what', 'is', 'going', 'on',
+         'lol', 'server', 'python', 'channel', 'hello', 'anyone', 'here',
+         'hbd', 'obama', 'NSA', 'good', 'morning', 'night', 'ok', 'yes')
+
+class Corpus(object):
+    ''' Generates lines of synthetic server traffic '''
+
+    def __init__(self, seed=0, users=2000):
+        self.random = random.Random(seed)
+        self.users = ['user%d' % i for i in range(users)]
+        kinds, weights = zip(*MIX)
+        self.kinds, self.weights = kinds, weights
+
+    def lines(self, count):
+        ''' Returns count raw lines (without \\r\\n) '''
+        lines = []
+        while len(lines) < count:
+            kind = self.random.choices(self.kinds, self.weights)[0]
+            lines.extend(getattr(self, kind)())
+        return lines[:count]
+
+    # Pieces
+
+    def _nick(self):
+        return self.random.choice(self.users)
+
+    def _prefix(self, nick=None):
+        nick = nick or self._nick()
+        return '%s!~%s@%s.example.com' % (nick, nick[:8], nick)
+
+    def _channel(self):
+        return self.random.choice(CHANNELS)
+
+    def _text(self):
+        return ' '.join(self.random.choice(WORDS)
+                        for i in range(self.random.randint(1, 15)))
+
+    # Event kinds, each returns a list of lines
+
+    def privmsg(self):
+        return [':%s PRIVMSG %s :%s' % (self._prefix(), self._channel(),
+                                        self._text())]
+
+    def command(self):
+        nick = OWNER if self.random.random() < .2 else None
+        return [':%s PRIVMSG %s :%s' % (self._prefix(nick), self._channel(),
+                                        self.random.choice(COMMANDS))]
+
+    def ctcp(self):
+        return [':%s PRIVMSG %s :%s' % (self._prefix(), BOT,
+                                        self.random.choice(CTCP))]
+
+    def who_burst(self):
+        channel = self._channel()
+        lines = [':%s 352 %s %s ~%s %s.example.com %s %s H :0 Real %s' %
+                 (SERVER, BOT, channel, nick[:8], nick, SERVER, nick, nick)
+                 for nick in self.random.sample(self.users,
+                                                self.random.randint(20, 60))]
+        lines.append(':%s 315 %s %s :End of /WHO list.' %
+                     (SERVER, BOT, channel))
+        return lines
+
+    def names_burst(self):
+        channel = self._channel()
+        nicks = self.random.sample(self.users, self.random.randint(50, 300))
+        lines = []
+        for at in range(0, len(nicks), 40):
+            names = ' '.join(self.random.choice(('', '', '', '+', '@')) + nick
+                             for nick in nicks[at:at + 40])
+            lines.append(':%s 353 %s = %s :%s' % (SERVER, BOT, channel, names))
+        lines.append(':%s 366 %s %s :End of /NAMES list.' %
+                     (SERVER, BOT, channel))
+        return lines
+
+    def join_storm(self):
+        return [':%s JOIN :%s' % (self._prefix(), self._channel())
+                for i in range(self.random.randint(10, 80))]
+
+    def quit_storm(self):
+        return [':%s QUIT :*.net *.split' % self._prefix()
+                for i in range(self.random.randint(10, 80))]
+
+    def notice(self):
+        if self.random.random() < .5:
+            return [':%s NOTICE %s :*** %s' % (SERVER, BOT, self._text())]
+        return [':%s NOTICE %s :%s' % (self._prefix(), self._channel(),
+                                       self._text())]
+
+    def mode(self):
+        return [':%s MODE %s +o-v %s %s' % (self._prefix(), self._channel(),
+                                            self._nick(), self._nick())]
+
+    def nick(self):
+        return [':%s NICK :%s_' % (self._prefix(), self._nick())]
+
+    def part(self):
+        return [':%s PART %s :%s' % (self._prefix(), self._channel(),
+                                     self._text())]
+
+    def ping(self):
+        return ['PING :%s' % SERVER]
+
+def generate(count, seed=0):
+    ''' Returns count lines of synthetic traffic '''
+    return Corpus(seed).lines(count)
@@ -0,0 +1,261 @@
+'''
+Created on Oct 18, 2026
+
+Runs the benchmarks and writes their results as JSON.
+
+    python -m benchmarks.run [--count N] [--repeat N] [--seed N]
+                             [--triggers N] [--only NAME ...]
+                             [--output FILE] [--compare FILE]
+
+Each benchmark is timed over the whole corpus --repeat times and the
+best run is reported.  A separate pass under tracemalloc measures the
+memory each message leaves behind: the objects a benchmark returns
+(ie. the Messages of the parse benchmark) plus its side effects, such
+as queued replies and roster entries.
+
+Chatter's journal and search index are kept in a temporary directory,
+so running the benchmarks leaves resources/ as it was.
+
+'''
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import generate, BOT, OWNER_MASK, CHANNELS
+from bearbot.core.bot import Bot
+from bearbot.core.message import Message
+from bearbot.core.command import Command
+from bearbot.core.journal import Journal
+from bearbot.core.search import SearchIndex
+from applications import chatter
+
+class QuietBot(Bot):
+    ''' A Bot that never connects or prints '''
+
+    def __init__(self):
+        super().__init__('irc.example.net', OWNER_MASK, '', list(CHANNELS),
+                         nick=BOT, msg_delay=0, database=None)
+        self.loader.load_all()  # Times the plugins, not their loading
+        self.reset()
+
+    def log(self, message, level=None):
+        pass
+
+    def run_command(self, cmd_def, cmd):
+        cmd_def(cmd)  # Inline, so the runs time the commands themselves
+
+    def reset(self):
+        ''' Forgets queued replies and puts the bot back in its channels '''
+        self.outbound.clear()
+        self.roster.clear()
+        self.cmd_prefix = '.'
+        for channel in CHANNELS:
+            self.roster.joined(channel, BOT, me=True)
+
+# Benchmarks
+#
+# Each one takes the bot and the corpus and returns the items to run
+# over and the function that handles one of them.
+
+def read_fields(msg):
+    ''' Reads what the handlers read from a Message '''
+    command = msg.command
+    if command == 'PRIVMSG':
+        return msg.content, msg.nick, msg.source
+    if command in ('JOIN', 'PART', 'QUIT', 'NICK'):
+        return msg.nick, msg.user, msg.host, msg.trailing
+    return msg.middle, msg.trailing
+
+def parse(bot, lines):
+    ''' Message(raw) and the attributes handlers read '''
+    def step(raw):
+        msg = Message(raw)
+        read_fields(msg)
+        return msg
+    return lines, step
+
+def decode(bot, lines):
+    ''' Bot._parse: command scan, decoding and Message for raw bytes '''
+    return [raw.encode() for raw in lines], bot._parse
+
+def dispatch(bot, lines):
+    ''' Bot.handle: the event handlers, commands and pending requests '''
+    return [Message(raw) for raw in lines], bot.handle
+
+def command(bot, lines):
+    ''' Command lookup, construction, validation and the functions '''
+    msgs = [msg for msg in map(Message, lines)
+            if msg.command == 'PRIVMSG' and msg.content[:1] == '.']
+    def step(msg):
+        words = msg.content[1:].split()
+        entry = bot.get_command(words[0]) if words else None
+        if entry is None:
+            return None
+        cmd = Command(bot, msg, entry, words)
+        if entry.check(cmd):
+            entry.function(cmd)
+        return cmd
+    return msgs, step
+
+def chatter_match(bot, lines):
+    ''' Chatter trigger matching over PRIVMSG content '''
+    msgs = [msg for msg in map(Message, lines) if msg.command == 'PRIVMSG']
+    def step(msg):
+        chatter.get_value(bot, msg.content, msg.source)
+    return msgs, step
+
+def synthetic_trigger(number):
+    ''' Mostly exact triggers, some words and substrings, 1% patterns '''
+    kind = number % 100
+    if kind < 80:
+        return 'synthetic trigger %d' % number
+    if kind < 95:
+        return '~synthword%d' % number
+    if kind < 99:
+        return '*synthpart%d*' % number
+    return '/synth(?:etic)? pattern %d/' % number
+
+BENCHMARKS = (('parse', parse), ('decode', decode), ('dispatch', dispatch),
+              ('command', command), ('chatter', chatter_match))
+
+# Running
+
+def time_run(items, step, bot, repeat):
+    ''' Returns the seconds each of repeat runs over items took '''
+    runs = []
+    for i in range(repeat):
+        bot.reset()
+        start = time.perf_counter()
+        for item in items:
+            step(item)
+        runs.append(time.perf_counter() - start)
+    return runs
+
+def memory_run(items, step, bot):
+    ''' Returns (bytes, blocks) left allocated by a run over items '''
+    bot.reset()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [step(item) for item in items]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    size = sum(stat.size_diff for stat in stats)
+    blocks = sum(stat.count_diff for stat in stats)
+    del kept
+    return size, blocks
+
+def run_benchmark(name, setup, bot, lines, repeat):
+    items, step = setup(bot, lines)
+    count = len(items)
+    runs = time_run(items, step, bot, repeat)
+    size, blocks = memory_run(items, step, bot)
+    best = min(runs)
+    return {'messages': count,
+            'best_seconds': best,
+            'median_seconds': statistics.median(runs),
+            'msgs_per_sec': count / best if best else None,
+            'ns_per_msg': best / count * 1e9 if count else None,
+            'retained_bytes_per_msg': size / count if count else None,
+            'retained_blocks_per_msg': blocks / count if count else None}
+
+def revision():
+    ''' The git revision being measured, if there is one '''
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline):
+    ''' Prints the change in ns/msg against a baseline results file '''
+    for name, result in results['results'].items():
+        old = baseline['results'].get(name)
+        if old is None or not old.get('ns_per_msg'):
+            continue
+        change = (result['ns_per_msg'] / old['ns_per_msg'] - 1) * 100
+        print('%-10s %10.0f -> %10.0f ns/msg  %+6.1f%%' %
+              (name, old['ns_per_msg'], result['ns_per_msg'], change),
+              file=sys.stderr)
+
+def isolate_chatter(directory):
+    ''' Points chatter's journal and index at directory, before loading '''
+    chatter.journal_file = os.path.join(directory, 'chatterbox.journal')
+    chatter.index_file = os.path.join(directory, 'chatterbox.db')
+    chatter.store = Journal(chatter.journal_file, sync=False)
+    chatter.chat_dic = chatter.store.data
+    chatter.index = SearchIndex(chatter.index_file)
+
+def run_all(args):
+    ''' Runs the benchmarks args selects, returns the results '''
+    lines = generate(args.count, args.seed)
+    bot = QuietBot()  # Loads chatter, which replaces chat_dic's contents
+    for i in range(args.triggers):  # In memory only, never saved
+        trigger = synthetic_trigger(i)
+        chatter.chat_dic[trigger] = 'response %d' % i
+        chatter.triggers.add(trigger, 'response %d' % i)
+    results = {'revision': revision(),
+               'python': platform.python_version(),
+               'implementation': platform.python_implementation(),
+               'platform': platform.platform(),
+               'corpus': {'count': args.count, 'seed': args.seed,
+                          'triggers': len(chatter.triggers)},
+               'results': {}}
+    for name, setup in BENCHMARKS:
+        if args.only and name not in args.only:
+            continue
+        results['results'][name] = run_benchmark(name, setup, bot, lines,
+                                                  args.repeat)
+        print('%-10s %10.0f msgs/sec %8.0f ns/msg' %
+              (name, results['results'][name]['msgs_per_sec'],
+               results['results'][name]['ns_per_msg']), file=sys.stderr)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Bearbot benchmarks')
+    parser.add_argument('--count', type=int, default=50000,
+                        help='lines in the corpus')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='timed runs per benchmark')
+    parser.add_argument('--seed', type=int, default=0, help='corpus seed')
+    parser.add_argument('--triggers', type=int, default=0,
+                        help='synthetic chatter triggers to add, '
+                        'ie. 10000')
+    parser.add_argument('--only', nargs='+', metavar='NAME',
+                        help='benchmarks to run')
+    parser.add_argument('--output', help='JSON file (default: stdout)')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='results JSON to compare against')
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as directory:
+        isolate_chatter(directory)
+        try:
+            results = run_all(args)
+        finally:
+            chatter.store.close()
+            chatter.index.database.close()
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+if __name__ == '__main__':
+    main()
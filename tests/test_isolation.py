@@ -0,0 +1,82 @@
+'''
+Created on Oct 18, 2026
+
+Tests of @isolated commands, run in the IsolatedPool's processes.
+
+'''
+
+import threading
+import time
+import unittest
+
+from bearbot.core.bot import Bot
+from bearbot.core.command import Command
+from bearbot.core.message import Message
+from bearbot.core.workers import Job
+from applications import misc_commands
+
+PRIME = 1000000000000000003  # Trial division takes minutes
+
+class RecordingBot(Bot):
+    ''' A Bot that keeps what it says instead of sending it '''
+
+    def __init__(self):
+        super().__init__('irc.example.net', 'Owner!owner@example.net', '',
+                         '#bears', database=None, processes=2)
+        self.said = []
+
+    def say(self, target, message, priority=None):
+        self.said.append(message)
+
+class FactorTest(unittest.TestCase):
+    ''' .factor runs in a process and can be cancelled on its own '''
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bot = RecordingBot()
+        cls.bot.isolation.warm()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.bot.isolation.shutdown()
+
+    def setUp(self):
+        del self.bot.said[:]
+
+    def factor(self, number):
+        ''' Starts .factor number on a thread, returns (thread, job) '''
+        msg = Message(':user!user@example.org PRIVMSG #bears :.factor %s' %
+                      number)
+        cmd = Command(self.bot, msg, None, ['factor', str(number)])
+        cmd.args = [number]
+        job = Job(misc_commands.factor, cmd, 0, 0)
+        thread = threading.Thread(target=misc_commands.factor, args=(cmd,))
+        thread.start()
+        return thread, job
+
+    def test_factors_in_a_process(self):
+        thread, job = self.factor(360)
+        thread.join(30)
+        self.assertEqual(self.bot.said, ['360 = 2 * 2 * 2 * 3 * 3 * 5'])
+
+    def test_cancel_stops_only_its_own_call(self):
+        crashes = self.bot.isolation.crashes
+        first, first_job = self.factor(PRIME)
+        second, second_job = self.factor(PRIME)
+        time.sleep(1)  # Both running
+        first_job.cancel()
+        first.join(5)
+        self.assertFalse(first.is_alive())
+        self.assertTrue(second.is_alive())
+        second_job.cancel()
+        second.join(5)
+        self.assertFalse(second.is_alive())
+        self.assertEqual(self.bot.isolation.crashes, crashes)
+        self.assertEqual(self.bot.said, [])
+
+        thread, job = self.factor(91)  # The processes are still usable
+        thread.join(30)
+        self.assertEqual(self.bot.said, ['91 = 7 * 13'])
+
+if __name__ == '__main__':
+    unittest.main()
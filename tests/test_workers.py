@@ -0,0 +1,52 @@
+'''
+Created on Oct 18, 2026
+
+Tests of the CommandPool's limits, see the workers module.
+
+'''
+
+import threading
+import unittest
+
+from bearbot.core.bot import Bot
+from bearbot.core.command import Command
+from bearbot.core.message import Message
+from bearbot.core.workers import CommandPool, Refused
+
+class PerCommandTest(unittest.TestCase):
+    ''' Jobs count against the command they run, however it was typed '''
+
+    def setUp(self):
+        self.bot = Bot('irc.example.net', 'Owner!owner@example.net', '',
+                       '#bears', database=None)
+        self.pool = CommandPool(workers=2, per_command=1, per_user=0)
+        self.release = threading.Event()
+
+    def tearDown(self):
+        self.release.set()
+        self.pool.shutdown()
+
+    def command(self, typed):
+        ''' The Command for '.typed bears', as a user sent it '''
+        msg = Message(':user!user@example.org PRIVMSG #bears :.%s bears' %
+                      typed)
+        entry = self.bot.get_command(typed, load=False)
+        return Command(self.bot, msg, entry, [typed, 'bears'])
+
+    def block(self, cmd):
+        self.release.wait(5)
+
+    def test_abbreviation_and_name_share_a_limit(self):
+        first = self.command('rev')
+        self.assertEqual(first.name, 'reverse')
+        self.pool.submit(self.block, first)
+        with self.assertRaises(Refused):
+            self.pool.submit(self.block, self.command('reverse'))
+
+    def test_cancel_by_name_finds_an_abbreviation(self):
+        job = self.pool.submit(self.block, self.command('rev'))
+        self.assertEqual(self.pool.cancel('reverse'), 1)
+        self.assertTrue(job.cancelled.is_set())
+
+if __name__ == '__main__':
+    unittest.main()